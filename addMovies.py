@@ -9,31 +9,53 @@
 ################################################################################
 
 import csv
+import os
 from unidecode import unidecode
-import pandas as pd
-import tmdbsimple as tmdb
-import requests
-from rotten_tomatoes_client import RottenTomatoesClient
-from selenium import webdriver
-from bs4 import BeautifulSoup
-import re
-import time
 import numpy as np
 import json
-import shutil
 import argparse
 import warnings
-import pdb
-from justwatch import JustWatch, justwatchapi
-justwatchapi.__dict__['HEADER'] = {
-    'User-Agent': 'JustWatch client (github.com/dawoudt/JustWatchAPI)'
-}
+from refreshEngine import HostLimiter, runConcurrent, parseBudget, refreshOrder
+from movieLensPool import DriverPool, refreshRating
+from checkpoint import Checkpoint
+import responseCache
+import standIn
+import profiler
+import retryLayer
+import movieStore
+import tmdbIndex
+from genreIndex import genre_master
+from providerIndex import ProviderIndex
+from titleMatcher import (matchScore, rankCandidates, decide, confirms, accept_threshold,
+                          review_threshold, tmdbFields, jwFields)
+from responseCache import cachedCall
+from titleKeys import normalizeTitle
+from streamLookup import (getJustWatchClient, parseJustWatch, findRTScore, refreshStreams,
+                          tryFloat, tryInt)
+
+## ambiguous --batch matches waiting to be confirmed with --review
+review_path = 'databases/batch_review.jsonl'
 
 warnings.simplefilter(action = 'ignore', category = FutureWarning)
 
+## the API clients are imported and built on first use, so startup doesn't pay
+## for them (or hit the network) on code paths that never need them
+tmdb_module = None
+
+def getTMDB():
+    global tmdb_module
+    if tmdb_module is None:
+        import tmdbsimple
+        tmdbsimple.API_KEY = config['TMDB_API_KEY']
+        tmdb_module = tmdbsimple
+    return tmdb_module
+
+def getJustWatchGenreList():
+    return cachedCall('justwatch.genres', {}, lambda: getJustWatchClient().get_genres())
+
 def parseTMDB(r):
     tmdb_id = float(r['id'])
-    mov = tmdb.Movies(tmdb_id).info()
+    mov = cachedCall('tmdb.info', {'id' : tmdb_id}, lambda: getTMDB().Movies(tmdb_id).info())
     year = float(mov['release_date'].split("-")[0]) if len(mov['release_date'].split("-")[0]) > 0 else np.nan
     genres = mov['genres'] if mov['genres'] is not None else []
     imdb_id = str(mov['imdb_id']) if mov['imdb_id'] is not None else None
@@ -46,8 +68,55 @@ def parseTMDB(r):
         gs.append(str('Foreign'))
     return tmdb_id, year, overview, tagline, runtime, gs, imdb_id
 
+def settled(ref, cands):
+    ## whether cands already hold the match for ref: a confident one that also
+    ## has ref's year, or, without a year, the only one with its title. a title
+    ## alone can't tell a remake from the original.
+    confident = [r for r in cands if matchScore(ref, tmdbFields(r)) >= accept_threshold]
+    if ref.get('year') is not None:
+        return any(confirms(ref, tmdbFields(r)) for r in confident)
+    titles = [normalizeTitle(r['title']) for r in cands]
+    return any(titles.count(normalizeTitle(r['title'])) == 1 for r in confident)
+
+def tmdbCandidates(title, limiter = None, year = None):
+    ## candidates from the local TMDB index if one has been built. TMDB is
+    ## searched online as well unless they settle the match, since titles
+    ## newer than the export would otherwise match an older film
+    ref = {'title' : title, 'year' : year}
+    local = tmdbIndex.loadIndex()
+    cands = local.candidates(title, limit = 5) if local is not None else []
+    if len(cands) and settled(ref, cands):
+        return cands
+    seen = set(r['id'] for r in cands)
+    for page in range(1, 6):
+        if limiter is not None:
+            limiter.acquire('tmdb')
+        res = cachedCall(
+            'tmdb.search', {'query' : title, 'page' : page},
+            lambda: getTMDB().Search().movie(query = title, page = page)
+        )
+        if len(res['results']) == 0: break
+        cands += [r for r in res['results'] if r['id'] not in seen]
+        seen.update(r['id'] for r in res['results'])
+        ## stop paging once this page has a confident match
+        if max(matchScore(ref, tmdbFields(r)) for r in res['results']) >= accept_threshold:
+            break
+    return cands
+
+def confirmMatch(source, title, options, name_key = 'title'):
+    ## asks about each plausible candidate in turn; returns the accepted one or None
+    for score, r in options:
+        sel = input(
+            "Matching '{}' with {} '{}' ({})... OK? [y or n] ".format(
+                title, source, unidecode(r[name_key]).replace(',', ''), r['id']
+            )
+        ).lower()
+        if sel == 'y':
+            return r
+        print("Trying again...")
+    return None
+
 def findTMDB(title, imdb_id = None):
-    page = 1
     sel = 'n'
     tmdb_id = None
     year = None
@@ -56,29 +125,28 @@ def findTMDB(title, imdb_id = None):
     tagline = None
     gs = []
     tmdb_title = None
+    confidence = 0.0
     if imdb_id is not None:
-        res = tmdb.Find(imdb_id).info(external_source = 'imdb_id')['movie_results']
+        res = cachedCall(
+            'tmdb.find', {'imdb_id' : imdb_id},
+            lambda: getTMDB().Find(imdb_id).info(external_source = 'imdb_id')
+        )['movie_results']
         if len(res) > 0:
             tmdb_id, year, overview, tagline, runtime, gs, imdb_id = parseTMDB(res[0])
             tmdb_title = None
             sel = 'y'
-    while sel != 'y' and page <= 5:
-        res = tmdb.Search().movie(query = title, page = page)
-        page += 1
-        if len(res['results']) == 0: break
-        for r in res['results']:
-            tmdb_title = unidecode(r['title']).replace(',', '')
-            if tmdb_title.lower() == title.lower():
-                sel = 'y'
-            elif title.lower() in tmdb_title.lower() or tmdb_title.lower() in title.lower():
-                sel = input(
-                    "Matching '{}' with TMDB '{}' ({})... OK? [y or n] ".format(title, tmdb_title, r['id'])
-                ).lower()
-            if sel == 'y':
-                tmdb_id, year, overview, tagline, runtime, gs, imdb_id = parseTMDB(r)
-                break
-            else:
-                print("Trying again...")
+            confidence = 1.0
+    if sel != 'y':
+        scored = rankCandidates({'title' : title}, [(tmdbFields(r), r) for r in tmdbCandidates(title)])
+        match, options = decide(scored)
+        if match is not None:
+            confidence = scored[0][0]
+        else:
+            match = confirmMatch('TMDB', title, options)
+        if match is not None:
+            sel = 'y'
+            tmdb_title = unidecode(match['title']).replace(',', '')
+            tmdb_id, year, overview, tagline, runtime, gs, imdb_id = parseTMDB(match)
 
     if sel != 'y':
         print("Unable to find match in TMDB for '{}'".format(title))
@@ -93,17 +161,7 @@ def findTMDB(title, imdb_id = None):
         imdb_id = input("What is the IMDB ID?  ")
     else:
         print("* MATCHED TMDB")
-    return tmdb_id, year, overview, tagline, runtime, gs, imdb_id, tmdb_title
-
-def parseScore(scores, prov = 'tomato:meter'):
-    if len(scores):
-        rt_scores = [x for x in scores if prov in x['provider_type']]
-        if len(rt_scores):
-            return(float(rt_scores[0]['value']))
-        else:
-            return np.nan
-    else:
-        return np.nan
+    return tmdb_id, year, overview, tagline, runtime, gs, imdb_id, tmdb_title, confidence
 
 def parseGenres(gs, jw_genres):
     if not not gs and not not jw_genres:
@@ -112,93 +170,18 @@ def parseGenres(gs, jw_genres):
     else:
         return []
 
-def getProviders():
-    with open("config/providers.json", "r") as f:
-        providers = json.load(f)
-    jw = JustWatch(country = "US")
-    provider_details = jw.get_providers()
-    for provider in provider_details:
-        providers[str(provider['id'])] = provider
-    with open("config/providers.json", "w") as f:
-        json.dump(providers, f)
-    return providers
-
-providers = getProviders()
-
-provider_map = {'Netflix Instant' : 'Netflix',
-                'Amazon Prime' : 'Amazon',
-                'Amazon Instant Video' : 'Amazon',
-                'Amazon Prime Instant Video' : 'Amazon',
-                'HBO Now' : 'HBO',
-                'HBO Go' : 'HBO'}
-
-my_providers = ['Netflix','Amazon Prime Video','HBO Max','Hulu','Amazon Video',
-                'Apple TV Plus','YouTube','YouTube Free','CBS','HBO Now',
-                'The CW','Showtime','PBS','FXNow','Tubi TV','Kanopy',
-                'Comedy Central','Max Go','HBO Go','ABC','NBC','Syfy','A&E',
-                'Lifetime','Cartoon Network','Adult Swim','USA Network','Fox',
-                'TCM','Bravo TV','TNT']
-
-genre_master = {'Action' : ['Action'],
-                'Action & Adventure' : ['Action', 'Adventure'],
-                'Adventure' : ['Adventure'],
-                'Animation' : ['Animation'],
-                'Comedy' : ['Comedy'],
-                'Crime' : ['Crime'],
-                'Documentary' : ['Documentary'],
-                'Drama' : ['Drama'],
-                'Family' : ['Family'],
-                'Fantasy' : ['Fantasy'],
-                'Foreign' : ['Foreign'],
-                'History' : ['History'],
-                'Horror' : ['Horror'],
-                'Kids & Family' : ['Family'],
-                'Made in Europe' : [None],
-                'Music' : ['Music'],
-                'Music & Musical' : ['Music'],
-                'Mystery' : ['Mystery'],
-                'Mystery & Thriller' : ['Mystery', 'Thriller'],
-                'Romance' : ['Romance'],
-                'Science Fiction' : ['Science Fiction'],
-                'Science-Fiction' : ['Science Fiction'],
-                'Sport' : [None],
-                'Stand-Up' : ['Stand-Up'],
-                'Thriller' : ['Thriller'],
-                'War' : ['War'],
-                'War & Military' : ['War'],
-                'Western' : ['Western']
-}
-
-def parseStreams(streams):
-    ss = []
-    if not not streams:
-        for s in streams:
-            if any(x in s['monetization_type'] for x in ['ads', 'flatrate', 'flat_rate', 'free']):
-                prov = providers.get(str(s['provider_id']))
-                if prov is not None:
-                    name = prov['clear_name']
-                    if name in provider_map:
-                        short_name = provider_map[name]
-                    else:
-                        short_name = name
-                    if short_name in my_providers:
-                        ss.append(short_name)
-    return list(set(ss))
-
-def parseJustWatch(mov):
-    jw_id = tryFloat(mov['id'], get = True)
-    year = tryFloat(mov['original_release_year'], get = True) if 'original_release_year' in mov.keys() else np.nan
-    desc = unidecode(mov['short_description']) if 'short_description' in mov.keys() else None
-    runtime = tryFloat(mov['runtime'], get = True) if 'runtime' in mov.keys() else np.nan
-    rt_score = parseScore(mov['scoring']) if 'scoring' in mov.keys() else np.nan
-    streams = parseStreams(mov['offers']) if 'offers' in mov.keys() else []
-    return jw_id, year, desc, runtime, rt_score, streams
-
-def findJustWatch(title, jw = None, jw_genres = None, imdb_id = None, tmdb_id = None):
+def getJustWatchGenres(jw_id, jw, jw_genres):
+    full_res = cachedCall(
+        'justwatch.title', {'title_id' : int(jw_id)}, lambda: jw.get_title(title_id = int(jw_id))
+    )
+    return parseGenres(full_res['genre_ids'], jw_genres) if 'genre_ids' in full_res.keys() else []
+
+def findJustWatch(title, jw = None, jw_genres = None, imdb_id = None, tmdb_id = None,
+                  ref_year = None, ref_runtime = None):
     if jw == None:
-        jw = JustWatch(country = 'US')
+        jw = getJustWatchClient()
     if jw_genres is None:
-        jw_genres = jw.get_genres()
+        jw_genres = getJustWatchGenreList()
     sel = 'n'
     jw_id = np.nan
     year = np.nan
@@ -208,31 +191,23 @@ def findJustWatch(title, jw = None, jw_genres = None, imdb_id = None, tmdb_id =
     gs = []
     streams = []
     jw_title = None
-    res = jw.search_for_item(query = title)
-    while sel != 'y' and 'total_results' in res and res['total_results'] > 0:
-        for r in res['items']:
-            if 'scoring' in r:
-                provs = pd.DataFrame(r['scoring'])
-                if (imdb_id != None and len(provs.value[provs.provider_type == 'imdb:id'].values) != 0):
-                    if provs.value[provs.provider_type == 'imdb:id'].values != imdb_id:
-                        next
-                if (tmdb_id != None and len(provs.value[provs.provider_type == 'tmdb:id'].values) != 0):
-                    if provs.value[provs.provider_type == 'tmdb:id'].values != tmdb_id:
-                        next
-                jw_title = unidecode(r['title']).replace(',', '')
-                if jw_title is not None and title is not None:
-                    if jw_title.lower() == title.lower():
-                        sel = 'y'
-                    elif title.lower() in jw_title.lower() or jw_title.lower() in title.lower():
-                        sel = input(
-                            "Matching '{}' with JustWatch '{}' ({})... OK? [y or n] ".format(title, jw_title, r['id'])
-                        ).lower()
-                if sel == 'y':
-                    jw_id, year, desc, runtime, rt_score, streams = parseJustWatch(r)
-                    break
-                else:
-                    print("Trying again...")
-        break
+    confidence = 0.0
+    res = cachedCall(
+        'justwatch.search', {'query' : title}, lambda: jw.search_for_item(query = title)
+    )
+    ## listings whose imdb/tmdb ids disagree with what TMDB gave us score 0
+    ref = {'title' : title, 'year' : ref_year, 'runtime' : ref_runtime,
+           'imdb_id' : imdb_id, 'tmdb_id' : tmdb_id}
+    scored = rankCandidates(ref, [(jwFields(r), r) for r in res.get('items', []) if 'scoring' in r])
+    match, options = decide(scored)
+    if match is not None:
+        confidence = scored[0][0]
+    else:
+        match = confirmMatch('JustWatch', title, options)
+    if match is not None:
+        sel = 'y'
+        jw_title = unidecode(match['title']).replace(',', '')
+        jw_id, year, desc, runtime, rt_score, streams = parseJustWatch(match)
     if sel != 'y':
         print("Unable to find match in JustWatch for '{}'".format(title))
         jw_id = tryFloat(input("What is the JustWatch ID?  "), get = True)
@@ -250,94 +225,193 @@ def findJustWatch(title, jw = None, jw_genres = None, imdb_id = None, tmdb_id =
 
     ## get genres
     if not np.isnan(jw_id):
-        full_res = jw.get_title(title_id = int(jw_id))
-        gs = parseGenres(full_res['genre_ids'], jw_genres) if 'genre_ids' in full_res.keys() else []
-
-    return jw_id, year, desc, runtime, rt_score, gs, streams, jw_title
+        gs = getJustWatchGenres(jw_id, jw, jw_genres)
+
+    return jw_id, year, desc, runtime, rt_score, gs, streams, jw_title, confidence
+
+def searchTMDB(title, limiter = None):
+    ## non-interactive version of findTMDB used by --batch. returns the
+    ## confident match (or None) and the plausible candidates for review.
+    scored = rankCandidates({'title' : title}, [(tmdbFields(r), r) for r in tmdbCandidates(title, limiter)])
+    match, options = decide(scored)
+    return match, [r for score, r in options]
+
+def searchJustWatch(title, jw, limiter = None, ref = None):
+    ## non-interactive version of findJustWatch used by --batch
+    if limiter is not None:
+        limiter.acquire('justwatch')
+    res = cachedCall(
+        'justwatch.search', {'query' : title}, lambda: jw.search_for_item(query = title)
+    )
+    if ref is None:
+        ref = {'title' : title}
+    scored = rankCandidates(ref, [(jwFields(r), r) for r in res.get('items', []) if 'scoring' in r])
+    match, options = decide(scored)
+    if match is not None and not confirms(ref, jwFields(match)):
+        ## a match on the title alone is left for review
+        match, options = None, [(score, r) for score, r in scored if score >= review_threshold]
+    return match, [r for score, r in options]
+
+def cleanGenres(genres, jw_genres):
+    gs = genres + list(set(jw_genres) - set(genres))
+    gs = [x for g in gs for x in genre_master.get(g, [g]) if x is not None]
+    return list(set(gs))
 
-def getJustWatch(title, jw_id, rt_score, streams, jw = None):
-    if jw == None:
-        jw = JustWatch(country = 'US')
-    sel = 'n'
-    ## JustWatch breaks if you bombard it too much, so use a VPN
-    while True:
-        try:
-            res = jw.get_title(title_id = int(jw_id))
-        except Exception as e:
-            if e.response.status_code == 500:
-                print("No match found for this JustWatch ID {}.".format(jw_id))
-                return jw_id, rt_score, streams
-            if e.response.status_code == 404:
-                print("No match found for this JustWatch ID {}.".format(jw_id))
-                return jw_id, rt_score, streams
-            print(e.response.status_code)
-            print("JustWatch not reached. Try again...")
-            print("** Rate Limit was likely exceeded. Please use VPN. **")
-            nada = input("Press [enter] to continue once VPN is turned on.")
-            continue
-        else:
-            print("* MATCHED JustWatch")
-            break
-    if 'error' in res:
-        print("No match found for this JustWatch ID {}.".format(jw_id))
-        return jw_id, rt_score, streams
-    jw_id, year, desc, runtime, rt_score, streams = parseJustWatch(res)
-    return jw_id, rt_score, streams
-
-def findRTScore(title, auto = False):
-    res = RottenTomatoesClient.search(term = title, limit = 5)
-    for r in res['movies']:
-        if not auto:
-            print("{} -- {} -- {}% -- {}".format(
-                r['name'], tryInt(r['year'], get = True),
-                tryInt(r.get('meterScore'), get = True), r['subline'] + r['url']
-            ))
-            approval = input("Does this look like a match? [y or n]  ")
-            if approval == 'y':
-                rt_score = tryInt(r.get('meterScore'), get = True)
-                return(rt_score)
-            else:
-                continue
-        else:
-            if r['name'] == title:
-                rt_score = tryInt(r.get('meterScore'), get = True)
-                if rt_score == 'None':
-                    continue
-                else:
-                    return(rt_score)
-            else:
-                continue
-    print("Unable to find match in Rotten Tomatoes for '{}'".format(title))
-    return(np.nan)
-
-def tryFloat(x, get = False):
-    try:
-        float(x)
-    except:
-        if get:
-            return str(x)
+def movieRow(new_id, new_title, new_rating, avg_rating, num_rating, tmdb_id, imdb_id,
+             year, runtime, overview, tagline, gs, jw_id, streams, rt_score):
+    ## clean up streams
+    if streams is None or not any(streams):
+        streams = []
+    if gs is None or not any(gs):
+        gs = []
+    return {
+        'movielens_id' : new_id
+        , 'netflix_id' : None ## no dependence on netflix IDs anymore
+        , 'tmdb_id' : tmdb_id
+        , 'imdb_id' : imdb_id
+        , 'title' : new_title
+        , 'rating' : new_rating
+        , 'netflix_rating' : None ## not using netflix as rating basis anymore
+        , 'genres' : gs
+        , 'netflix_instant' : 'Netflix' in streams
+        , 'streams' : streams
+        , 'year' : year
+        , 'runtime' : runtime
+        , 'overview' : overview
+        , 'tagline' : tagline
+        , 'jw_id' : jw_id
+        , 'rt_score' : rt_score
+        , 'numratings' : num_rating
+        , 'avgrating' : avg_rating
+    }
+
+def readBatch(path):
+    ## CSV with a header row, or JSON Lines, with the fields title,
+    ## movielens_id, rating, avgrating and numratings
+    with open(path, "r") as f:
+        if path.lower().endswith('.csv'):
+            entries = [dict(row) for row in csv.DictReader(f)]
         else:
-            return False
-    if get:
-        return float(x)
-    else:
-        return True
-
-def tryInt(x, get = False):
-    try:
-        int(x)
-    except:
-        if get:
-            if x is None:
-                return np.nan
-            else:
-                return str(x)
+            entries = [json.loads(line) for line in f if line.strip()]
+    for entry in entries:
+        for key in ['movielens_id', 'rating', 'avgrating', 'numratings']:
+            entry[key] = tryFloat(entry.get(key, ''), get = True)
+    return entries
+
+def resolveBatchEntry(entry, jw, jw_genres, limiter):
+    ## JustWatch and Rotten Tomatoes are only searched once the TMDB match is
+    ## known, so their matches can be checked against its ids and year
+    title = entry['title']
+    result = {'entry' : entry, 'tmdb' : None, 'jw' : None,
+              'tmdb_candidates' : [], 'jw_candidates' : [], 'streams_resolved' : False}
+    tmdb_match, result['tmdb_candidates'] = searchTMDB(title, limiter)
+    if tmdb_match is not None:
+        limiter.acquire('tmdb')
+        result['tmdb'] = parseTMDB(tmdb_match)
+        resolveStreams(result, jw, jw_genres, limiter)
+    return result
+
+def resolveStreams(result, jw, jw_genres, limiter = None):
+    ## fills in the JustWatch match (or its candidates) and the RT score of a
+    ## result whose TMDB match is known
+    title = result['entry']['title']
+    tmdb_id, year, overview, tagline, runtime, genres, imdb_id = result['tmdb']
+    ref = {'title' : title, 'year' : year, 'runtime' : runtime, 'imdb_id' : imdb_id, 'tmdb_id' : tmdb_id}
+    jw_match, result['jw_candidates'] = searchJustWatch(title, jw, limiter, ref)
+    if jw_match is not None:
+        jw_fields = list(parseJustWatch(jw_match))
+        if limiter is not None:
+            limiter.acquire('justwatch')
+        result['jw'] = jw_fields + [getJustWatchGenres(jw_fields[0], jw, jw_genres)]
+    if limiter is not None:
+        limiter.acquire('rottentomatoes')
+    result['rt_score'] = findRTScore(title, auto = True, year = year)
+    result['streams_resolved'] = True
+    return result
+
+def bestRTScore(rt_score, jw_rt_score):
+    ## the score found on Rotten Tomatoes, else the one JustWatch lists, which
+    ## is usually out of date. this reverses what addMovies.py used to do: it
+    ## stored JustWatch's score whenever the RT search found one, and no score
+    ## when it didn't, so a re-added movie can get a different score now.
+    if not tryFloat(rt_score) or np.isnan(float(rt_score)):
+        return jw_rt_score
+    return rt_score
+
+def batchRow(result):
+    ## the row for a resolved entry. tmdb is (tmdb_id, year, overview, tagline,
+    ## runtime, genres, imdb_id); jw is (jw_id, year, desc, runtime, rt_score,
+    ## streams, genres) or None when JustWatch has no listing for it.
+    entry = result['entry']
+    tmdb_id, year, overview, tagline, runtime, genres, imdb_id = result['tmdb']
+    jw_id, rts, streams, jw_genres = np.nan, np.nan, [], []
+    if result['jw'] is not None:
+        jw_id, jw_year, desc, jw_runtime, rts, streams, jw_genres = result['jw']
+    rt_score = bestRTScore(result.get('rt_score'), rts)
+    return movieRow(
+        entry['movielens_id'], entry['title'], entry['rating'], entry['avgrating'],
+        entry['numratings'], tmdb_id, imdb_id, year, runtime, overview, tagline,
+        cleanGenres(genres, jw_genres), jw_id, streams, rt_score
+    )
+
+def needsReview(result):
+    return result['tmdb'] is None or (result['jw'] is None and len(result['jw_candidates']))
+
+def writeReview(path, results):
+    with open(path, 'w') as f:
+        for result in results:
+            f.write(json.dumps(result, default = str) + '\n')
+
+def pickCandidate(source, title, options):
+    ## returns the chosen index, 'n' for none of these, or 's' to skip the movie
+    print("\n{} candidates for '{}':".format(source, title))
+    for i, label in enumerate(options):
+        print("  {}) {}".format(i + 1, label))
+    while True:
+        choice = input("Pick a number, 'n' for none of these, or 's' to skip for now:  ").lower()
+        if choice in ['n', 's']:
+            return choice
+        if tryInt(choice) and 1 <= int(choice) <= len(options):
+            return int(choice) - 1
+
+def reviewBatch(result, jw, jw_genres):
+    ## confirms the ambiguous matches of one batch entry; returns the completed
+    ## result, or None if it should stay in the review file
+    title = result['entry']['title']
+    if result['tmdb'] is None:
+        cands = result['tmdb_candidates']
+        if not len(cands):
+            print("\nNo TMDB match for '{}'; left in {} to add by hand.".format(title, review_path))
+            return None
+        choice = pickCandidate('TMDB', title, [
+            "{} ({}) [{}]".format(unidecode(r['title']), (r.get('release_date') or '')[:4], r['id'])
+            for r in cands
+        ])
+        if choice == 's':
+            return None
+        if choice == 'n':
+            ## not asked about again
+            result['tmdb_candidates'] = []
+            return None
+        result['tmdb'] = parseTMDB(cands[choice])
+    ## files written before JustWatch waited for TMDB have it resolved already
+    if not result.get('streams_resolved', True):
+        resolveStreams(result, jw, jw_genres)
+    if result['jw'] is None and len(result['jw_candidates']):
+        cands = result['jw_candidates']
+        choice = pickCandidate('JustWatch', title, [
+            "{} ({}) [{}]".format(unidecode(r['title']), r.get('original_release_year', ''), r['id'])
+            for r in cands
+        ])
+        if choice == 's':
+            return None
+        if choice == 'n':
+            ## not on JustWatch
+            result['jw_candidates'] = []
         else:
-            return False
-    if get:
-        return int(x)
-    else:
-        return True
+            jw_fields = list(parseJustWatch(cands[choice]))
+            result['jw'] = jw_fields + [getJustWatchGenres(jw_fields[0], jw, jw_genres)]
+    return result
 
 ## load api key for TMDB
 with open("config/config.csv") as f:
@@ -346,8 +420,6 @@ with open("config/config.csv") as f:
     for row in reader:
         config[row[0]] = row[1]
 
-tmdb.API_KEY = config['TMDB_API_KEY']
-
 parser = argparse.ArgumentParser()
 parser.add_argument(
     "--updatestreaming",
@@ -359,7 +431,105 @@ parser.add_argument(
     help = "update Movie Lens ratings of movies already in database",
     action = "store_true"
 )
+parser.add_argument(
+    "--workers",
+    help = "number of movies to refresh concurrently with --updatestreaming",
+    type = int,
+    default = 8
+)
+parser.add_argument(
+    "--jwrate",
+    help = "maximum JustWatch requests per second (0 for no limit)",
+    type = float,
+    default = 4.0
+)
+parser.add_argument(
+    "--rtrate",
+    help = "maximum Rotten Tomatoes requests per second (0 for no limit)",
+    type = float,
+    default = 2.0
+)
+parser.add_argument(
+    "--browsers",
+    help = "number of headless browsers scraping MovieLens concurrently with --updateratings",
+    type = int,
+    default = 4
+)
+parser.add_argument(
+    "--page-timeout",
+    help = "seconds to wait for a MovieLens page before skipping that movie",
+    type = float,
+    default = 10.0
+)
+parser.add_argument(
+    "--retries",
+    help = "attempts per request before giving up on a movie (see retryLayer.py)",
+    type = int,
+    default = retryLayer.max_attempts
+)
+parser.add_argument(
+    "--no-cache",
+    help = "don't read or write the local TMDB/JustWatch/Rotten Tomatoes response cache",
+    action = "store_true"
+)
+parser.add_argument(
+    "--refresh-cache",
+    help = "ignore cached responses and overwrite them with fresh ones",
+    action = "store_true"
+)
+parser.add_argument(
+    "--budget",
+    help = "limit an update run to a number of requests (e.g. 500) or a time (e.g. 30m, 2h); "
+           "the stalest movies with the highest predicted ratings are refreshed first",
+    type = str,
+    default = None
+)
+parser.add_argument(
+    "--resume",
+    help = "continue an interrupted --updatestreaming or --updateratings run from its checkpoint "
+           "instead of starting over",
+    action = "store_true"
+)
+parser.add_argument(
+    "--batch",
+    help = "add the movies listed in a CSV or JSON Lines file (title, movielens_id, rating, "
+           "avgrating, numratings) without prompting; ambiguous matches are saved for --review",
+    type = str,
+    default = None
+)
+parser.add_argument(
+    "--review",
+    help = "confirm the ambiguous matches saved by --batch",
+    action = "store_true"
+)
+parser.add_argument(
+    "--standin",
+    help = "send every TMDB, JustWatch, Rotten Tomatoes and MovieLens request to a local "
+           "standIn.py server at this URL (also read from STANDIN_URL)",
+    type = str,
+    default = None
+)
+parser.add_argument(
+    "--profile",
+    help = "time each phase and API endpoint and report it at exit, as JSON to the given file "
+           "(default profiles/addMovies-<date>-<time>.json); see profiler.py",
+    nargs = '?',
+    const = '',
+    default = None
+)
 args = parser.parse_args()
+budget = parseBudget(args.budget)
+if args.profile is not None:
+    profiler.enable(args.profile or None)
+
+if args.standin:
+    standIn.install(args.standin)
+else:
+    standIn.installFromEnvironment()
+
+responseCache.configure(enabled = not args.no_cache, refresh = args.refresh_cache)
+retryLayer.configure(concurrency = args.workers, attempts = args.retries,
+                     hosts = {'movielens' : args.browsers})
 
 if args.updatestreaming:
     updatestreaming = True
@@ -373,49 +543,90 @@ else:
     print("To update the predicted ratings of existing movies, enter '--updateratings' as a command line argument.")
 
 ## backup database file
-shutil.copyfile('databases/movies_db.json', 'databases/backup/movies_db.json')
+store = movieStore.openStore()
+store.backup()
 
 ## load database
+profiler.mark('load')
 try:
-    with open("databases/movies_db.json", "r") as f:
-        movies_in = json.load(f)
-        movies_db = pd.DataFrame(movies_in)
+    movies_db = store.load()
 except:
-    movies_db = pd.DataFrame({
-          'movielens_id' : []
-        , 'netflix_id' : []
-        , 'tmdb_id' : []
-        , 'imdb_id' : []
-        , 'title' : []
-        , 'rating' : []
-        , 'netflix_rating' : []
-        , 'genres' : []
-        , 'netflix_instant' : []
-        , 'streams' : []
-        , 'year' : []
-        , 'runtime' : []
-        , 'overview' : []
-        , 'tagline' : []
-        , 'jw_id' : []
-        , 'rt_score' : []
-    })
-
-## JustWatch genre list
-jw = JustWatch(country = "US")
-full_genres = jw.get_genres()
+    movies_db = movieStore.emptyMovies()
+
+## add movies listed in a batch file without prompting; anything without an
+## exact match is set aside in the review file
+if args.batch is not None:
+    profiler.mark('batch')
+    entries = []
+    for entry in readBatch(args.batch):
+        if entry['movielens_id'] != '' and len(store.findMovielensId(movies_db, entry['movielens_id'])):
+            print("{} seems to already exist in the DB. Skipping...".format(entry['title']))
+        else:
+            entries.append(entry)
+    print("\nResolving {} movies...\n".format(len(entries)))
+    jw = getJustWatchClient()
+    full_genres = getJustWatchGenreList()
+    limiter = HostLimiter({'justwatch' : args.jwrate, 'rottentomatoes' : args.rtrate}, budget)
+    progress = profiler.Progress(len(entries), 'batch')
+    results, errors = runConcurrent(
+        [(i, (entry, jw, full_genres, limiter)) for i, entry in enumerate(entries)],
+        resolveBatchEntry, args.workers, lambda i, result: progress.step(), budget
+    )
+    for i, e in errors.items():
+        print("Unable to resolve {}: {}".format(entries[i]['title'], e))
+    if len(results) + len(errors) < len(entries):
+        print("Budget reached; {} movies weren't looked up. Run the batch again to add them.".format(
+            len(entries) - len(results) - len(errors)
+        ))
+    review = [results[i] for i in sorted(results) if needsReview(results[i])]
+    for i in sorted(results):
+        if not needsReview(results[i]):
+            movies_db = store.insert(movies_db, batchRow(results[i]))
+            print("{} added.".format(entries[i]['title']))
+            profiler.count('movies added')
+    if len(review):
+        ## keep anything still waiting from an earlier batch
+        if os.path.exists(review_path):
+            with open(review_path, "r") as f:
+                review = [json.loads(line) for line in f if line.strip()] + review
+        writeReview(review_path, review)
+        print("\n{} movies need review. Run with --review to confirm them.".format(len(review)))
+
+## confirm the matches set aside by --batch
+if args.review and os.path.exists(review_path):
+    profiler.mark('review')
+    with open(review_path, "r") as f:
+        review = [json.loads(line) for line in f if line.strip()]
+    jw = getJustWatchClient()
+    full_genres = getJustWatchGenreList()
+    remaining = []
+    for result in review:
+        entry = result['entry']
+        if entry['movielens_id'] != '' and len(store.findMovielensId(movies_db, entry['movielens_id'])):
+            continue
+        completed = reviewBatch(result, jw, full_genres)
+        if completed is None:
+            remaining.append(result)
+        else:
+            movies_db = store.insert(movies_db, batchRow(completed))
+            print("{} added.".format(entry['title']))
+            profiler.count('movies added')
+    writeReview(review_path, remaining)
 
 ## accept new movies
 keepgoing = False
-add_movies = input("\nDo you want to add movies to the database? [y or n]  ")
-if add_movies == 'y':
-    keepgoing = True
+if args.batch is None and not args.review:
+    add_movies = input("\nDo you want to add movies to the database? [y or n]  ")
+    if add_movies == 'y':
+        keepgoing = True
+        profiler.mark('add')
+        jw = getJustWatchClient()
+        full_genres = getJustWatchGenreList()
 while keepgoing:
-    netflix_id = None ## no dependence on netflix IDs anymore
-    netflix_rating = None ## not using netflix as rating basis anymore
     new_title = input("\nWhat is the name of the movie to add?  ")
     new_id = tryFloat(input("What is the MovieLens ID of the movie?  "), get = True)
     ## check if the movie is already in the DB
-    if new_id != '' and len(movies_db[(movies_db.movielens_id == new_id)]):
+    if new_id != '' and len(store.findMovielensId(movies_db, new_id)):
         print('This movie seems to already exist in the DB. Skipping...')
         keepgoing = input("\nAdd another movie? [y or n]  ")
         if keepgoing == 'n':
@@ -426,10 +637,12 @@ while keepgoing:
     num_rating = tryFloat(input("What is the MovieLens number of ratings for the movie?  "), get = True)
 
     ## find TMDB
-    tmdb_id, year, overview, tagline, runtime, genres, imdb_id, title = findTMDB(new_title)
+    tmdb_id, year, overview, tagline, runtime, genres, imdb_id, title, confidence = findTMDB(new_title)
     print(title, " -- ", tryInt(year, get = True), " -- ", tagline, " -- ", genres)
     print(overview)
-    approval = input("Does this look like a match? [y or n]  ")
+    approval = 'y'
+    if confidence < accept_threshold:
+        approval = input("Does this look like a match? [y or n]  ")
     if approval == 'n':
         title = new_title
         tmdb_id = tryFloat(input("What is the TMDB ID?  "), get = True)
@@ -446,12 +659,16 @@ while keepgoing:
             imdb_id = np.nan
 
     ## find JustWatch
-    jw_id, jw_year, desc, jw_runtime, rts, jw_genres, streams, jw_title = findJustWatch(title, jw, full_genres)
+    jw_id, jw_year, desc, jw_runtime, rts, jw_genres, streams, jw_title, confidence = findJustWatch(
+        title, jw, full_genres, imdb_id, tmdb_id, year, runtime
+    )
     if not np.isnan(jw_id):
         print("{} -- {} -- {}% -- {}".format(jw_title, tryInt(jw_year, get = True),
                                              tryInt(rts, get = True), jw_genres))
         print(desc)
-        approval = input("Does this look like a match? [y or n]  ")
+        approval = 'y'
+        if confidence < accept_threshold:
+            approval = input("Does this look like a match? [y or n]  ")
         if approval == 'n':
             jw_id = tryFloat(input("What is the JustWatch ID?  "), get = True)
             if jw_id == '':
@@ -464,147 +681,136 @@ while keepgoing:
                 streams = [x.strip() for x in user_streams.split(',')]
 
     ## get RT Score directly
-    rt_score = findRTScore(title)
-    if not np.isnan(rt_score):
-        rt_score = rts ## use JustWatch RT Score, which is usually out of date
+    rt_score = bestRTScore(findRTScore(title, year = year), rts)
 
-    ## clean up streams
-    if streams is None or not any(streams):
-        streams = []
-    netflix_instant = False
-    if 'Netflix' in streams:
-        netflix_instant = True
     ## clean up genres
-    gs = genres + list(set(jw_genres) - set(genres))
-    gs = [x for g in gs for x in genre_master[g] if x is not None]
-    gs = list(set(gs))
+    gs = cleanGenres(genres, jw_genres)
     if 'Comedy' in gs:
         user_in = input("Is {} in the 'Stand-Up' genre? [y or n]  ".format(title))
         if user_in == 'y':
             gs.append('Stand-Up')
-    if gs is None or not any(gs):
-        gs = []
 
-    movies_db = movies_db.append({
-        'movielens_id' : new_id
-        , 'netflix_id' : netflix_id
-        , 'tmdb_id' : tmdb_id
-        , 'imdb_id' : imdb_id
-        , 'title' : new_title
-        , 'rating' : new_rating
-        , 'netflix_rating' : netflix_rating
-        , 'genres' : gs
-        , 'netflix_instant' : netflix_instant
-        , 'streams' : streams
-        , 'year' : year
-        , 'runtime' : runtime
-        , 'overview' : overview
-        , 'tagline' : tagline
-        , 'jw_id' : jw_id
-        , 'rt_score' : rt_score
-        , 'numratings' : num_rating
-        , 'avgrating' : avg_rating
-    }, ignore_index = True)
+    movies_db = store.insert(movies_db, movieRow(
+        new_id, new_title, new_rating, avg_rating, num_rating, tmdb_id, imdb_id,
+        year, runtime, overview, tagline, gs, jw_id, streams, rt_score
+    ))
 
     print("{} added.".format(new_title))
-
-    movies_db.reset_index(inplace = True, drop = True)
-    with open('databases/movies_db.json', 'w') as outfile:
-        json.dump(list(movies_db.T.to_dict().values()), outfile)
+    profiler.count('movies added')
 
     keepgoing = input("\nAdd another movie? [y or n]  ")
     if keepgoing == 'n':
         keepgoing = False
 
+movies_db = store.collect(movies_db)
+
 if updatestreaming:
+    profiler.mark('updatestreaming')
     print("\nUpdating database with streaming availability and latest RT scores...\n")
-    for idx, row in movies_db.iterrows():
-        title = movies_db.loc[idx, 'title']
-        print(title)
-        jw_id = movies_db.loc[idx, 'jw_id']
-        prev_rt_score = movies_db.loc[idx, 'rt_score']
-        if not not jw_id and isinstance(jw_id, float) and not np.isnan(jw_id):
-            jw_id, rt_score, streams = getJustWatch(
-                title, jw_id, prev_rt_score, movies_db.loc[idx, 'streams'], jw
-            )
-            if np.isnan(rt_score):
-                rt_score = findRTScore(title, auto = True)
-            if not np.isnan(rt_score):
-                movies_db.at[idx, 'rt_score'] = rt_score
-            else:
-                rt_score = movies_db.at[idx, 'rt_score']
-            if any(streams):
-                curr_streams = [s for s in streams if s in my_providers]
-                streams = list(set(curr_streams))
-                movies_db.at[idx, 'streams'] = streams
-            else:
-                movies_db.at[idx, 'streams'] = []
+    limiter = HostLimiter({'justwatch' : args.jwrate, 'rottentomatoes' : args.rtrate}, budget)
+    jw = getJustWatchClient()
+    checkpoint = Checkpoint('updatestreaming', movies_db, args.resume)
+    resumed = checkpoint.resumed()
+    if resumed:
+        print("Resuming: {} movies were refreshed before the last run stopped.".format(len(resumed)))
+        movies_db = store.updateMany(movies_db, resumed)
+    jobs = []
+    for idx in refreshOrder(movies_db, 'streams_checked'):
+        if idx in resumed:
+            continue
+        row = movies_db.loc[idx]
+        jw_id = row['jw_id']
+        if not movieStore.isMissing(jw_id) and tryFloat(jw_id):
+            jobs.append((idx, (row['title'], jw_id, row['rt_score'], row['streams'], jw, limiter, row['year'])))
         else:
-            print("No JustWatch ID for {}.".format(title))
+            print("No JustWatch ID for {}.".format(row['title']))
+
+    ## kept current as each refresh comes in, to report what changed per service
+    provider_index = ProviderIndex(list(movies_db.streams.values), movies_db.index)
+    provider_counts = provider_index.counts()
+    progress = profiler.Progress(len(jobs), 'streams')
+
+    def printRefresh(idx, update):
+        progress.step()
+        checkpoint.record(idx, update)
+        added, removed = provider_index.update(idx, update['streams'])
+        changes = ["+" + p for p in added] + ["-" + p for p in removed]
+        print("{} -- {}% -- {}{}".format(
+            movies_db.loc[idx, 'title'],
+            tryInt(update.get('rt_score', movies_db.loc[idx, 'rt_score']), get = True),
+            update['streams'],
+            " ({})".format(", ".join(changes)) if changes else ""
+        ))
 
-        print("{}% -- {}".format(tryInt(rt_score, get = True), streams))
+    try:
+        updates, errors = runConcurrent(jobs, refreshStreams, args.workers, printRefresh, budget)
+    finally:
+        checkpoint.write()
+    if len(updates) + len(errors) < len(jobs):
+        print("Budget reached; {} movies left to refresh next time.".format(
+            len(jobs) - len(updates) - len(errors)
+        ))
+    for idx, e in errors.items():
+        print("Unable to refresh {}: {}".format(movies_db.loc[idx, 'title'], e))
+    profiler.count('streams refreshed', len(updates))
+    profiler.count('streams failed', len(errors))
+    for name, count in sorted(provider_index.counts().items()):
+        if count != provider_counts.get(name, 0):
+            print("{}: {} -> {} movies".format(name, provider_counts.get(name, 0), count))
+    with profiler.phase('db.update'):
+        movies_db = store.updateMany(movies_db, updates)
+    checkpoint.clear()
 
 if updateratings:
+    profiler.mark('updateratings')
     print("\nUpdating database with latest predicted ratings...\n")
-    browser = webdriver.Chrome(config['WEBDRIVER_PATH'])
-
-    ## login
-    loginpage = 'https://movielens.org/login'
-    browser.get(loginpage)
-    inputs = browser.find_elements_by_tag_name('input')
-    inputs[0].send_keys(config['MOVIELENS_UN'])
-    inputs[1].send_keys(config['MOVIELENS_PW'])
-    submitbutton = browser.find_element_by_tag_name('button')
-    submitbutton.click()
-
-    time.sleep(3)
-    ## loop through movies in DB
-    for idx, row in movies_db.iterrows():
-        print(movies_db.loc[idx, 'title'])
-        print('Previous rating: {}'.format(
-            tryFloat(movies_db.loc[idx, 'rating'], get = True)
+    checkpoint = Checkpoint('updateratings', movies_db, args.resume)
+    resumed = checkpoint.resumed()
+    if resumed:
+        print("Resuming: {} ratings were refreshed before the last run stopped.".format(len(resumed)))
+        movies_db = store.updateMany(movies_db, resumed)
+    jobs = []
+    for idx in refreshOrder(movies_db, 'rating_checked'):
+        if idx in resumed:
+            continue
+        movielens_id = movies_db.loc[idx, 'movielens_id']
+        if not movieStore.isMissing(movielens_id) and tryFloat(movielens_id):
+            jobs.append((idx, (tryInt(float(movielens_id), get = True), budget)))
+    browsers = max(1, min(args.browsers, len(jobs)))
+    pool = DriverPool(config['WEBDRIVER_PATH'], browsers, config['MOVIELENS_UN'], config['MOVIELENS_PW'],
+                      timeout = args.page_timeout) if len(jobs) else None
+    progress = profiler.Progress(len(jobs), 'ratings')
+
+    def printRating(idx, update):
+        progress.step()
+        checkpoint.record(idx, update)
+        print("{} -- {} -> {}".format(
+            movies_db.loc[idx, 'title'], tryFloat(movies_db.loc[idx, 'rating'], get = True), update['rating']
+        ))
+
+    try:
+        updates, errors = runConcurrent(
+            [(idx, (pool,) + job) for idx, job in jobs], refreshRating, browsers, printRating, budget
+        )
+    finally:
+        checkpoint.write()
+        if pool is not None:
+            pool.close()
+    if len(updates) + len(errors) < len(jobs):
+        print("Budget reached; {} ratings left to refresh next time.".format(
+            len(jobs) - len(updates) - len(errors)
+        ))
+    ## failed pages are skipped; their rating_checked is left alone so they
+    ## come up first next time
+    for idx, e in errors.items():
+        print("Unable to refresh the rating of {}: {}".format(
+            movies_db.loc[idx, 'title'], str(e).strip().split('\n')[0] or type(e).__name__
         ))
-        movielens_id = tryFloat(movies_db.loc[idx, 'movielens_id'], get = True)
-        if movielens_id != '' and not np.isnan(movielens_id):
-            url = 'https://movielens.org/movies/' + str(tryInt(movielens_id, get = True))
-            while True:
-                try:
-                    browser.get(url)
-                    time.sleep(0.5)
-                    inner = browser.execute_script("return document.body.innerHTML")
-                    soup = BeautifulSoup(inner, features = "lxml")
-                    ## predicted rating
-                    rating = soup.find(
-                        'div', {'class': 'movie-details-heading'}
-                    ).findNext('div').text
-                    rating = re.findall("\d+\.\d+", rating)[0]
-                    rating = float(rating)
-                    print('Updated rating: {}'.format(rating))
-                    ## number of ratings
-                    numratings = soup.findAll(
-                        'div', {'class': 'movie-details-heading'}
-                    )[1].text
-                    numratings = tryInt(
-                        numratings.split('Average of ')[1].split(' ')[0].replace(',', ''),
-                        get = True
-                    )
-                    ## average rating
-                    avgrating = soup.findAll(
-                        'div', {'class': 'movie-details-heading'}
-                    )[1].findNext('div').text
-                    avgrating = re.findall("\d+\.\d+", avgrating)[0]
-                    avgrating = float(avgrating)
-
-                    ## update
-                    movies_db.at[idx, 'rating'] = rating
-                    movies_db.at[idx, 'numratings'] = numratings
-                    movies_db.at[idx, 'avgrating'] = avgrating
-                except:
-                    print("MovieLens not reached. Try again...")
-                    print("** Rate Limit was likely exceeded. Please use VPN. **")
-                else:
-                    break
-
-movies_db.reset_index(inplace = True, drop = True)
-with open('databases/movies_db.json', 'w') as outfile:
-    json.dump(list(movies_db.T.to_dict().values()), outfile)
+    profiler.count('ratings refreshed', len(updates))
+    profiler.count('ratings failed', len(errors))
+    with profiler.phase('db.update'):
+        movies_db = store.updateMany(movies_db, updates)
+    checkpoint.clear()
+
+profiler.mark('save')
+movies_db = store.flush(movies_db)
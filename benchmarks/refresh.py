@@ -0,0 +1,107 @@
+################################################################################
+## measures the throughput of addMovies.py --updatestreaming against the local
+## stand-in (standIn.py). every job is streamLookup.refreshStreams -- the
+## JustWatch and Rotten Tomatoes clients, the response cache and the retries of
+## retryLayer.py -- run through refreshEngine's worker pool and host limiter,
+## with standIn.install pointing the clients at the stand-in. the stand-in runs
+## in-process with the given latency, error rates and rate limits, and each
+## worker count reports its wall time, movies and requests per second and the
+## response statuses the stand-in sent.
+##
+## the first jobs are the movies with canned responses under fixtures/standin
+## (fixture_movies); the rest get synthetic ones. the response cache is off
+## unless --cache is given, so every job goes to the stand-in.
+##
+##   python benchmarks/refresh.py --jobs 200 --workers 1,4,8,16 --latency 0.1
+##   python benchmarks/refresh.py --errors 500=0.05,429=0.05 --rate justwatch=4
+################################################################################
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo)
+import responseCache
+import retryLayer
+import standIn
+import streamLookup
+from refreshEngine import HostLimiter, runConcurrent
+
+## (title, JustWatch id) of the movies in fixtures/standin
+fixture_movies = [('Heat', 10001), ('Amelie', 10002), ('Stalker', 10003)]
+
+def makeJobs(jobs):
+    movies = fixture_movies + [("Movie {}".format(i), standIn.stableInt("Movie {}".format(i)) % 100000)
+                               for i in range(max(0, jobs - len(fixture_movies)))]
+    return movies[:jobs]
+
+def run(server_stats, movies, workers, rates):
+    limiter = HostLimiter(rates)
+    jw = streamLookup.getJustWatchClient()
+    before = json.loads(json.dumps(server_stats))
+    start = time.perf_counter()
+    ## refreshStreams reports each match on stdout
+    with contextlib.redirect_stdout(io.StringIO()):
+        results, errors = runConcurrent(
+            ((i, (title, jw_id, float('nan'), [], jw, limiter)) for i, (title, jw_id) in enumerate(movies)),
+            streamLookup.refreshStreams, workers = workers
+        )
+    elapsed = time.perf_counter() - start
+    statuses = {}
+    for host, counts in server_stats.items():
+        for code, n in counts.items():
+            n -= before.get(host, {}).get(code, 0)
+            if n:
+                statuses[code] = statuses.get(code, 0) + n
+    return elapsed, statuses, len(results), len(errors)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type = int, default = 100, help = "movies to refresh per run")
+    parser.add_argument("--workers", default = '1,4,8,16', help = "worker counts to try, separated by commas")
+    parser.add_argument("--latency", default = '0.1', help = "stand-in latency, as for standIn.py")
+    parser.add_argument("--jitter", default = None)
+    parser.add_argument("--errors", default = None)
+    parser.add_argument("--rate", default = None, help = "stand-in rate limits, as for standIn.py")
+    parser.add_argument("--client-rate", default = 'justwatch=0,rottentomatoes=0',
+                        help = "client-side requests per second per host (0 for no limit)")
+    parser.add_argument("--retries", type = int, default = retryLayer.max_attempts,
+                        help = "attempts per request (see retryLayer.py)")
+    parser.add_argument("--cache", help = "keep the response cache on (in a temporary file)", action = "store_true")
+    args = parser.parse_args()
+
+    ## fixtures and config/providers.json are read relative to the repo
+    os.chdir(repo)
+    standin = standIn.StandIn(latency = standIn.parseSettings(args.latency),
+                              jitter = standIn.parseSettings(args.jitter),
+                              errors = {int(k): v for k, v in standIn.parseSettings(args.errors).items()},
+                              rates = standIn.parseSettings(args.rate))
+    server = standin.serve(0, background = True)
+    standIn.install('http://127.0.0.1:{}'.format(server.server_address[1]))
+    cache_dir = tempfile.mkdtemp()
+    responseCache.configure(enabled = args.cache, path = os.path.join(cache_dir, 'response_cache.sqlite'))
+    ## loaded up front so a stale config/providers.json isn't refreshed (and
+    ## rewritten) from the stand-in
+    with open('config/providers.json', 'r') as f:
+        streamLookup.providers = json.load(f)
+    rates = standIn.parseSettings(args.client_rate)
+    movies = makeJobs(args.jobs)
+
+    print("{:>8}  {:>9}  {:>9}  {:>9}  statuses".format('workers', 'seconds', 'movies/s', 'req/s'))
+    for workers in [int(w) for w in args.workers.split(',') if w.strip()]:
+        retryLayer.configure(concurrency = workers, attempts = args.retries)
+        elapsed, statuses, done, failed = run(standin.stats, movies, workers, rates)
+        requests = sum(statuses.values())
+        print("{:>8}  {:9.3f}  {:9.1f}  {:9.1f}  {}{}".format(
+            workers, elapsed, done / elapsed if elapsed > 0 else 0,
+            requests / elapsed if elapsed > 0 else 0,
+            ", ".join("{}: {}".format(k, statuses[k]) for k in sorted(statuses)),
+            " ({} movies failed)".format(failed) if failed else ""
+        ))
+    server.shutdown()
@@ -0,0 +1,53 @@
+################################################################################
+## times how long chooseMovie.py takes to reach its first prompt. the script
+## is run against a synthetic database in a scratch directory and the clock
+## stops when the genre prompt is printed.
+##
+##   python benchmarks/startup.py --rows 2000 --runs 5
+################################################################################
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import synthDB
+
+repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+prompt = b"Which genre(s)"
+
+def timeToPrompt(workdir, script = 'chooseMovie.py', extra_args = []):
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, '-u', os.path.join(repo, script)] + extra_args,
+        cwd = workdir, stdin = subprocess.PIPE, stdout = subprocess.PIPE,
+        stderr = subprocess.STDOUT
+    )
+    seen = b''
+    while prompt not in seen:
+        chunk = proc.stdout.read1(4096)
+        if not chunk:
+            proc.wait()
+            raise RuntimeError("{} exited before prompting:\n{}".format(script, seen.decode()))
+        seen += chunk
+    elapsed = time.perf_counter() - start
+    proc.kill()
+    proc.wait()
+    return elapsed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type = int, default = 2000, help = "movies in the synthetic DB")
+    parser.add_argument("--runs", type = int, default = 5)
+    args = parser.parse_args()
+    workdir = tempfile.mkdtemp()
+    try:
+        synthDB.writeDB(os.path.join(workdir, 'databases', 'movies_db.json'), args.rows)
+        times = sorted(timeToPrompt(workdir) for _ in range(args.runs))
+        print("chooseMovie.py first prompt with {} movies: median {:.3f}s, best {:.3f}s".format(
+            args.rows, times[len(times) // 2], times[0]
+        ))
+    finally:
+        shutil.rmtree(workdir)
@@ -0,0 +1,186 @@
+################################################################################
+## times the DB code paths against synthetic databases (synthDB.py) of a range
+## of sizes: loading (JSON parse, columnar sidecar, lazy sidecar), genre
+## filtering as chooseMovie.py does it, sorting (full and top 20), a single
+## add plus save, a removeMovie.py batch lookup and removal, the
+## whatToWatch.py title join and the dedupMovies.py grouping. each timing is the median of --runs.
+## results are written as JSON, tagged with the git commit, so runs can be
+## compared across commits:
+##
+##   python benchmarks/suite.py --rows 1000,10000,100000
+##   python benchmarks/suite.py --rows 1000000 --runs 1
+##   python benchmarks/suite.py --compare benchmarks/results/<older>.json
+################################################################################
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import synthDB
+
+repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo)
+import movieStore
+from genreIndex import GenreIndex
+from movieLookup import MovieLookup
+from queryShell import prepareMovies, default_sort
+from resultView import rankRows
+from whatToWatch import join
+from dedupMovies import findGroups
+
+results_dir = os.path.join(repo, 'benchmarks', 'results')
+genre_query = '(drama or comedy) and not horror'
+## the whatToWatch.py lists are a Letterboxd watchlist and a MovieLens top
+## list, so they're capped well below the DB size
+max_watchlist = 2000
+
+def median(times):
+    times = sorted(times)
+    return times[len(times) // 2]
+
+def timed(fn, runs, setup = None):
+    ## median seconds of fn(setup()) over runs; setup isn't timed
+    times = []
+    for _ in range(runs):
+        arg = setup() if setup is not None else None
+        start = time.perf_counter()
+        fn(arg) if setup is not None else fn()
+        times.append(time.perf_counter() - start)
+    return median(times)
+
+def gitCommit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd = repo,
+                                       stderr = subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def benchSize(rows, runs, workdir):
+    db_path = os.path.join(workdir, 'databases', 'movies_db.json')
+    pristine = os.path.join(workdir, 'pristine.json')
+    synthDB.writeDB(pristine, rows)
+    os.makedirs(os.path.join(workdir, 'databases'), exist_ok = True)
+
+    def fresh(keep_sidecar = False):
+        if not keep_sidecar:
+            shutil.rmtree(os.path.join(workdir, 'databases', '.cache'), ignore_errors = True)
+        journal = movieStore.journalPath(db_path)
+        if os.path.exists(journal):
+            os.remove(journal)
+        shutil.copyfile(pristine, db_path)
+        ## keep the copy's mtime so a sidecar built from it stays valid
+        shutil.copystat(pristine, db_path)
+        return movieStore.JSONStore(db_path)
+
+    out = {}
+    out['load_json'] = timed(lambda store: store.load(), runs, fresh)
+    fresh().load()
+    out['load_sidecar'] = timed(lambda store: store.load(), runs, lambda: fresh(True))
+    out['load_lazy'] = timed(lambda store: store.load(lazy = True), runs, lambda: fresh(True))
+
+    movies = prepareMovies(fresh(True).load(lazy = True))
+    out['prepare'] = timed(lambda: prepareMovies(movies), runs)
+    out['genre_index'] = timed(lambda: GenreIndex(list(movies.genres.values)), runs)
+    genre_index = GenreIndex(list(movies.genres.values))
+    out['genre_filter'] = timed(lambda: movies.loc[genre_index.evaluate(genre_query), ], runs)
+    out['sort_full'] = timed(lambda: rankRows(movies, default_sort), runs)
+    out['sort_top20'] = timed(lambda: rankRows(movies, default_sort, 20), runs)
+
+    new_movie = synthDB.makeMovie(rows, random.Random(1))
+
+    def loaded():
+        store = fresh(True)
+        return store, store.load()
+
+    def addSave(arg):
+        store, movies_db = arg
+        movies_db = store.insert(movies_db, new_movie)
+        store.flush(movies_db)
+    out['add_save'] = timed(addSave, runs, loaded)
+
+    def lazyLoaded():
+        store = fresh(True)
+        return store, store.load(lazy = True)
+
+    queries = list(synthDB.makeMovies(min(rows, 20), seed = 4))
+    titles = ["{} ({})".format(m['title'], int(m['year'])) for m in queries]
+
+    def remove(arg):
+        ## removeMovie.py --batch: index the titles, resolve a list, remove the
+        ## matches in one go (archiving is left out)
+        store, movies_db = arg
+        lookup = MovieLookup(movies_db)
+        found = set()
+        for title in titles:
+            found.update(lookup.find(title)[0][:1])
+        store.removeMany(movies_db, sorted(found))
+    out['remove'] = timed(remove, runs, lazyLoaded)
+
+    titles = [m['title'] for m in synthDB.makeMovies(min(rows, max_watchlist), seed = 2)]
+    watchlist = {str(i): {'title' : m['title'], 'year' : str(int(m['year']))}
+                 for i, m in enumerate(synthDB.makeMovies(min(rows, max_watchlist), seed = 3))}
+    out['what_to_watch'] = timed(lambda: join(titles, watchlist), runs)
+
+    movies_db = fresh(True).load()
+    out['dedup'] = timed(lambda: findGroups(movies_db), runs)
+    return out
+
+def compare(report, old_path):
+    with open(old_path, 'r') as f:
+        old = json.load(f)
+    print("\nCompared with {} ({}):".format(old_path, old.get('commit')))
+    for rows, timings in report['results'].items():
+        before = old['results'].get(rows)
+        if before is None:
+            continue
+        for op, seconds in timings.items():
+            if op in before and before[op] > 0:
+                print("  {:>8} rows  {:<14} {:9.4f}s -> {:9.4f}s  ({:.2f}x)".format(
+                    rows, op, before[op], seconds, before[op] / seconds if seconds > 0 else float('inf')
+                ))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", default = '1000,10000,100000',
+                        help = "DB sizes to run, separated by commas (up to 1000000)")
+    parser.add_argument("--runs", type = int, default = 3, help = "runs per timing; the median is kept")
+    parser.add_argument("--out", default = None,
+                        help = "where to write the JSON report (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", default = None, help = "an earlier report to compare against")
+    args = parser.parse_args()
+
+    commit = gitCommit()
+    report = {'commit' : commit,
+              'timestamp' : time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'python' : platform.python_version(),
+              'pandas' : pd.__version__,
+              'numpy' : np.__version__,
+              'runs' : args.runs,
+              'results' : {}}
+    for rows in [int(r) for r in args.rows.split(',') if r.strip()]:
+        workdir = tempfile.mkdtemp()
+        try:
+            timings = benchSize(rows, args.runs, workdir)
+        finally:
+            shutil.rmtree(workdir, ignore_errors = True)
+        report['results'][str(rows)] = timings
+        print("{} rows:".format(rows))
+        for op, seconds in timings.items():
+            print("  {:<14} {:9.4f}s".format(op, seconds))
+
+    out = args.out or os.path.join(results_dir, '{}.json'.format(commit or time.strftime('%Y%m%d-%H%M%S')))
+    if os.path.dirname(out):
+        os.makedirs(os.path.dirname(out), exist_ok = True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent = 2)
+    print("\nWrote {}".format(out))
+    if args.compare is not None:
+        compare(report, args.compare)
@@ -0,0 +1,66 @@
+################################################################################
+## generates synthetic movies_db.json files with the schema written by
+## addMovies.py (see databases/movies_db_EXAMPLE.json), for benchmarking the
+## scripts without a real database.
+##
+##   python benchmarks/synthDB.py 10000 /tmp/bench/databases/movies_db.json
+################################################################################
+
+import argparse
+import json
+import os
+import random
+
+genres = ['Action', 'Adventure', 'Animation', 'Comedy', 'Crime', 'Documentary',
+          'Drama', 'Family', 'Fantasy', 'Foreign', 'History', 'Horror', 'Music',
+          'Mystery', 'Romance', 'Science Fiction', 'Stand-Up', 'Thriller', 'War',
+          'Western']
+services = ['Netflix', 'Amazon Prime Video', 'HBO Max', 'Hulu', 'Apple TV Plus',
+            'Tubi TV', 'Kanopy', 'Showtime', 'PBS', 'YouTube Free']
+words = ['night', 'river', 'last', 'city', 'love', 'war', 'dark', 'summer', 'house',
+         'king', 'girl', 'man', 'ghost', 'road', 'star', 'heart', 'blood', 'dream',
+         'silent', 'golden', 'lost', 'winter', 'secret', 'wild', 'fire', 'moon']
+
+def makeMovie(i, rng):
+    title = ' '.join(rng.choice(words) for _ in range(rng.randint(1, 4))).title()
+    streams = rng.sample(services, rng.choice([0, 0, 1, 1, 2, 3]))
+    return {
+        'movielens_id' : float(i + 1),
+        'netflix_id' : None,
+        'tmdb_id' : float(rng.randint(1, 900000)),
+        'imdb_id' : 'tt{:07d}'.format(rng.randint(1, 9999999)),
+        'title' : title,
+        'rating' : round(rng.uniform(0.5, 5.0), 2),
+        'netflix_rating' : None,
+        'genres' : rng.sample(genres, rng.randint(1, 4)),
+        'netflix_instant' : 'Netflix' in streams,
+        'streams' : streams,
+        'year' : float(rng.randint(1920, 2026)),
+        'runtime' : float(rng.randint(70, 200)),
+        'overview' : ' '.join(rng.choice(words) for _ in range(40)).capitalize() + '.',
+        'tagline' : ' '.join(rng.choice(words) for _ in range(6)).capitalize() + '.',
+        'jw_id' : float(rng.randint(1, 500000)),
+        'rt_score' : float(rng.randint(0, 100)) if rng.random() < 0.8 else None,
+        'numratings' : rng.randint(1, 90000),
+        'avgrating' : round(rng.uniform(0.5, 5.0), 2)
+    }
+
+def makeMovies(n, seed = 0):
+    rng = random.Random(seed)
+    return [makeMovie(i, rng) for i in range(n)]
+
+def writeDB(path, n, seed = 0):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+    with open(path, 'w') as f:
+        json.dump(makeMovies(n, seed), f)
+    return path
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("rows", type = int, help = "number of movies")
+    parser.add_argument("out", help = "path of the movies_db.json to write")
+    parser.add_argument("--seed", type = int, default = 0)
+    args = parser.parse_args()
+    writeDB(args.out, args.rows, args.seed)
+    print("Wrote {} movies to {}.".format(args.rows, args.out))
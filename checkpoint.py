@@ -0,0 +1,101 @@
+################################################################################
+## resumable progress for the long update loops in addMovies.py. while
+## --updatestreaming or --updateratings runs, the rows refreshed so far and the
+## fields they were given are written to databases/refresh_checkpoint.json
+## every checkpoint_rows rows or checkpoint_seconds seconds, and when the run
+## stops on an error or Ctrl-C. the file is replaced atomically (written to a
+## temp file, fsync'd, renamed), so a crash mid-write leaves the previous
+## checkpoint intact.
+##
+## with --resume, the saved fields are applied to the DB and those rows are
+## skipped; without it an old checkpoint is discarded. once a loop's updates are
+## in the DB its checkpoint is cleared.
+##
+## rows are keyed by MovieLens id, or by normalized title and year for movies
+## without one, since row labels change when the DB is compacted.
+################################################################################
+
+import json
+import os
+import time
+from movieStore import jsonValue
+from titleKeys import titleYearKey
+
+checkpoint_path = 'databases/refresh_checkpoint.json'
+checkpoint_rows = 50
+checkpoint_seconds = 30.0
+
+def rowKey(row):
+    try:
+        movielens_id = float(row.get('movielens_id'))
+        if movielens_id == movielens_id:
+            return 'ml:{}'.format(int(movielens_id))
+    except (TypeError, ValueError):
+        pass
+    return 'title:' + titleYearKey(row.get('title'), row.get('year'))
+
+def readCheckpoints(path = checkpoint_path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except ValueError:
+        return {}
+
+def writeAtomic(path, data):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, default = jsonValue)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class Checkpoint(object):
+    def __init__(self, phase, movies_db, resume = False, path = checkpoint_path):
+        ## phase names the loop ('updatestreaming', 'updateratings'); each has
+        ## its own entry in the file
+        self.phase = phase
+        self.path = path
+        self.keys = {idx: rowKey(row) for idx, row in zip(
+            movies_db.index, movies_db[[c for c in ['movielens_id', 'title', 'year'] if c in movies_db.columns]]
+            .to_dict('records')
+        )}
+        saved = readCheckpoints(path).get(phase)
+        self.done = {}
+        if saved is not None:
+            if resume:
+                self.done = saved['done']
+            else:
+                print("Discarding the checkpoint of an interrupted {} run ({} movies); pass --resume to "
+                      "continue it instead.".format(phase, len(saved['done'])))
+        self.unsaved = 0
+        self.written = time.monotonic()
+
+    def resumed(self):
+        ## {row label: fields} of the rows completed by the interrupted run
+        labels = {key: idx for idx, key in self.keys.items()}
+        return {labels[key]: fields for key, fields in self.done.items() if key in labels}
+
+    def record(self, idx, fields):
+        self.done[self.keys[idx]] = fields
+        self.unsaved += 1
+        if self.unsaved >= checkpoint_rows or time.monotonic() - self.written >= checkpoint_seconds:
+            self.write()
+
+    def write(self):
+        checkpoints = readCheckpoints(self.path)
+        checkpoints[self.phase] = {'updated' : time.time(), 'done' : self.done}
+        writeAtomic(self.path, checkpoints)
+        self.unsaved = 0
+        self.written = time.monotonic()
+
+    def clear(self):
+        checkpoints = readCheckpoints(self.path)
+        checkpoints.pop(self.phase, None)
+        if checkpoints:
+            writeAtomic(self.path, checkpoints)
+        elif os.path.exists(self.path):
+            os.remove(self.path)
@@ -20,123 +20,153 @@
 ## html block into queue_body.html as instructed above.
 ################################################################################
 
-import csv
 import sys
-import os
-from unidecode import unidecode
-from bs4 import BeautifulSoup
-import pandas as pd
-import tmdbsimple as tmdb
-import requests
-from functools import partial
-import numpy as np
-import json
-import shutil
 import argparse
-import pdb
+import movieStore
+import profiler
+from genreIndex import GenreIndex
+from providerIndex import ProviderIndex, saveSubscriptions, subscriptions_path
+from queryShell import QueryShell, prepareMovies, printDetails, display_columns
+from resultView import Pager, rankRows, parseSort
 
 
 parser = argparse.ArgumentParser()
 parser.add_argument("--streaming", help = "only display movies that are available to stream",
                     action = "store_true")
 parser.add_argument("--sort",
-                    help = "features to sort by, descending",
+                    help = "features to sort by, separated by commas; descending unless prefixed "
+                           "with '-' or suffixed with ':asc', e.g. 'rating,-year'",
                     type = str,
-                    default = ['rating', 'rt_score'])
-args = parser.parse_args()
+                    default = 'rating,rt_score')
+parser.add_argument("--top", help = "only show the N best matches",
+                    type = int,
+                    default = None)
+parser.add_argument("--page", help = "rows per page (default: fit the terminal; 0 shows everything)",
+                    type = int,
+                    default = None)
+parser.add_argument("--providers",
+                    help = "only display movies on these services, e.g. 'netflix,hulu' (either), "
+                           "'netflix+hulu' (both) or 'mine' (your saved subscriptions)",
+                    type = str,
+                    default = None)
+parser.add_argument("--subscriptions", help = "only display movies on your saved subscriptions (same as --providers mine)",
+                    action = "store_true")
+parser.add_argument("--save-subscriptions", help = "save the services given with --providers as your subscriptions",
+                    action = "store_true")
+parser.add_argument("--shell", help = "keep the DB loaded and answer queries until 'q' (see queryShell.py)",
+                    action = "store_true")
+parser.add_argument("--profile",
+                    help = "time each phase and report it at exit, as JSON to the given file "
+                           "(default profiles/chooseMovie-<date>-<time>.json); see profiler.py",
+                    nargs = '?',
+                    const = '',
+                    default = None)
 args_vars = vars(parser.parse_args())
-if "sort" in args_vars.keys() and len(args_vars["sort"]) < 2:
-    args_vars["sort"] = [s.strip() for s in args_vars["sort"].split(",")]
+if args_vars["profile"] is not None:
+    profiler.enable(args_vars["profile"] or None)
+try:
+    args_vars["sort"] = parseSort(args_vars["sort"])
+except ValueError as e:
+    print(e)
+    sys.exit(1)
+if args_vars["subscriptions"]:
+    args_vars["providers"] = 'mine'
+
+if args_vars["shell"]:
+    profiler.mark('shell')
+    try:
+        shell = QueryShell(streaming = args_vars["streaming"], sort = args_vars["sort"],
+                           providers = args_vars["providers"])
+    except:
+        print("Failed to load database.")
+        sys.exit(1)
+    shell.repl()
+    sys.exit(0)
 
-## load database
+## load database; overview and tagline are only read for the movies displayed
+profiler.mark('load')
 try:
-    with open("databases/movies_db.json", "r") as f:
-        movies_in = json.load(f)
-        out_movies = pd.DataFrame(movies_in)
+    store = movieStore.openStore()
+    out_movies = store.load(lazy = True)
 except:
     print("Failed to load database.")
     sys.exit(1)
 
-## whether canistream.it should be checked for existing DB entries to update streams
-if args_vars["streaming"]:
-    streaming = True
+## fill any NAs in rating with netflix rating and round for display
+profiler.mark('prepare')
+out_movies = prepareMovies(out_movies)
+
+## one bitmap of movies per streaming service
+profiler.mark('index')
+provider_index = ProviderIndex(list(out_movies.streams.values), out_movies.index)
+
+if args_vars["save_subscriptions"]:
+    if args_vars["providers"] is None or args_vars["providers"] == 'mine':
+        print("Give the services to save with --providers, e.g. --providers netflix,hulu")
+        sys.exit(1)
+    try:
+        names = [provider_index.resolve(p) for p in args_vars["providers"].replace('+', ',').split(',') if p.strip()]
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    saveSubscriptions(names)
+    print("Saved {} to {}.".format(names, subscriptions_path))
+
+if args_vars["providers"] is not None:
+    ## subset out_movies to the given services
+    try:
+        out_movies = out_movies.loc[provider_index.query(args_vars["providers"]), ]
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+elif args_vars["streaming"]:
     ## subset out_movies
-    out_movies = out_movies.loc[[True if x != [] else False for x in out_movies.streams.values], ]
+    out_movies = out_movies.loc[provider_index.streaming(), ]
 else:
-    streaming = False
     print("To show only the movies that are available to stream, enter '--streaming' as a command line argument.")
 
-## fill any NAs in rating with netflix rating
-out_movies.rating.fillna(out_movies.netflix_rating, inplace = True)
-out_movies.year = out_movies.year.astype(int)
-
-complete_genres = np.unique([x for y in out_movies.genres.values for x in y]).tolist()
+## encode genres once into a bitmask per movie
+genre_index = GenreIndex(list(out_movies.genres.values))
+if genre_index.column() is not None:
+    out_movies['genre_mask'] = genre_index.column()
+complete_genres = genre_index.present
 
+profiler.mark('query')
 sorted_movies = []
 while len(sorted_movies) == 0:
     print("\nOf the following genres...\n{}".format([str(g) for g in complete_genres]))
-    genre_in = input("Which genre(s) do you want to watch? (Enter up to 3, separated by a comma, with '-' in front to exclude; or 'All'): ")
-
-    out_movies.rating = [round(o, 1) if isinstance(o, float) else np.nan for o in out_movies.rating.values]
-    out_movies.avgrating = [round(o, 1) if isinstance(o, float) else np.nan for o in out_movies.avgrating.values]
-    out_movies.numratings = [str(int(o)) if isinstance(o, int) else str("NaN") for o in out_movies.numratings.values]
-    if genre_in.lower() == 'all':
-        sorted_movies = out_movies.sort_values(args_vars["sort"], ascending = [False, False])
-    else:
-        genres_in = [g.strip() for g in genre_in.split(",")]
-
-        if len(genres_in) > 1:
-            if genres_in[0][0] == "-":
-                genres_in[0] = genres_in[0][1:]
-                genre1_idx = [False if genres_in[0].lower() in k else True for k in [[j.lower() for j in i] for i in out_movies.genres.values]]
-            else:
-                genre1_idx = [True if genres_in[0].lower() in k else False for k in [[j.lower() for j in i] for i in out_movies.genres.values]]
-            if genres_in[1][0] == "-":
-                genres_in[1] = genres_in[1][1:]
-                genre2_idx = [False if genres_in[1].lower() in k else True for k in [[j.lower() for j in i] for i in out_movies.genres.values]]
-            else:
-                genre2_idx = [True if genres_in[1].lower() in k else False for k in [[j.lower() for j in i] for i in out_movies.genres.values]]
-            genre_idx = np.array(genre1_idx) * np.array(genre2_idx)
-            if (len(genres_in) > 2):
-                if genres_in[2][0] == "-":
-                    genres_in[2] = genres_in[2][1:]
-                    genre3_idx = [False if genres_in[2].lower() in k else True for k in [[j.lower() for j in i] for i in out_movies.genres.values]]
-                else:
-                    genre3_idx = [True if genres_in[2].lower() in k else False for k in [[j.lower() for j in i] for i in out_movies.genres.values]]
-                genre_idx = genre_idx * np.array(genre3_idx)
-        else:
-            if genres_in[0][0] == "-":
-                genres_in[0] = genres_in[0][1:]
-                genre1_idx = [False if genres_in[0].lower() in k else True for k in [[j.lower() for j in i] for i in out_movies.genres.values]]
-            else:
-                genre1_idx = [True if genres_in[0].lower() in k else False for k in [[j.lower() for j in i] for i in out_movies.genres.values]]
-            genre_idx = genre1_idx
+    genre_in = input("Which genre(s) do you want to watch? (Combine with 'and', 'or', 'not' and parentheses; ',' means and, '-' in front excludes; or 'All'): ")
 
+    try:
+        genre_idx = genre_index.evaluate(genre_in)
+    except ValueError as e:
+        print(e)
+        continue
+    with profiler.phase('filter'):
         movies_genred = out_movies.loc[genre_idx, ]
-        sorted_movies = movies_genred.sort_values(args_vars["sort"], ascending = [False, False])
+    try:
+        with profiler.phase('sort'):
+            sorted_movies = rankRows(movies_genred, args_vars["sort"], args_vars["top"])
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
 
-    print("\n{}\n".format(sorted_movies[['title', 'rating', 'avgrating', 'numratings', 'rt_score', 'year', 'runtime', 'genres', 'streams']].to_string()))
+    if len(sorted_movies):
+        pager = Pager(sorted_movies, display_columns,
+                      len(sorted_movies) if args_vars["page"] == 0 else args_vars["page"])
+        with profiler.phase('render'):
+            pager.next()
 
 while True:
-    user_in = input("Enter the row index number of movie you want to know more about: (or q to quit)  ")
+    user_in = input("Enter the row index number of movie you want to know more about: (m for more rows, or q to quit)  ")
     if user_in.lower() == 'q':
         break
-    tl = sorted_movies.loc[int(user_in), 'tagline']
-    if tl is None or not len(tl): tl = 'No tagline.'
-    runtime = sorted_movies.loc[int(user_in), 'runtime']
-    if runtime is None or str(runtime) == "NaN": runtime = "???"
-    streams = sorted_movies.loc[int(user_in), 'streams']
-    if not len(streams): streams = 'Not available to stream.'
-    rt_score = sorted_movies.loc[int(user_in), 'rt_score']
-    if rt_score != 'NaN': rt_score = int(rt_score)
-    print("\n{}".format(sorted_movies.loc[int(user_in), 'title']))
-    print("\n{}".format(tl))
-    print("\n{}".format(sorted_movies.loc[int(user_in), 'overview']))
-    print("\n{}".format(int(sorted_movies.loc[int(user_in), 'year'])))
-    print("\n{} mins".format(runtime))
-    print("\n{} stars".format(round(sorted_movies.loc[int(user_in), 'rating'], 1)))
-    print("\n{} average rating".format(round(sorted_movies.loc[int(user_in), 'avgrating'], 1)))
-    print("\n{} ratings".format(sorted_movies.loc[int(user_in), 'numratings']))
-    print("\n{}%".format(rt_score))
-    print("\n{}".format(sorted_movies.loc[int(user_in), 'genres']))
-    print("\n{}\n".format(streams))
+    if user_in.lower() == 'm':
+        with profiler.phase('render'):
+            pager.next()
+        continue
+    if not user_in.strip().isdigit() or int(user_in) not in sorted_movies.index:
+        print("No row {} in the results.".format(user_in))
+        continue
+    with profiler.phase('details'):
+        printDetails(sorted_movies, int(user_in), store)
@@ -0,0 +1,176 @@
+################################################################################
+## binary, columnar sidecar of movies_db.json so loading doesn't have to parse
+## the JSON file. it holds the frame as typed by movieSchema.py. every numeric
+## column is kept as its own .npy file, opened with mmap (a nullable int column
+## as its values plus a .mask.npy of the missing ones), and the remaining
+## columns (titles, genre and stream lists) are kept in one pickle, which keeps
+## the shared genre and stream lists shared. the long text columns (overview,
+## tagline) go in a second pickle and are also kept as a utf-8 blob plus an
+## offsets array, so read-only tools can leave them out of the frame entirely
+## and only decode the rows they display.
+##
+## the sidecar lives in databases/.cache/<name>/ and describes the main JSON
+## file only; the journal is replayed on top of it as usual. its manifest
+## records the main file's mtime, size and md5, and it is rebuilt whenever
+## they don't match (a file with a new mtime but the same hash is reused).
+################################################################################
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import numpy as np
+import pandas as pd
+
+## text columns that can be left out of the frame and read per row
+lazy_columns = ['overview', 'tagline']
+manifest_name = 'manifest.json'
+## bump when the layout changes so older sidecars are rebuilt
+version = 2
+
+def sidecarDir(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(os.path.dirname(path), '.cache', name)
+
+def fileHash(path):
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+class ColumnCache(object):
+    def __init__(self, path):
+        self.path = path
+        self.dir = sidecarDir(path)
+        self.manifest = None
+        self.offsets = {}
+        self.blobs = {}
+
+    def readManifest(self):
+        try:
+            with open(os.path.join(self.dir, manifest_name), 'r') as f:
+                manifest = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        return manifest if manifest.get('version') == version else None
+
+    def valid(self):
+        ## the manifest if the sidecar matches the main file, else None
+        manifest = self.readManifest()
+        if manifest is None or not os.path.exists(self.path):
+            return None
+        st = os.stat(self.path)
+        if manifest['mtime'] == st.st_mtime_ns and manifest['size'] == st.st_size:
+            return manifest
+        if manifest['size'] == st.st_size and fileHash(self.path) == manifest['hash']:
+            ## e.g. restored from a backup; same content, so just restamp it
+            manifest['mtime'] = st.st_mtime_ns
+            self.writeManifest(manifest)
+            return manifest
+        return None
+
+    def writeManifest(self, manifest):
+        tmp_path = os.path.join(self.dir, manifest_name + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(self.dir, manifest_name))
+
+    def write(self, movies_db, base_hash):
+        ## movies_db is the main file as loaded, before any journal replay
+        if os.path.exists(self.dir):
+            shutil.rmtree(self.dir)
+        os.makedirs(self.dir)
+        columns = []
+        objects = {}
+        texts = {}
+        for col in movies_db.columns:
+            values = movies_db[col].values
+            if col in lazy_columns:
+                kind = 'text'
+                blob = [json.dumps(v if isinstance(v, str) else None).encode('utf-8') for v in values]
+                offsets = np.zeros(len(blob) + 1, dtype = np.int64)
+                offsets[1:] = np.cumsum([len(b) for b in blob])
+                np.save(os.path.join(self.dir, col + '.offsets.npy'), offsets)
+                with open(os.path.join(self.dir, col + '.blob'), 'wb') as f:
+                    f.write(b''.join(blob))
+                texts[col] = movies_db[col].reset_index(drop = True)
+            elif isinstance(values, pd.arrays.IntegerArray):
+                kind = 'nullable'
+                mask = np.asarray(values.isna(), dtype = bool)
+                np.save(os.path.join(self.dir, col + '.npy'),
+                        values.to_numpy(dtype = values.dtype.numpy_dtype, na_value = 0))
+                np.save(os.path.join(self.dir, col + '.mask.npy'), mask)
+            elif values.dtype.kind in 'iuf':
+                kind = 'numeric'
+                np.save(os.path.join(self.dir, col + '.npy'), values)
+            else:
+                kind = 'object'
+                objects[col] = movies_db[col].reset_index(drop = True)
+            columns.append([col, kind])
+        for name, frame in [('objects.pkl', objects), ('text.pkl', texts)]:
+            with open(os.path.join(self.dir, name), 'wb') as f:
+                pickle.dump(frame, f, protocol = pickle.HIGHEST_PROTOCOL)
+        st = os.stat(self.path)
+        manifest = {'version' : version, 'mtime' : st.st_mtime_ns, 'size' : st.st_size,
+                    'hash' : base_hash, 'rows' : len(movies_db), 'columns' : columns}
+        self.writeManifest(manifest)
+        ## value() reads from the sidecar just written, not an older one
+        for blob in self.blobs.values():
+            blob.close()
+        self.offsets = {}
+        self.blobs = {}
+        self.manifest = manifest
+
+    def read(self, lazy = False):
+        ## returns (movies_db, md5 of the main file), or None if the sidecar is
+        ## stale. numeric columns are memory-mapped (read-only) when lazy, and
+        ## the lazy text columns are left out; fetch them with value().
+        manifest = self.valid()
+        if manifest is None:
+            return None
+        self.manifest = manifest
+        for blob in self.blobs.values():
+            blob.close()
+        self.offsets = {}
+        self.blobs = {}
+        with open(os.path.join(self.dir, 'objects.pkl'), 'rb') as f:
+            objects = pickle.load(f)
+        if not lazy:
+            with open(os.path.join(self.dir, 'text.pkl'), 'rb') as f:
+                objects.update(pickle.load(f))
+        data = {}
+        for col, kind in manifest['columns']:
+            if kind == 'numeric':
+                data[col] = np.load(os.path.join(self.dir, col + '.npy'),
+                                    mmap_mode = 'r' if lazy else None)
+            elif kind == 'nullable':
+                data[col] = pd.arrays.IntegerArray(
+                    np.load(os.path.join(self.dir, col + '.npy'), mmap_mode = 'r' if lazy else None),
+                    np.load(os.path.join(self.dir, col + '.mask.npy'), mmap_mode = 'r' if lazy else None)
+                )
+            elif kind == 'object' or not lazy:
+                data[col] = objects[col]
+        movies_db = pd.DataFrame(data, columns = list(data), index = pd.RangeIndex(manifest['rows']),
+                                 copy = False)
+        return movies_db, manifest['hash']
+
+    def values(self, col, positions):
+        if col not in self.offsets:
+            self.offsets[col] = np.load(os.path.join(self.dir, col + '.offsets.npy'), mmap_mode = 'r')
+            self.blobs[col] = open(os.path.join(self.dir, col + '.blob'), 'rb')
+        offsets, blob = self.offsets[col], self.blobs[col]
+        out = []
+        for p in positions:
+            blob.seek(int(offsets[p]))
+            out.append(json.loads(blob.read(int(offsets[p + 1] - offsets[p])).decode('utf-8')))
+        return out
+
+    def value(self, col, position):
+        ## a single lazy text value of the main file's row `position`
+        if self.manifest is None or col not in dict(self.manifest['columns']):
+            return None
+        if position < 0 or position >= self.manifest['rows']:
+            return None
+        return self.values(col, [position])[0]
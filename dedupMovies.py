@@ -0,0 +1,226 @@
+################################################################################
+## finds and merges duplicate movies in movies_db, e.g. rows left by the old
+## Netflix queue importer next to the MovieLens-based rows of addMovies.py,
+## with ids stored as floats in one and strings in the other.
+##
+## rows are grouped into blocks that share a key -- tmdb_id, imdb_id, jw_id,
+## movielens_id, netflix_id, or normalized title + year -- and only rows in the
+## same block are compared, every pair of them, so the pass is close to
+## linear in the size of the DB. two rows (or groups already merged) are
+## joined unless they carry different values of an id (tmdb, imdb, jw,
+## movielens), which would make them different movies that happen to share a
+## title and year; rows joined on title + year also need runtimes within
+## max_runtime_gap minutes, so a chain of rows each within it of the next is
+## one group.
+##
+## each group is merged into one row, the survivor: the row with a MovieLens
+## id, then the most recently refreshed, then the most complete. fields are
+## filled in this order of precedence:
+##   ids, title, year, runtime, overview, tagline, netflix fields
+##                    the survivor's value, else the next row's that has one
+##   rating, avgrating, numratings
+##                    from the rows with a MovieLens id first
+##   streams, rt_score and their *_checked times
+##                    from the most recently checked row
+##   rating_checked   the latest
+##   genres           the union, in order
+##
+##   python dedupMovies.py            lists the duplicate groups
+##   python dedupMovies.py --apply    merges them (the DB is backed up first)
+################################################################################
+
+import argparse
+import numpy as np
+import pandas as pd
+import movieStore
+from movieStore import isMissing
+from movieLookup import idValue
+from titleKeys import normalizeTitle
+
+## id columns that identify a movie: rows with different values are different
+strong_ids = ['tmdb_id', 'imdb_id', 'jw_id', 'movielens_id']
+block_columns = strong_ids + ['netflix_id']
+## title + year blocks bigger than this are skipped as too generic to be duplicates
+max_block = 50
+max_runtime_gap = 10
+
+def missing(value):
+    return isMissing(value) or (isinstance(value, str) and value.strip() == '') \
+        or (isinstance(value, list) and not value)
+
+class Groups(object):
+    ## union-find over row positions, keeping the ids each group carries
+    def __init__(self, ids):
+        self.parent = list(range(len(ids)))
+        self.ids = ids
+
+    def find(self, pos):
+        while self.parent[pos] != pos:
+            self.parent[pos] = self.parent[self.parent[pos]]
+            pos = self.parent[pos]
+        return pos
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return True
+        ia, ib = self.ids[ra], self.ids[rb]
+        if any(col in ia and col in ib and ia[col] != ib[col] for col in strong_ids):
+            return False
+        merged = dict(ib)
+        merged.update(ia)
+        self.parent[rb] = ra
+        self.ids[ra] = merged
+        self.ids[rb] = None
+        return True
+
+def idColumn(column):
+    ## idValue of every value, None where missing, with the numbers parsed in one pass
+    if column.dtype.kind in 'iu':
+        ## already nullable ints (movieSchema.py)
+        return [None if v is pd.NA else v for v in column.tolist()]
+    values = column.tolist()
+    numbers = pd.to_numeric(pd.Series(values, dtype = object), errors = 'coerce') \
+        .to_numpy(dtype = float, na_value = np.nan)
+    ids = []
+    for value, number in zip(values, numbers):
+        if number == number:
+            ids.append(int(number))
+        elif isinstance(value, str) and value.strip():
+            ids.append(value.strip().lower())
+        else:
+            ids.append(None)
+    return ids
+
+def blockKeys(movies_db, id_values):
+    ## {key: [positions]} for every key shared by more than one row
+    blocks = {}
+    for col, values in id_values.items():
+        for pos, v in enumerate(values):
+            if v is not None:
+                blocks.setdefault((col, v), []).append(pos)
+    if 'title' in movies_db.columns and 'year' in movies_db.columns:
+        years = pd.to_numeric(movies_db.year, errors = 'coerce').to_numpy(dtype = float, na_value = np.nan)
+        for pos, (title, year) in enumerate(zip(movies_db.title.tolist(), years)):
+            key = normalizeTitle(title) if year == year else ''
+            if key:
+                blocks.setdefault(('title', "{} ({})".format(key, int(year))), []).append(pos)
+    return {key: positions for key, positions in blocks.items() if len(positions) > 1}
+
+def findGroups(movies_db):
+    ## lists of row labels that are the same movie
+    id_values = {col: idColumn(movies_db[col]) for col in block_columns if col in movies_db.columns}
+    strong = [(col, id_values[col]) for col in strong_ids if col in id_values]
+    groups = Groups([{col: values[pos] for col, values in strong if values[pos] is not None}
+                     for pos in range(len(movies_db))])
+    runtimes = pd.to_numeric(movies_db.runtime, errors = 'coerce').to_numpy(dtype = float, na_value = np.nan) \
+        if 'runtime' in movies_db.columns else np.full(len(movies_db), np.nan)
+    for (kind, key), positions in blockKeys(movies_db, id_values).items():
+        if kind == 'title' and len(positions) > max_block:
+            continue
+        ## every pair, so a row that can't join the first one (a different
+        ## id, a runtime too far off) can still join the others, and chains of
+        ## rows each close to the next end up in one group
+        for i, a in enumerate(positions):
+            for b in positions[i + 1:]:
+                if kind == 'title' and abs(runtimes[a] - runtimes[b]) > max_runtime_gap:
+                    continue
+                groups.union(a, b)
+    members = {}
+    for pos in range(len(movies_db)):
+        members.setdefault(groups.find(pos), []).append(movies_db.index[pos])
+    return [labels for labels in members.values() if len(labels) > 1]
+
+def checked(row, col):
+    value = pd.to_numeric(row.get(col), errors = 'coerce')
+    return -np.inf if missing(value) else float(value)
+
+def rank(rows):
+    ## row labels, survivor first
+    def key(label):
+        row = rows[label]
+        return (missing(row.get('movielens_id')),
+                -max(checked(row, c) for c in ['streams_checked', 'rt_checked', 'rating_checked']),
+                -sum(not missing(v) for v in row.values()),
+                label)
+    return sorted(rows, key = key)
+
+def mergeGroup(movies_db, labels):
+    ## (survivor label, {column: merged value} where it differs)
+    rows = {label: movies_db.loc[label].to_dict() for label in labels}
+    order = rank(rows)
+    survivor = rows[order[0]]
+    merged = {}
+
+    def first(col, order):
+        for label in order:
+            if not missing(rows[label].get(col)):
+                return rows[label][col]
+        return None
+
+    for col in movies_db.columns:
+        if col in ['rating', 'avgrating', 'numratings']:
+            value = first(col, [l for l in order if not missing(rows[l].get('movielens_id'))] + order)
+        elif col in ['streams', 'streams_checked', 'rt_score', 'rt_checked']:
+            ## the latest check wins even when it found nothing
+            check = 'rt_checked' if col.startswith('rt') else 'streams_checked'
+            latest = min(order, key = lambda l: -checked(rows[l], check))
+            if checked(rows[latest], check) > -np.inf:
+                value = rows[latest].get(col)
+                if missing(value) and not isinstance(value, list):
+                    continue
+            else:
+                value = first(col, order)
+        elif col == 'rating_checked':
+            value = max((rows[l][col] for l in order if not missing(rows[l].get(col))), default = None)
+        elif col == 'genres':
+            value = []
+            for label in order:
+                for g in rows[label].get(col) if isinstance(rows[label].get(col), list) else []:
+                    if g not in value:
+                        value.append(g)
+        else:
+            value = first(col, order)
+            ## numeric ids are stored as ints (movieSchema.py), whichever row
+            ## they came from
+            if col in block_columns and col != 'imdb_id' and isinstance(idValue(value), int):
+                value = idValue(value)
+        if value is None:
+            continue
+        current = survivor.get(col)
+        if missing(current) != missing(value) or (not missing(value) and value != current):
+            merged[col] = value
+    return order[0], merged
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apply", help = "merge the duplicates instead of only listing them",
+                        action = "store_true")
+    args = parser.parse_args()
+
+    store = movieStore.openStore()
+    movies_db = store.load()
+    groups = findGroups(movies_db)
+    if not groups:
+        print("No duplicates found.")
+    show = [c for c in ['title', 'year', 'movielens_id', 'tmdb_id', 'imdb_id', 'jw_id', 'netflix_id']
+            if c in movies_db.columns]
+    updates = {}
+    removed = []
+    for labels in groups:
+        survivor, merged = mergeGroup(movies_db, labels)
+        print("\n{}".format(movies_db.loc[[survivor] + [l for l in labels if l != survivor], show].to_string()))
+        print("  -> keep {}{}".format(survivor, ", filling in {}".format(sorted(merged)) if merged else ""))
+        if merged:
+            updates[survivor] = merged
+        removed += [l for l in labels if l != survivor]
+    if groups:
+        print("\n{} duplicate groups, {} rows to merge away.".format(len(groups), len(removed)))
+    if groups and args.apply:
+        store.backup()
+        movies_db = store.updateMany(movies_db, updates)
+        movies_db = store.removeMany(movies_db, removed)
+        movies_db = store.flush(movies_db)
+        print("Merged.")
+    elif groups:
+        print("Run with --apply to merge them.")
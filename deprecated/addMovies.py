@@ -44,6 +44,9 @@ import json
 import shutil
 import argparse
 import pdb
+## movieStore lives in the top level of the repo
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import movieStore
 
 def search(movie):
     try:
@@ -639,13 +642,12 @@ else:
     print("To update the streaming status and rotten tomatoes scores of existing movies, enter '--update' as a command line argument.\n")
 
 ## backup database file
-shutil.copyfile('databases/movies_db.json', 'databases/backup/movies_db.json')
+store = movieStore.openStore()
+store.backup()
 
 ## load database
 try:
-    with open("databases/movies_db.json", "r") as f:
-        movies_in = json.load(f)
-        movies_db = pd.DataFrame(movies_in)
+    movies_db = store.load()
 except:
     movies_db = pd.DataFrame({
             'netflix_id' : []
@@ -796,8 +798,7 @@ if gallery_movies is not None:
     gallery_movies = pd.DataFrame(gallery_movies)
     out_movies = out_movies.append(gallery_movies, ignore_index = True)
 
-with open('databases/movies_db.json', 'w') as outfile:
-    json.dump(list(out_movies.T.to_dict().values()), outfile)
+store.save(out_movies)
 
 try:
     os.remove('new_movies.json')
@@ -0,0 +1,158 @@
+################################################################################
+## genre vocabulary and bitmask index. genre_master maps the genre names used
+## by TMDB and JustWatch onto the canonical names stored in movies_db. each
+## movie's genres are encoded once into an integer bitmask (one bit per
+## canonical genre), and genre queries are evaluated as vectorized mask
+## operations over the whole DB.
+##
+## queries combine genre names with and/or/not (or &, | and a leading '-'),
+## with parentheses for grouping; a comma means and. e.g.
+##   comedy, -horror
+##   (drama or romance) and not war
+##   science fiction | fantasy & -animation
+################################################################################
+
+import re
+import numpy as np
+
+genre_master = {'Action' : ['Action'],
+                'Action & Adventure' : ['Action', 'Adventure'],
+                'Adventure' : ['Adventure'],
+                'Animation' : ['Animation'],
+                'Comedy' : ['Comedy'],
+                'Crime' : ['Crime'],
+                'Documentary' : ['Documentary'],
+                'Drama' : ['Drama'],
+                'Family' : ['Family'],
+                'Fantasy' : ['Fantasy'],
+                'Foreign' : ['Foreign'],
+                'History' : ['History'],
+                'Horror' : ['Horror'],
+                'Kids & Family' : ['Family'],
+                'Made in Europe' : [None],
+                'Music' : ['Music'],
+                'Music & Musical' : ['Music'],
+                'Mystery' : ['Mystery'],
+                'Mystery & Thriller' : ['Mystery', 'Thriller'],
+                'Romance' : ['Romance'],
+                'Science Fiction' : ['Science Fiction'],
+                'Science-Fiction' : ['Science Fiction'],
+                'Sport' : [None],
+                'Stand-Up' : ['Stand-Up'],
+                'Thriller' : ['Thriller'],
+                'War' : ['War'],
+                'War & Military' : ['War'],
+                'Western' : ['Western']
+}
+
+canonical_genres = sorted(set(g for gs in genre_master.values() for g in gs if g is not None))
+
+token_re = re.compile(r"\(|\)|,|&|\||[^(),&|]+")
+keyword_re = re.compile(r"\b(and|or|not)\b", re.IGNORECASE)
+
+class GenreIndex(object):
+    def __init__(self, genre_lists, vocabulary = None):
+        ## genre_lists is the genres column; the vocabulary is the canonical
+        ## genres plus anything else found in the DB
+        found = sorted(set(g for gs in genre_lists if isinstance(gs, list) for g in gs))
+        if vocabulary is None:
+            vocabulary = canonical_genres
+        self.genres = list(vocabulary) + [g for g in found if g not in vocabulary]
+        self.present = found
+        self.bits = {g.lower(): i for i, g in enumerate(self.genres)}
+        self.words = max(1, (len(self.genres) + 63) // 64)
+        self.masks = np.zeros((len(genre_lists), self.words), dtype = np.uint64)
+        ## rows with the same genres share one list (movieSchema.py), so each
+        ## distinct list is encoded once
+        encoded = {}
+        for row, gs in enumerate(genre_lists):
+            if not isinstance(gs, list):
+                continue
+            mask = encoded.get(id(gs))
+            if mask is None:
+                mask = np.zeros(self.words, dtype = np.uint64)
+                for g in gs:
+                    bit = self.bits[g.lower()]
+                    mask[bit // 64] |= np.uint64(1) << np.uint64(bit % 64)
+                encoded[id(gs)] = mask
+            self.masks[row] = mask
+
+    def column(self):
+        ## the bitmask as a single integer column, when the vocabulary fits
+        return self.masks[:, 0] if self.words == 1 else None
+
+    def has(self, genre):
+        bit = self.bits.get(genre.strip().lower())
+        if bit is None:
+            raise ValueError("Unknown genre '{}'".format(genre.strip()))
+        return (self.masks[:, bit // 64] >> np.uint64(bit % 64)) & np.uint64(1) == 1
+
+    def tokens(self, query):
+        out = []
+        for chunk in token_re.findall(query):
+            if chunk in ['(', ')', ',', '&', '|']:
+                out.append({',' : 'and', '&' : 'and', '|' : 'or'}.get(chunk, chunk))
+                continue
+            for part in keyword_re.split(chunk):
+                part = part.strip()
+                if not part:
+                    continue
+                if part.lower() in ['and', 'or', 'not']:
+                    out.append(part.lower())
+                    continue
+                while part.startswith('-'):
+                    out.append('not')
+                    part = part[1:].strip()
+                if part:
+                    out.append(('genre', part))
+        return out
+
+    def evaluate(self, query):
+        ## boolean mask of the rows matching the query; 'all' matches everything
+        if query.strip().lower() == 'all':
+            return np.ones(len(self.masks), dtype = bool)
+        tokens = self.tokens(query)
+        if not tokens:
+            raise ValueError("Empty genre query")
+        pos = [0]
+
+        def peek():
+            return tokens[pos[0]] if pos[0] < len(tokens) else None
+
+        def take(expected = None):
+            tok = peek()
+            if tok is None or (expected is not None and tok != expected):
+                raise ValueError("Expected {} in '{}'".format(expected or 'a genre', query))
+            pos[0] += 1
+            return tok
+
+        def orExpr():
+            mask = andExpr()
+            while peek() == 'or':
+                take('or')
+                mask = mask | andExpr()
+            return mask
+
+        def andExpr():
+            mask = unary()
+            while peek() == 'and':
+                take('and')
+                mask = mask & unary()
+            return mask
+
+        def unary():
+            tok = take()
+            if tok == 'not':
+                return ~unary()
+            if tok == '(':
+                mask = orExpr()
+                take(')')
+                return mask
+            if isinstance(tok, tuple):
+                return self.has(tok[1])
+            raise ValueError("Unexpected '{}' in '{}'".format(tok, query))
+
+        mask = orExpr()
+        if peek() is not None:
+            raise ValueError("Unexpected '{}' in '{}'".format(peek(), query))
+        return mask
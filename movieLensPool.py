@@ -0,0 +1,130 @@
+################################################################################
+## a pool of headless Chrome drivers for refreshing MovieLens ratings
+## (addMovies.py --updateratings). one driver logs in and the others are given
+## its session cookies, so the login only happens once. images, stylesheets and
+## fonts are blocked, since only the page text is read, and each page is read as
+## soon as its movie-details-heading elements are there instead of after a
+## fixed sleep. the movies are shared out between the drivers by
+## refreshEngine.runConcurrent; a page that times out or is throttled is
+## retried with backoff (retryLayer.py), and one that still fails is recorded
+## and skipped. since its rating_checked isn't updated it's near the front of
+## the queue next time.
+################################################################################
+
+import queue
+import re
+import time
+import profiler
+import retryLayer
+import standIn
+
+movielens_url = 'https://movielens.org'
+## resources that aren't needed to read the ratings
+blocked_urls = ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.svg', '*.webp', '*.ico',
+                '*.css', '*.woff', '*.woff2', '*.ttf', '*.otf']
+
+def makeDriver(driver_path, headless = True):
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument('--headless=new')
+    options.add_argument('--blink-settings=imagesEnabled=false')
+    options.add_experimental_option('prefs', {
+        'profile.managed_default_content_settings.images' : 2,
+        'profile.managed_default_content_settings.stylesheets' : 2,
+        'profile.managed_default_content_settings.fonts' : 2
+    })
+    driver = webdriver.Chrome(service = Service(driver_path), options = options)
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls' : blocked_urls})
+    except Exception:
+        ## not every driver speaks the DevTools protocol; the prefs still apply
+        pass
+    return driver
+
+def login(driver, username, password, timeout = 10):
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    loginpage = standIn.url(movielens_url + '/login')
+    profiler.timedCall('movielens.login', lambda: driver.get(loginpage))
+    inputs = driver.find_elements(By.TAG_NAME, 'input')
+    inputs[0].send_keys(username)
+    inputs[1].send_keys(password)
+    driver.find_element(By.TAG_NAME, 'button').click()
+    try:
+        WebDriverWait(driver, timeout).until(lambda d: d.current_url != loginpage)
+    except TimeoutException:
+        pass
+    return driver.get_cookies()
+
+def shareSession(driver, cookies):
+    ## cookies can only be set on a page of their own domain
+    driver.get(standIn.url(movielens_url + '/'))
+    for cookie in cookies:
+        cookie = {k: v for k, v in cookie.items() if k in ['name', 'value', 'path', 'secure', 'expiry']}
+        driver.add_cookie(cookie)
+
+def parseRatings(inner):
+    ## (predicted rating, number of ratings, average rating) from a movie page
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(inner, features = "lxml")
+    headings = soup.findAll('div', {'class': 'movie-details-heading'})
+    rating = float(re.findall(r"\d+\.\d+", headings[0].findNext('div').text)[0])
+    numratings = int(headings[1].text.split('Average of ')[1].split(' ')[0].replace(',', ''))
+    avgrating = float(re.findall(r"\d+\.\d+", headings[1].findNext('div').text)[0])
+    return rating, numratings, avgrating
+
+class DriverPool(object):
+    def __init__(self, driver_path, size, username, password, headless = True, timeout = 10):
+        self.timeout = timeout
+        self.drivers = []
+        self.idle = queue.Queue()
+        try:
+            first = profiler.timedCall('movielens.browser', lambda: makeDriver(driver_path, headless))
+            self.drivers.append(first)
+            cookies = login(first, username, password, timeout)
+            self.idle.put(first)
+            for _ in range(size - 1):
+                driver = profiler.timedCall('movielens.browser', lambda: makeDriver(driver_path, headless))
+                self.drivers.append(driver)
+                shareSession(driver, cookies)
+                self.idle.put(driver)
+        except Exception:
+            self.close()
+            raise
+
+    def scrape(self, movielens_id):
+        ## (rating, numratings, avgrating) for one movie; raises on failure
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        url = standIn.url(movielens_url + '/movies/' + str(movielens_id))
+        driver = self.idle.get()
+        try:
+            driver.get(url)
+            WebDriverWait(driver, self.timeout).until(
+                lambda d: len(d.find_elements(By.CLASS_NAME, 'movie-details-heading')) >= 2
+            )
+            inner = driver.execute_script("return document.body.innerHTML")
+        finally:
+            self.idle.put(driver)
+        return parseRatings(inner)
+
+    def close(self):
+        for driver in self.drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        self.drivers = []
+
+def refreshRating(pool, movielens_id, budget = None):
+    if budget is not None:
+        budget.charge()
+    rating, numratings, avgrating = retryLayer.call('movielens.page', lambda: pool.scrape(movielens_id))
+    return {'rating' : rating,
+            'numratings' : numratings,
+            'avgrating' : avgrating,
+            'rating_checked' : time.time()}
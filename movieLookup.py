@@ -0,0 +1,106 @@
+################################################################################
+## finds movies in movies_db by title or id, for removeMovie.py. the index is
+## built once per run from the title, year and id columns:
+##   - normalized title (titleKeys.py) -> rows, and title + year -> rows
+##   - the normalized titles sorted, so every title starting with a prefix is
+##     one binary search away
+##   - movielens_id, tmdb_id, imdb_id and jw_id -> rows, built on first use
+## a query is a title, optionally with its year ("Heat (1995)"), or an id
+## written as ml:<id>, tmdb:<id>, imdb:tt<id> (or just tt<id>) or jw:<id>.
+## titles are matched exactly (with the year if given), then by prefix, and
+## only then by substring.
+################################################################################
+
+import bisect
+import re
+from movieSchema import missing
+from titleKeys import normalizeTitle, titleYearKey, splitYear
+
+id_columns = {'ml' : 'movielens_id',
+              'movielens' : 'movielens_id',
+              'tmdb' : 'tmdb_id',
+              'imdb' : 'imdb_id',
+              'jw' : 'jw_id'}
+id_re = re.compile(r'^\s*(?:([a-z]+):\s*(\S+)|(tt\d+))\s*$', re.IGNORECASE)
+
+def idValue(value):
+    ## ids compare as ints where they're numbers, whether stored as ints,
+    ## floats or strings
+    if missing(value):
+        return None
+    try:
+        number = float(value)
+        if number == number:
+            return int(number)
+        return None
+    except (TypeError, ValueError):
+        return str(value).strip().lower() if value is not None else None
+
+def parseQuery(text):
+    ## ('id', column, value) or ('title', title, year)
+    match = id_re.match(text)
+    if match is not None:
+        if match.group(3) is not None:
+            return 'id', 'imdb_id', idValue(match.group(3))
+        if match.group(1).lower() in id_columns:
+            return 'id', id_columns[match.group(1).lower()], idValue(match.group(2))
+    title, year = splitYear(text)
+    return 'title', title, year
+
+class MovieLookup(object):
+    def __init__(self, movies_db):
+        self.movies_db = movies_db
+        titles = list(movies_db.title.values) if 'title' in movies_db.columns else []
+        years = list(movies_db.year.values) if 'year' in movies_db.columns else [None] * len(titles)
+        self.keys = {}
+        self.exact = {}
+        self.dated = {}
+        for label, title, year in zip(movies_db.index, titles, years):
+            key = normalizeTitle(title)
+            self.keys[label] = key
+            self.exact.setdefault(key, []).append(label)
+            self.dated.setdefault(titleYearKey(title, year), []).append(label)
+        self.sorted_keys = sorted(self.exact)
+        self.ids = {}
+
+    def byId(self, column, value):
+        if column not in self.movies_db.columns:
+            return []
+        if column not in self.ids:
+            index = {}
+            for label, v in zip(self.movies_db.index, self.movies_db[column].values):
+                v = idValue(v)
+                if v is not None:
+                    index.setdefault(v, []).append(label)
+            self.ids[column] = index
+        return list(self.ids[column].get(value, []))
+
+    def byPrefix(self, key):
+        found = []
+        pos = bisect.bisect_left(self.sorted_keys, key)
+        while pos < len(self.sorted_keys) and self.sorted_keys[pos].startswith(key):
+            found += self.exact[self.sorted_keys[pos]]
+            pos += 1
+        return found
+
+    def byTitle(self, title, year = None):
+        ## (rows, how they were matched)
+        key = normalizeTitle(title)
+        if not key:
+            return [], None
+        if year is not None:
+            found = self.dated.get(titleYearKey(title, year), [])
+            if found:
+                return list(found), 'title and year'
+        if key in self.exact:
+            return list(self.exact[key]), 'title'
+        found = self.byPrefix(key)
+        if found:
+            return found, 'prefix'
+        return [label for label, k in self.keys.items() if key in k], 'substring'
+
+    def find(self, text):
+        kind, a, b = parseQuery(text)
+        if kind == 'id':
+            return self.byId(a, b), 'id'
+        return self.byTitle(a, b)
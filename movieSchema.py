@@ -0,0 +1,171 @@
+################################################################################
+## column types of movies_db, applied once when the DB is loaded (movieStore.py)
+## so every script works on the same compact, typed frame:
+##   movielens_id, netflix_id, tmdb_id, jw_id   nullable Int64 (<NA> if missing)
+##   rating, avgrating, netflix_rating, rt_score float32
+##   year, runtime                              nullable Int16
+##   numratings                                 nullable Int32
+##   streams_checked, rt_checked, rating_checked float64 (epoch seconds)
+##   netflix_instant                            nullable boolean
+##   genres, streams                            lists of interned names, one list
+##                                              object per distinct combination
+## the genre and stream lists are categorical: rows with the same genres (or
+## services) share one list, and every name is a single interned string. the
+## code that writes them always replaces a row's list, never changes it in
+## place. the bitmask indexes chooseMovie.py queries (genreIndex.py,
+## providerIndex.py) are built from them.
+##
+## an id or number column that holds anything that isn't a number is left as
+## it is rather than lose those values. float32 keeps ~7 significant digits,
+## so scores are written back rounded to float_decimals places.
+##
+## memory per 10,000 rows (synthetic DB, `python movieSchema.py --rows 10000`;
+## without --rows it measures databases/movies_db.json):
+##                          as parsed    typed
+##   ids and numbers          0.9 MB     0.7 MB
+##   genres and streams       3.9 MB     0.7 MB
+##   whole frame, lazy        6.2 MB     2.7 MB    (what chooseMovie.py holds)
+##   whole frame              9.9 MB     6.4 MB    (with overview and tagline)
+################################################################################
+
+import argparse
+import sys
+import numpy as np
+import pandas as pd
+
+column_types = {'movielens_id' : 'Int64',
+                'netflix_id' : 'Int64',
+                'tmdb_id' : 'Int64',
+                'jw_id' : 'Int64',
+                'rating' : 'float32',
+                'avgrating' : 'float32',
+                'netflix_rating' : 'float32',
+                'rt_score' : 'float32',
+                'year' : 'Int16',
+                'runtime' : 'Int16',
+                'numratings' : 'Int32',
+                'streams_checked' : 'float64',
+                'rt_checked' : 'float64',
+                'rating_checked' : 'float64',
+                'netflix_instant' : 'boolean'}
+category_columns = ['genres', 'streams']
+float_decimals = 4
+## strings older DBs hold for a missing number (compared stripped, lowercased)
+missing_strings = ['', 'nan', 'none']
+
+def missing(value):
+    return value is None or value is pd.NA or (isinstance(value, (float, np.floating)) and np.isnan(value))
+
+def castColumn(column, dtype):
+    ## the column as dtype, or unchanged if it holds values that don't fit
+    if str(column.dtype) == dtype:
+        return column
+    if dtype == 'boolean':
+        ## sqlite hands booleans back as 0 and 1
+        values = [None if missing(v) else v for v in column.values]
+        if all(v is None or isinstance(v, (bool, np.bool_)) or (isinstance(v, (int, float, np.number)) and v in [0, 1])
+               for v in values):
+            return pd.Series(pd.array([v if v is None else bool(v) for v in values], dtype = 'boolean'),
+                             index = column.index)
+        return column
+    numbers = pd.to_numeric(column, errors = 'coerce')
+    if (numbers.isna() & column.notna()).any():
+        strings = column[numbers.isna() & column.notna()]
+        if not all(isinstance(v, str) and v.strip().lower() in missing_strings for v in strings.values):
+            return column
+    if dtype.startswith('float'):
+        return numbers.astype(dtype)
+    numbers = numbers.astype('float64').round()
+    info = np.iinfo(dtype.lower())
+    if ((numbers < info.min) | (numbers > info.max)).any():
+        return column
+    return numbers.astype(dtype)
+
+class Categories(object):
+    ## one shared list per distinct genre (or stream) combination, made of
+    ## interned names
+    def __init__(self):
+        self.lists = {}
+
+    def get(self, values):
+        if not isinstance(values, list):
+            values = []
+        key = tuple(values)
+        if key not in self.lists:
+            self.lists[key] = [sys.intern(v) if isinstance(v, str) else v for v in values]
+        return self.lists[key]
+
+def cast(movies_db):
+    ## casts movies_db in place to the schema and returns it
+    for col, dtype in column_types.items():
+        if col in movies_db.columns:
+            movies_db[col] = castColumn(movies_db[col], dtype)
+    for col in category_columns:
+        if col in movies_db.columns:
+            categories = Categories()
+            movies_db[col] = pd.Series([categories.get(v) for v in movies_db[col].values],
+                                       index = movies_db.index, dtype = object)
+    return movies_db
+
+def plain(movies_db):
+    ## a copy for writing out: float32 scores back to float64, rounded so
+    ## 4.86 isn't written as 4.860000133514404, and every missing value (NaN,
+    ## <NA>, including those of string columns) as None, so the JSON written
+    ## has nulls rather than NaN tokens
+    movies_db = movies_db.copy()
+    for col in movies_db.columns:
+        column = movies_db[col]
+        if column.dtype == np.float32:
+            column = column.astype('float64').round(float_decimals)
+        movies_db[col] = column.astype(object).where(column.notna(), None)
+    return movies_db
+
+def footprint(movies_db):
+    ## bytes per column, counting the python objects each row points to once
+    out = {}
+    for col in movies_db.columns:
+        values = movies_db[col].values
+        if movies_db[col].dtype != object:
+            out[col] = movies_db[col].memory_usage(index = False, deep = True)
+            continue
+        seen = set()
+        total = values.nbytes
+        for v in values:
+            for obj in [v] + (v if isinstance(v, list) else []):
+                if id(obj) not in seen and obj is not None:
+                    seen.add(id(obj))
+                    total += sys.getsizeof(obj)
+        out[col] = total
+    return out
+
+if __name__ == '__main__':
+    ## compares the frame as parsed from JSON with the typed one
+    import json
+    import os
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", help = "size of a synthetic DB to measure instead of movies_db.json",
+                        type = int, default = None)
+    parser.add_argument("--path", default = 'databases/movies_db.json')
+    args = parser.parse_args()
+    if args.rows is not None:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+        import synthDB
+        raw = json.loads(json.dumps(list(synthDB.makeMovies(args.rows))))
+    else:
+        with open(args.path, 'r') as f:
+            raw = json.load(f)
+    parsed = pd.DataFrame(raw)
+    typed = cast(pd.DataFrame(raw))
+    before, after = footprint(parsed), footprint(typed)
+    per = 10000.0 / max(1, len(parsed)) / 1e6
+    groups = [('ids and numbers', list(column_types)), ('genres and streams', category_columns),
+              ('whole frame, lazy', [c for c in parsed.columns if c not in ['overview', 'tagline']]),
+              ('whole frame', list(parsed.columns))]
+    print("{} rows; MB per 10,000 rows".format(len(parsed)))
+    print("{:<22}{:>10}{:>10}".format('', 'as parsed', 'typed'))
+    for name, columns in groups:
+        columns = [c for c in columns if c in parsed.columns]
+        print("{:<22}{:>10.1f}{:>10.1f}".format(name, sum(before[c] for c in columns) * per,
+                                                sum(after[c] for c in columns) * per))
+    for col in parsed.columns:
+        print("  {:<20}{:>10.2f}{:>10.2f}  {}".format(col, before[col] * per, after[col] * per, typed[col].dtype))
@@ -0,0 +1,633 @@
+################################################################################
+## storage for the movies DB shared by addMovies.py, chooseMovie.py and
+## removeMovie.py. by default the DB is the JSON file databases/movies_db.json.
+## new, updated and removed rows are appended to an fsync'd journal
+## (databases/movies_db.journal.jsonl) so each change costs O(1) I/O; loading
+## replays the journal on top of the JSON file, and the two are compacted into
+## a fresh JSON file at the end of an addMovies.py run or once the journal gets
+## large.
+##
+## optionally the DB can live in SQLite (databases/movies_db.sqlite) with the
+## same schema. movies are indexed on movielens_id, tmdb_id, imdb_id, jw_id and
+## title, and genres and streams are kept in child tables, so duplicate checks,
+## removals and single row updates are indexed operations instead of full file
+## rewrites. once the SQLite file exists it is used automatically.
+##
+## every load casts the columns to the types in movieSchema.py (nullable int
+## ids, float32 scores, shared genre and stream lists).
+##
+## loading the JSON DB goes through a binary columnar sidecar (columnCache.py)
+## that is rebuilt whenever movies_db.json changes. read-only scripts load with
+## lazy = True, which memory-maps the numeric columns and leaves the long text
+## columns (overview, tagline) out of the frame; fetch() reads them per row.
+##
+## to convert between the two formats:
+##   python movieStore.py --migrate   (movies_db.json -> movies_db.sqlite)
+##   python movieStore.py --export    (movies_db.sqlite -> movies_db.json)
+################################################################################
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import numpy as np
+import pandas as pd
+import movieSchema
+from refreshEngine import mergeUpdates
+from columnCache import ColumnCache, lazy_columns
+
+json_path = 'databases/movies_db.json'
+sqlite_path = 'databases/movies_db.sqlite'
+backup_dir = 'databases/backup'
+## the JSON journal is compacted into the main file once it grows past this
+journal_max_bytes = 1024 * 1024
+
+## columns stored directly in the movies table; anything else a row carries
+## (e.g. canistreamit_id or queue from the deprecated importer) goes in `extra`
+scalar_columns = ['movielens_id', 'netflix_id', 'tmdb_id', 'imdb_id', 'jw_id',
+                  'title', 'rating', 'avgrating', 'numratings', 'netflix_rating',
+                  'netflix_instant', 'year', 'runtime', 'overview', 'tagline',
+                  'rt_score', 'streams_checked', 'rt_checked', 'rating_checked']
+list_columns = {'genres' : ('movie_genres', 'genre'),
+                'streams' : ('movie_streams', 'service')}
+indexed_columns = ['movielens_id', 'tmdb_id', 'imdb_id', 'jw_id']
+
+def emptyMovies():
+    return pd.DataFrame({
+          'movielens_id' : []
+        , 'netflix_id' : []
+        , 'tmdb_id' : []
+        , 'imdb_id' : []
+        , 'title' : []
+        , 'rating' : []
+        , 'netflix_rating' : []
+        , 'genres' : []
+        , 'netflix_instant' : []
+        , 'streams' : []
+        , 'year' : []
+        , 'runtime' : []
+        , 'overview' : []
+        , 'tagline' : []
+        , 'jw_id' : []
+        , 'rt_score' : []
+    })
+
+def sqlValue(x):
+    ## sqlite3 only binds plain python types
+    if isinstance(x, (list, dict)):
+        return json.dumps(x)
+    if x is pd.NA:
+        return None
+    if isinstance(x, np.float32):
+        x = round(x.item(), movieSchema.float_decimals)
+    if isinstance(x, np.generic):
+        x = x.item()
+    if isinstance(x, float) and np.isnan(x):
+        return None
+    return x
+
+def isMissing(x):
+    return movieSchema.missing(x)
+
+def jsonValue(x):
+    if x is pd.NA:
+        return None
+    if isinstance(x, np.float32):
+        return round(x.item(), movieSchema.float_decimals)
+    if isinstance(x, np.generic):
+        return x.item()
+    if isinstance(x, np.ndarray):
+        return x.tolist()
+    raise TypeError("{} is not JSON serializable".format(type(x)))
+
+def journalPath(path):
+    return os.path.splitext(path)[0] + '.journal.jsonl'
+
+def readJournal(path, offset = 0):
+    ## returns the records from byte `offset` on and the offset just past the
+    ## last complete record
+    records = []
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    ## a write torn by a crash can only be the last line
+                    break
+                offset += len(line)
+    return records, offset
+
+def fileSignature(path):
+    if not os.path.exists(path):
+        return None
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+def withPending(movies_db, pending):
+    if not pending:
+        return movies_db
+    new_rows = pd.DataFrame([row for idx, row in pending], index = [idx for idx, row in pending])
+    return pd.concat([movies_db, movieSchema.cast(new_rows)])
+
+class JSONStore(object):
+    ## changes are appended to a JSON Lines journal (fsync'd per write) and only
+    ## folded into the main file at the end of a run or once the journal grows
+    ## past journal_max_bytes. the journal starts with a hash of the main file it
+    ## applies to, so a journal left over from a finished compaction is ignored.
+    kind = 'json'
+
+    def __init__(self, path = json_path, journal = None, journal_max_bytes = journal_max_bytes):
+        self.path = path
+        self.journal = journal if journal is not None else journalPath(path)
+        self.journal_max_bytes = journal_max_bytes
+        self.base_hash = None
+        self.next_idx = 0
+        self.pending = []
+        self.journal_offset = 0
+        self.loaded_signature = None
+        self.columns = ColumnCache(path)
+        self.lazy = False
+        ## journal values of lazy columns, by row, when loaded lazily
+        self.overrides = {}
+        ## what the last tail() changed: row label -> updated columns, and
+        ## whether rows were inserted or removed
+        self.touched = {}
+        self.reshaped = False
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def signature(self):
+        ## changes whenever the main file or the journal is written
+        return (fileSignature(self.path), fileSignature(self.journal))
+
+    def backup(self):
+        for path in [self.path, self.journal]:
+            if os.path.exists(path):
+                shutil.copyfile(path, os.path.join(backup_dir, os.path.basename(path)))
+
+    def load(self, lazy = False):
+        if not self.exists() and not os.path.exists(self.journal):
+            raise IOError("No database found at {}".format(self.path))
+        movies_db = pd.DataFrame([])
+        self.base_hash = None
+        self.lazy = lazy
+        self.overrides = {}
+        self.loaded_signature = fileSignature(self.path)
+        if self.exists():
+            try:
+                cached = self.columns.read(lazy)
+            except Exception:
+                ## a damaged sidecar is just rebuilt
+                cached = None
+            if cached is not None:
+                movies_db, self.base_hash = cached
+            else:
+                with open(self.path, "rb") as f:
+                    raw = f.read()
+                self.base_hash = hashlib.md5(raw).hexdigest()
+                movies_db = movieSchema.cast(pd.DataFrame(json.loads(raw)))
+                try:
+                    self.columns.write(movies_db, self.base_hash)
+                except (IOError, OSError):
+                    pass
+                if lazy:
+                    movies_db = movies_db.drop(columns = [c for c in lazy_columns if c in movies_db.columns])
+        return self.replay(movies_db)
+
+    def replay(self, movies_db):
+        records, self.journal_offset = readJournal(self.journal)
+        self.next_idx = len(movies_db)
+        self.pending = []
+        if len(records) and records[0].get('op') == 'base' and records[0].get('hash') == self.base_hash:
+            movies_db = self.applyRecords(movies_db, records[1:])
+        elif len(records):
+            ## already compacted into the main file
+            os.remove(self.journal)
+            self.journal_offset = 0
+        return movies_db
+
+    def applyRecords(self, movies_db, records):
+        ## inserts, updates and removes are batched between changes of op
+        inserted, updates, removed = [], {}, set()
+        self.touched = {}
+        self.reshaped = False
+        for rec in records + [{'op' : None}]:
+            if rec['op'] != 'insert' and inserted:
+                movies_db = withPending(movies_db, inserted)
+                inserted = []
+            if rec['op'] != 'update' and updates:
+                movies_db = mergeUpdates(self.writable(movies_db, updates), updates)
+                updates = {}
+            if rec['op'] != 'remove' and removed:
+                movies_db = movies_db.loc[~movies_db.index.isin(removed), ]
+                removed = set()
+            if rec['op'] == 'base':
+                if rec.get('hash') != self.base_hash:
+                    return None
+            elif rec['op'] == 'insert':
+                inserted.append((rec['idx'], self.splitLazy(rec['idx'], rec['row'])))
+                self.reshaped = True
+                self.next_idx = max(self.next_idx, rec['idx'] + 1)
+            elif rec['op'] == 'update':
+                fields = self.splitLazy(rec['idx'], rec['fields'])
+                self.touched.setdefault(rec['idx'], set()).update(fields)
+                if fields:
+                    updates.setdefault(rec['idx'], {}).update(fields)
+            elif rec['op'] == 'remove':
+                removed.add(rec['idx'])
+                self.reshaped = True
+        return movies_db
+
+    def writable(self, movies_db, updates):
+        ## lazy loads memory-map the numeric columns read-only; a column is
+        ## copied into memory the first time the journal updates it
+        if self.lazy:
+            for col in set(col for fields in updates.values() for col in fields):
+                if col in movies_db.columns and movies_db[col].dtype.kind in 'iuf':
+                    movies_db[col] = movies_db[col].copy()
+        return movies_db
+
+    def splitLazy(self, idx, fields):
+        ## when loaded lazily, lazy columns go to `overrides` instead of the frame
+        if not self.lazy:
+            return fields
+        for col in lazy_columns:
+            if col in fields:
+                self.overrides.setdefault(idx, {})[col] = fields[col]
+        return {k: v for k, v in fields.items() if k not in lazy_columns}
+
+    def fetch(self, movies_db, idx, col):
+        ## a single value, including the lazy columns left out of the frame
+        if col in movies_db.columns:
+            return movies_db.at[idx, col]
+        if col in self.overrides.get(idx, {}):
+            return self.overrides[idx][col]
+        return self.columns.value(col, idx)
+
+    def materialize(self, movies_db):
+        ## fills in the lazy columns, before the frame is written out
+        for col in lazy_columns:
+            if self.lazy and col not in movies_db.columns:
+                movies_db[col] = [self.fetch(movies_db, idx, col) for idx in movies_db.index]
+        return movies_db
+
+    def tail(self, movies_db):
+        ## applies the journal records written (e.g. by another process) since
+        ## load() or the last tail(). returns None when the main file has been
+        ## rewritten since, in which case a full load() is needed.
+        if fileSignature(self.path) != self.loaded_signature:
+            return None
+        journal_size = os.path.getsize(self.journal) if os.path.exists(self.journal) else 0
+        if journal_size < self.journal_offset:
+            return None
+        records, self.journal_offset = readJournal(self.journal, self.journal_offset)
+        return self.applyRecords(movies_db, records)
+
+    def appendJournal(self, records):
+        new = not os.path.exists(self.journal) or os.path.getsize(self.journal) == 0
+        with open(self.journal, 'a') as f:
+            if new:
+                f.write(json.dumps({'op' : 'base', 'hash' : self.base_hash}) + '\n')
+            for rec in records:
+                f.write(json.dumps(rec, default = jsonValue) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def save(self, movies_db):
+        self.materialize(movies_db)
+        movies_db.reset_index(inplace = True, drop = True)
+        out = json.dumps(list(movieSchema.plain(movies_db).T.to_dict().values()), default = jsonValue,
+                         allow_nan = False)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as outfile:
+            outfile.write(out)
+            outfile.flush()
+            os.fsync(outfile.fileno())
+        os.replace(tmp_path, self.path)
+        self.base_hash = hashlib.md5(out.encode()).hexdigest()
+        self.loaded_signature = fileSignature(self.path)
+        self.next_idx = len(movies_db)
+        self.pending = []
+        if os.path.exists(self.journal):
+            os.remove(self.journal)
+        self.journal_offset = 0
+        self.lazy = False
+        self.overrides = {}
+
+    def findMovielensId(self, movies_db, movielens_id):
+        found = []
+        if 'movielens_id' in movies_db.columns:
+            matches = (movies_db.movielens_id == movielens_id).fillna(False)
+            found = list(movies_db.index[matches.to_numpy(dtype = bool)])
+        return found + [idx for idx, row in self.pending if row.get('movielens_id') == movielens_id]
+
+    def insert(self, movies_db, row):
+        ## the frame isn't copied per insert; rows wait in `pending` until collect()
+        row = dict(row)
+        self.appendJournal([{'op' : 'insert', 'idx' : self.next_idx, 'row' : row}])
+        self.pending.append((self.next_idx, self.splitLazy(self.next_idx, row)))
+        self.next_idx += 1
+        return self.maybeCompact(movies_db)
+
+    def collect(self, movies_db):
+        movies_db = withPending(movies_db, self.pending)
+        self.pending = []
+        return movies_db
+
+    def update(self, movies_db, idx, fields):
+        movies_db = self.collect(movies_db)
+        self.appendJournal([{'op' : 'update', 'idx' : int(idx), 'fields' : fields}])
+        fields = self.splitLazy(idx, fields)
+        movies_db = self.writable(movies_db, {idx: fields})
+        for col, value in fields.items():
+            movies_db.at[idx, col] = value
+        return self.maybeCompact(movies_db)
+
+    def updateMany(self, movies_db, updates):
+        movies_db = self.collect(movies_db)
+        self.appendJournal([
+            {'op' : 'update', 'idx' : int(idx), 'fields' : fields} for idx, fields in updates.items()
+        ])
+        updates = {idx: self.splitLazy(idx, fields) for idx, fields in updates.items()}
+        return self.maybeCompact(mergeUpdates(self.writable(movies_db, updates), updates))
+
+    def remove(self, movies_db, idx):
+        movies_db = self.collect(movies_db)
+        self.appendJournal([{'op' : 'remove', 'idx' : int(idx)}])
+        movies_db = movies_db.loc[movies_db.index != idx, ]
+        return self.maybeCompact(movies_db)
+
+    def removeMany(self, movies_db, idxs):
+        ## one journal write for the whole batch
+        movies_db = self.collect(movies_db)
+        self.appendJournal([{'op' : 'remove', 'idx' : int(idx)} for idx in idxs])
+        movies_db = movies_db.loc[~movies_db.index.isin(list(idxs)), ]
+        return self.maybeCompact(movies_db)
+
+    def maybeCompact(self, movies_db):
+        if os.path.exists(self.journal) and os.path.getsize(self.journal) > self.journal_max_bytes:
+            return self.compact(movies_db)
+        return movies_db
+
+    def compact(self, movies_db):
+        movies_db = self.collect(movies_db)
+        self.save(movies_db)
+        return movies_db
+
+    def flush(self, movies_db):
+        return self.compact(movies_db)
+
+class SQLiteStore(object):
+    kind = 'sqlite'
+
+    def __init__(self, path = sqlite_path):
+        self.path = path
+        self.conn = None
+        self.pending = []
+        self.lazy = False
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def signature(self):
+        return (fileSignature(self.path), fileSignature(self.path + '-wal'))
+
+    def tail(self, movies_db):
+        ## indexed loads are cheap enough to just reload
+        self.touched = {}
+        self.reshaped = True
+        return None
+
+    def connect(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, check_same_thread = False)
+            self.conn.execute("PRAGMA foreign_keys = ON")
+            self.createSchema()
+        return self.conn
+
+    def createSchema(self):
+        conn = self.conn
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS movies (id INTEGER PRIMARY KEY, {}, extra TEXT)".format(
+                ", ".join(scalar_columns)
+            )
+        )
+        ## DBs migrated before a column was added to the schema
+        existing = [r[1] for r in conn.execute("PRAGMA table_info(movies)")]
+        for col in scalar_columns:
+            if col not in existing:
+                conn.execute("ALTER TABLE movies ADD COLUMN {}".format(col))
+        for col in indexed_columns:
+            conn.execute("CREATE INDEX IF NOT EXISTS movies_{0} ON movies ({0})".format(col))
+        conn.execute("CREATE INDEX IF NOT EXISTS movies_title ON movies (title COLLATE NOCASE)")
+        for table, field in list_columns.values():
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS {0} (movie_id INTEGER REFERENCES movies (id) "
+                "ON DELETE CASCADE, {1} TEXT)".format(table, field)
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS {0}_movie ON {0} (movie_id)".format(table)
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS {0}_{1} ON {0} ({1})".format(table, field)
+            )
+        conn.commit()
+
+    def backup(self):
+        if self.exists():
+            ## sqlite's online backup gives a consistent copy even mid-write
+            dest = sqlite3.connect(os.path.join(backup_dir, os.path.basename(self.path)))
+            self.connect().backup(dest)
+            dest.close()
+
+    def load(self, lazy = False):
+        conn = self.connect()
+        self.lazy = lazy
+        columns = [c for c in scalar_columns if not (lazy and c in lazy_columns)]
+        movies_db = pd.read_sql_query(
+            "SELECT id, {}, extra FROM movies ORDER BY id".format(", ".join(columns)),
+            conn, index_col = 'id'
+        )
+        for col, (table, field) in list_columns.items():
+            values = {idx: [] for idx in movies_db.index}
+            for movie_id, value in conn.execute(
+                "SELECT movie_id, {} FROM {} ORDER BY rowid".format(field, table)
+            ):
+                values[movie_id].append(value)
+            movies_db[col] = pd.Series(values, dtype = object)
+        extras = [json.loads(e) if isinstance(e, str) else {} for e in movies_db.extra.values]
+        movies_db = movies_db.drop(columns = 'extra')
+        for key in sorted(set(k for e in extras for k in e)):
+            movies_db[key] = [e.get(key) for e in extras]
+        movies_db.index.name = None
+        return movieSchema.cast(movies_db)
+
+    def inFrame(self, fields):
+        ## when loaded lazily, lazy columns are only written to the DB, and
+        ## fetch() reads them from there
+        if not self.lazy:
+            return fields
+        return {k: v for k, v in fields.items() if k not in lazy_columns}
+
+    def fetch(self, movies_db, idx, col):
+        if col in movies_db.columns:
+            return movies_db.at[idx, col]
+        row = self.connect().execute(
+            "SELECT {} FROM movies WHERE id = ?".format(col), (int(idx),)
+        ).fetchone() if col in scalar_columns else None
+        return row[0] if row is not None else None
+
+    def writeRow(self, row, movie_id = None):
+        conn = self.connect()
+        extra = {k: v for k, v in row.items()
+                 if k not in scalar_columns and k not in list_columns and not isMissing(v)}
+        values = [sqlValue(row.get(col)) for col in scalar_columns]
+        values.append(json.dumps(extra, default = sqlValue) if extra else None)
+        cur = conn.execute(
+            "INSERT OR REPLACE INTO movies (id, {}, extra) VALUES (?, {}?)".format(
+                ", ".join(scalar_columns), "?, " * len(scalar_columns)
+            ),
+            [movie_id] + values
+        )
+        movie_id = cur.lastrowid if movie_id is None else movie_id
+        for col, (table, field) in list_columns.items():
+            self.writeList(movie_id, col, row.get(col))
+        return movie_id
+
+    def writeList(self, movie_id, col, values):
+        table, field = list_columns[col]
+        conn = self.connect()
+        conn.execute("DELETE FROM {} WHERE movie_id = ?".format(table), (movie_id,))
+        if isinstance(values, list):
+            conn.executemany(
+                "INSERT INTO {} (movie_id, {}) VALUES (?, ?)".format(table, field),
+                [(movie_id, v) for v in values]
+            )
+
+    def save(self, movies_db):
+        ## full replace; only used when migrating or rewriting the whole DB
+        conn = self.connect()
+        conn.execute("DELETE FROM movies")
+        for table, field in list_columns.values():
+            conn.execute("DELETE FROM {}".format(table))
+        ids = []
+        for idx, row in movieSchema.plain(movies_db).iterrows():
+            movie_id = int(idx) + 1 if isinstance(idx, (int, np.integer)) else None
+            ids.append(self.writeRow(row.to_dict(), movie_id))
+        conn.commit()
+        movies_db.index = ids
+
+    def findMovielensId(self, movies_db, movielens_id):
+        rows = self.connect().execute(
+            "SELECT id FROM movies WHERE movielens_id = ?", (sqlValue(movielens_id),)
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def insert(self, movies_db, row):
+        movie_id = self.writeRow(row)
+        self.conn.commit()
+        self.pending.append((movie_id, self.inFrame(dict(row))))
+        return movies_db
+
+    def collect(self, movies_db):
+        movies_db = withPending(movies_db, self.pending)
+        self.pending = []
+        return movies_db
+
+    def update(self, movies_db, idx, fields):
+        movies_db = self.collect(movies_db)
+        self.writeFields(idx, fields)
+        self.conn.commit()
+        for col, value in self.inFrame(fields).items():
+            if col not in movies_db.columns:
+                movies_db[col] = None
+            movies_db.at[idx, col] = value
+        return movies_db
+
+    def updateMany(self, movies_db, updates):
+        ## one transaction for the whole batch
+        movies_db = self.collect(movies_db)
+        for idx, fields in updates.items():
+            self.writeFields(idx, fields)
+        self.connect().commit()
+        return mergeUpdates(movies_db, {idx: self.inFrame(fields) for idx, fields in updates.items()})
+
+    def writeFields(self, idx, fields):
+        conn = self.connect()
+        scalars = {k: v for k, v in fields.items() if k in scalar_columns}
+        if scalars:
+            conn.execute(
+                "UPDATE movies SET {} WHERE id = ?".format(
+                    ", ".join("{} = ?".format(k) for k in scalars)
+                ),
+                [sqlValue(v) for v in scalars.values()] + [int(idx)]
+            )
+        for col in fields:
+            if col in list_columns:
+                self.writeList(int(idx), col, fields[col])
+        extras = {k: v for k, v in fields.items()
+                  if k not in scalar_columns and k not in list_columns}
+        if extras:
+            row = conn.execute("SELECT extra FROM movies WHERE id = ?", (int(idx),)).fetchone()
+            extra = json.loads(row[0]) if row is not None and row[0] is not None else {}
+            extra.update(extras)
+            conn.execute(
+                "UPDATE movies SET extra = ? WHERE id = ?",
+                (json.dumps(extra, default = sqlValue), int(idx))
+            )
+
+    def remove(self, movies_db, idx):
+        conn = self.connect()
+        conn.execute("DELETE FROM movies WHERE id = ?", (int(idx),))
+        conn.commit()
+        movies_db = self.collect(movies_db)
+        return movies_db.loc[movies_db.index != idx, ]
+
+    def removeMany(self, movies_db, idxs):
+        ## one transaction for the whole batch
+        conn = self.connect()
+        conn.executemany("DELETE FROM movies WHERE id = ?", [(int(idx),) for idx in idxs])
+        conn.commit()
+        movies_db = self.collect(movies_db)
+        return movies_db.loc[~movies_db.index.isin(list(idxs)), ]
+
+    def flush(self, movies_db):
+        if self.conn is not None:
+            self.conn.commit()
+        return self.collect(movies_db)
+
+def openStore():
+    sqlite_store = SQLiteStore()
+    if sqlite_store.exists():
+        return sqlite_store
+    return JSONStore()
+
+def migrate():
+    movies_db = JSONStore().load()
+    store = SQLiteStore()
+    store.save(movies_db)
+    print("Migrated {} movies from {} to {}.".format(len(movies_db), json_path, sqlite_path))
+
+def export():
+    movies_db = SQLiteStore().load()
+    JSONStore().save(movies_db)
+    print("Exported {} movies from {} to {}.".format(len(movies_db), sqlite_path, json_path))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--migrate", help = "copy movies_db.json into movies_db.sqlite",
+                        action = "store_true")
+    parser.add_argument("--export", help = "write movies_db.sqlite back out to movies_db.json",
+                        action = "store_true")
+    args = parser.parse_args()
+    if args.migrate:
+        migrate()
+    elif args.export:
+        export()
+    else:
+        parser.print_help()
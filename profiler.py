@@ -0,0 +1,240 @@
+################################################################################
+## opt-in run profiling for addMovies.py and chooseMovie.py (--profile). when
+## enabled it records:
+##   - wall time per phase (loading, each update loop, saving, selenium page
+##     loads and waits, ...); nested phases are named 'outer/inner'
+##   - per endpoint (tmdb.search, justwatch.title, movielens.page, ...) the
+##     number of calls, failures, retries, response cache hits and misses and
+##     a latency histogram with percentiles
+##   - time spent waiting on the per-host rate limiters
+##   - peak traced memory (tracemalloc; this slows pandas down noticeably)
+## and prints a progress line with an ETA every couple of seconds in long
+## loops. the report is printed at exit and written as JSON, by default to
+## profiles/<script>-<date>-<time>.json.
+##
+## everything is a no-op while profiling is off, so the hooks stay in place.
+################################################################################
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+profiles_dir = 'profiles'
+## upper bounds, in milliseconds, of the latency histogram buckets
+latency_buckets = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000]
+## seconds between progress lines
+progress_interval = 2.0
+
+class Profiler(object):
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+    def reset(self):
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.endpoints = {}
+        self.throttled = {}
+        self.counters = {}
+        self.current = None
+
+    def endpoint(self, name):
+        ## caller holds the lock
+        if name not in self.endpoints:
+            self.endpoints[name] = {'calls' : 0, 'errors' : 0, 'retries' : 0,
+                                    'cache_hits' : 0, 'cache_misses' : 0,
+                                    'seconds' : 0.0, 'latencies' : []}
+        return self.endpoints[name]
+
+    def addPhase(self, name, seconds):
+        with self.lock:
+            calls, total = self.phases.get(name, (0, 0.0))
+            self.phases[name] = (calls + 1, total + seconds)
+
+    def stack(self):
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+    def report(self):
+        elapsed = time.perf_counter() - self.start
+        endpoints = {}
+        for name, e in sorted(self.endpoints.items()):
+            latencies = sorted(e['latencies'])
+            lookups = e['cache_hits'] + e['cache_misses']
+            endpoints[name] = {
+                'calls' : e['calls'], 'errors' : e['errors'], 'retries' : e['retries'],
+                'cache_hits' : e['cache_hits'], 'cache_misses' : e['cache_misses'],
+                'cache_hit_rate' : round(e['cache_hits'] / lookups, 3) if lookups else None,
+                'seconds' : round(e['seconds'], 4),
+                'mean_ms' : round(1000 * e['seconds'] / len(latencies), 1) if latencies else None,
+                'p50_ms' : percentile(latencies, 0.5), 'p90_ms' : percentile(latencies, 0.9),
+                'p99_ms' : percentile(latencies, 0.99),
+                'max_ms' : round(1000 * latencies[-1], 1) if latencies else None,
+                'histogram_ms' : histogram(latencies)}
+        report = {'script' : os.path.basename(sys.argv[0]),
+                  'argv' : sys.argv[1:],
+                  'timestamp' : time.strftime('%Y-%m-%dT%H:%M:%S'),
+                  'wall_seconds' : round(elapsed, 4),
+                  'phases' : {name: {'calls' : calls, 'seconds' : round(seconds, 4)}
+                              for name, (calls, seconds) in self.phases.items()},
+                  'endpoints' : endpoints,
+                  'throttle_seconds' : {host: round(s, 4) for host, s in sorted(self.throttled.items())},
+                  'counters' : dict(sorted(self.counters.items()))}
+        import tracemalloc
+        if tracemalloc.is_tracing():
+            report['peak_memory_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+        return report
+
+profile = Profiler()
+
+def percentile(latencies, q):
+    if not latencies:
+        return None
+    return round(1000 * latencies[min(len(latencies) - 1, int(q * len(latencies)))], 1)
+
+def histogram(latencies):
+    ## {'<=bound' : count} over latency_buckets, empty buckets left out
+    counts = {}
+    for seconds in latencies:
+        ms = 1000 * seconds
+        label = next(('<={}'.format(b) for b in latency_buckets if ms <= b), '>{}'.format(latency_buckets[-1]))
+        counts[label] = counts.get(label, 0) + 1
+    return counts
+
+def enabled():
+    return profile.enabled
+
+def enable(path = None):
+    ## starts profiling; the report is printed and saved when the script exits
+    import tracemalloc
+    profile.reset()
+    profile.enabled = True
+    tracemalloc.start()
+    if path is None:
+        path = os.path.join(profiles_dir, '{}-{}.json'.format(
+            os.path.splitext(os.path.basename(sys.argv[0]))[0], time.strftime('%Y%m%d-%H%M%S')
+        ))
+    atexit.register(finish, path)
+
+def mark(name):
+    ## starts the next top-level section of a script, ending the one before
+    if not profile.enabled:
+        return
+    now = time.perf_counter()
+    if profile.current is not None:
+        profile.addPhase(profile.current[0], now - profile.current[1])
+    profile.current = (name, now) if name is not None else None
+
+@contextmanager
+def phase(name):
+    if not profile.enabled:
+        yield
+        return
+    stack = profile.stack()
+    stack.append(name)
+    full_name = '/'.join(stack)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.addPhase(full_name, time.perf_counter() - start)
+        stack.pop()
+
+def timedCall(endpoint, fn):
+    ## fn() with its latency recorded against endpoint
+    if not profile.enabled:
+        return fn()
+    start = time.perf_counter()
+    failed = True
+    try:
+        value = fn()
+        failed = False
+        return value
+    finally:
+        seconds = time.perf_counter() - start
+        with profile.lock:
+            e = profile.endpoint(endpoint)
+            e['calls'] += 1
+            e['seconds'] += seconds
+            e['latencies'].append(seconds)
+            if failed:
+                e['errors'] += 1
+
+def cacheLookup(endpoint, hit):
+    if profile.enabled:
+        with profile.lock:
+            profile.endpoint(endpoint)['cache_hits' if hit else 'cache_misses'] += 1
+
+def retry(endpoint):
+    if profile.enabled:
+        with profile.lock:
+            profile.endpoint(endpoint)['retries'] += 1
+
+def throttled(host, seconds):
+    if profile.enabled:
+        with profile.lock:
+            profile.throttled[host] = profile.throttled.get(host, 0.0) + seconds
+
+def count(name, n = 1):
+    if profile.enabled:
+        with profile.lock:
+            profile.counters[name] = profile.counters.get(name, 0) + n
+
+class Progress(object):
+    ## prints '<label>: done/total (rate/s, ETA m:ss)' every progress_interval
+    ## seconds while profiling
+    def __init__(self, total, label):
+        self.total = total
+        self.label = label
+        self.done = 0
+        self.start = time.perf_counter()
+        self.printed = self.start
+
+    def step(self, n = 1):
+        self.done += n
+        if not profile.enabled:
+            return
+        now = time.perf_counter()
+        if now - self.printed >= progress_interval or self.done == self.total:
+            self.printed = now
+            rate = self.done / (now - self.start) if now > self.start else 0.0
+            left = (self.total - self.done) / rate if rate > 0 else float('nan')
+            eta = "{}:{:02d}".format(int(left // 60), int(left % 60)) if left == left else "?"
+            print("[{}: {}/{} ({:.1f}/s, ETA {})]".format(self.label, self.done, self.total, rate, eta),
+                  file = sys.stderr, flush = True)
+
+def summary(report):
+    lines = ["\nProfile ({:.2f}s wall):".format(report['wall_seconds'])]
+    for name, p in report['phases'].items():
+        lines.append("  {:<36} {:>6} x {:10.3f}s".format(name, p['calls'], p['seconds']))
+    if report['endpoints']:
+        lines.append("  {:<24} {:>6} {:>5} {:>5} {:>6} {:>8} {:>8} {:>8}".format(
+            'endpoint', 'calls', 'errs', 'retry', 'hit%', 'p50 ms', 'p90 ms', 'max ms'))
+        for name, e in report['endpoints'].items():
+            lines.append("  {:<24} {:>6} {:>5} {:>5} {:>6} {:>8} {:>8} {:>8}".format(
+                name, e['calls'], e['errors'], e['retries'],
+                '-' if e['cache_hit_rate'] is None else '{:.0f}'.format(100 * e['cache_hit_rate']),
+                '-' if e['p50_ms'] is None else e['p50_ms'], '-' if e['p90_ms'] is None else e['p90_ms'],
+                '-' if e['max_ms'] is None else e['max_ms']))
+    for host, seconds in report['throttle_seconds'].items():
+        lines.append("  waiting on the {} rate limit: {:.3f}s".format(host, seconds))
+    if 'peak_memory_mb' in report:
+        lines.append("  peak traced memory: {} MB".format(report['peak_memory_mb']))
+    return "\n".join(lines)
+
+def finish(path):
+    mark(None)
+    report = profile.report()
+    print(summary(report), file = sys.stderr)
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent = 2)
+    print("  report written to {}".format(path), file = sys.stderr)
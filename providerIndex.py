@@ -0,0 +1,139 @@
+################################################################################
+## streaming provider names and an inverted bitmap index over the streams
+## column. provider_map folds JustWatch's provider names onto the short names
+## stored in movies_db and my_providers is the list of services that are kept.
+## the index holds one packed bitmap of rows per provider, so "on Netflix or
+## Hulu" is an OR of two bitmaps and "on Netflix and Hulu" an AND, and a row's
+## bits can be flipped in place when its streams are refreshed.
+##
+## provider lists are written as names separated by commas (any of them) with
+## '+' joining names that must all match, e.g.
+##   netflix,hulu          on Netflix or Hulu
+##   netflix+kanopy,pbs    on both Netflix and Kanopy, or on PBS
+##   mine                  the saved subscription profile
+## names are matched case-insensitively, and an unambiguous prefix is enough.
+################################################################################
+
+import json
+import os
+import numpy as np
+
+provider_map = {'Netflix Instant' : 'Netflix',
+                'Amazon Prime' : 'Amazon',
+                'Amazon Instant Video' : 'Amazon',
+                'Amazon Prime Instant Video' : 'Amazon',
+                'HBO Now' : 'HBO',
+                'HBO Go' : 'HBO'}
+
+my_providers = ['Netflix','Amazon Prime Video','HBO Max','Hulu','Amazon Video',
+                'Apple TV Plus','YouTube','YouTube Free','CBS','HBO Now',
+                'The CW','Showtime','PBS','FXNow','Tubi TV','Kanopy',
+                'Comedy Central','Max Go','HBO Go','ABC','NBC','Syfy','A&E',
+                'Lifetime','Cartoon Network','Adult Swim','USA Network','Fox',
+                'TCM','Bravo TV','TNT']
+
+## the services you pay for, used by --subscriptions and 'mine'
+subscriptions_path = 'config/subscriptions.json'
+
+def shortName(name):
+    return provider_map.get(name, name)
+
+def loadSubscriptions(path = subscriptions_path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def saveSubscriptions(names, path = subscriptions_path):
+    with open(path, 'w') as f:
+        json.dump(names, f, indent = 2)
+
+class ProviderIndex(object):
+    def __init__(self, stream_lists, labels = None):
+        ## stream_lists is the streams column; labels are the frame's row labels
+        self.labels = list(labels) if labels is not None else list(range(len(stream_lists)))
+        self.positions = {label: pos for pos, label in enumerate(self.labels)}
+        self.size = len(self.labels)
+        rows = {}
+        for pos, streams in enumerate(stream_lists):
+            if not isinstance(streams, list):
+                continue
+            for s in streams:
+                rows.setdefault(s, []).append(pos)
+        self.bitmaps = {}
+        for name, positions in rows.items():
+            bits = np.zeros(self.size, dtype = bool)
+            bits[positions] = True
+            self.bitmaps[name] = np.packbits(bits)
+
+    def names(self):
+        return sorted(self.bitmaps)
+
+    def empty(self):
+        return np.zeros((self.size + 7) // 8, dtype = np.uint8)
+
+    def resolve(self, name):
+        ## the stored provider name for a user-typed one
+        known = sorted(set(self.bitmaps) | set(my_providers))
+        wanted = shortName(name.strip()).lower()
+        exact = [k for k in known if k.lower() == wanted]
+        if exact:
+            return exact[0]
+        prefix = [k for k in known if k.lower().startswith(wanted)]
+        if len(prefix) == 1:
+            return prefix[0]
+        if len(prefix) > 1:
+            raise ValueError("'{}' could be any of {}".format(name.strip(), prefix))
+        raise ValueError("Unknown provider '{}'".format(name.strip()))
+
+    def bitmap(self, name):
+        return self.bitmaps.get(self.resolve(name), self.empty())
+
+    def query(self, spec, subscriptions = None):
+        ## boolean mask of the rows matching a provider list (see above)
+        groups = [g.strip() for g in spec.split(',') if g.strip()]
+        if not groups:
+            raise ValueError("Empty provider list")
+        bits = self.empty()
+        for group in groups:
+            if group.lower() == 'mine':
+                names = subscriptions if subscriptions is not None else loadSubscriptions()
+                if not names:
+                    raise ValueError("No subscriptions saved in {}".format(subscriptions_path))
+                for name in names:
+                    bits |= self.bitmap(name)
+                continue
+            both = None
+            for name in group.split('+'):
+                both = self.bitmap(name) if both is None else both & self.bitmap(name)
+            bits |= both
+        return self.mask(bits)
+
+    def streaming(self):
+        ## rows on any provider at all
+        bits = self.empty()
+        for b in self.bitmaps.values():
+            bits |= b
+        return self.mask(bits)
+
+    def mask(self, bits):
+        return np.unpackbits(bits, count = self.size).astype(bool)
+
+    def update(self, label, streams):
+        ## flips one row's bits in place after its streams are refreshed;
+        ## returns the providers it was added to and removed from
+        pos = self.positions[label]
+        byte, bit = pos // 8, np.uint8(0x80 >> (pos % 8))
+        before = set(name for name, b in self.bitmaps.items() if b[byte] & bit)
+        after = set(streams) if isinstance(streams, list) else set()
+        for name in before - after:
+            self.bitmaps[name][byte] &= ~bit
+        for name in after - before:
+            if name not in self.bitmaps:
+                self.bitmaps[name] = self.empty()
+            self.bitmaps[name][byte] |= bit
+        return sorted(after - before), sorted(before - after)
+
+    def counts(self):
+        ## number of rows on each provider
+        return {name: int(np.unpackbits(b, count = self.size).sum()) for name, b in self.bitmaps.items()}
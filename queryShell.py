@@ -0,0 +1,263 @@
+################################################################################
+## long-lived query shell for chooseMovie.py (python chooseMovie.py --shell).
+## the DB and its genre index are loaded once and kept in memory, so each
+## query is a few vectorized mask operations instead of a process start and a
+## full JSON parse. before every query the store's files are checked, and if
+## another process (e.g. addMovies.py) has written to the DB the new journal
+## records are applied on top of what is loaded; only a rewritten main file
+## forces a full reload.
+##
+## a query is a genre expression (see genreIndex.py) plus any of
+##   year:1990-1999    runtime:<120    rating:>=4    rt:>80    (ranges/bounds)
+##   on:netflix,hulu   only movies streaming on any of these services ('+' for
+##                     all of them, 'mine' for the saved subscriptions; see
+##                     providerIndex.py)
+##   sort:rating,-year sort keys, descending unless prefixed with '-' or
+##                     suffixed with ':asc' (see resultView.py)
+##   limit:20          only the best 20 rows, by partial selection
+## e.g.  comedy and not horror year:1980-1999 on:netflix sort:rt limit:10
+## results are shown a page at a time.
+## commands: more (next page), show N (details of row N), reload, help, q
+################################################################################
+
+import re
+import time
+import numpy as np
+import pandas as pd
+import movieStore
+import movieSchema
+from genreIndex import GenreIndex
+from providerIndex import ProviderIndex
+from resultView import Pager, rankRows, parseSort, columnName
+
+range_columns = ['year', 'runtime', 'rating', 'avgrating', 'numratings', 'rt_score']
+display_columns = ['title', 'rating', 'avgrating', 'numratings', 'rt_score', 'year',
+                   'runtime', 'genres', 'streams']
+default_sort = [('rating', False), ('rt_score', False)]
+
+term_re = re.compile(r"(?<!\S)(\w+):(\S*)")
+bound_re = re.compile(r"^(<=|>=|<|>|=)?(-?\d+(?:\.\d+)?)$")
+span_re = re.compile(r"^(-?\d+(?:\.\d+)?)?-(-?\d+(?:\.\d+)?)?$")
+
+help_text = """Queries are a genre expression plus optional terms:
+  genres     comedy, -horror   (drama or romance) and not war   all
+  ranges     year:1990-1999  runtime:<120  rating:>=4  rt:>80  (also avg, votes)
+  services   on:netflix,hulu  on:netflix+hulu (both)  on:mine (saved subscriptions)
+  sorting    sort:rating,-year  sort:rt:desc,title:asc   (descending by default)
+  limit      limit:20
+Commands: more, show N, reload, help, q"""
+
+def prepareMovies(movies_db):
+    ## the display normalization chooseMovie.py has always applied. the columns
+    ## are already typed by movieSchema.py, so the frame is only copied shallowly
+    ## and the few columns changed here are replaced
+    movies_db = movies_db.copy(deep = False)
+    for col in ['rating', 'netflix_rating', 'avgrating', 'numratings', 'rt_score', 'year', 'runtime']:
+        if col not in movies_db.columns:
+            movies_db[col] = pd.Series(np.nan, index = movies_db.index).astype(movieSchema.column_types[col])
+    for col in ['genres', 'streams']:
+        if col not in movies_db.columns:
+            movies_db[col] = pd.Series([[]] * len(movies_db), index = movies_db.index, dtype = object)
+    ## fill any NAs in rating with netflix rating
+    movies_db['rating'] = movies_db.rating.fillna(movies_db.netflix_rating).round(1)
+    movies_db['avgrating'] = movies_db.avgrating.round(1)
+    return movies_db
+
+def printDetails(movies, idx, store = None):
+    ## the text columns may have been left out of a lazy load; the store reads
+    ## them for just this row
+    row = movies.loc[idx].copy()
+    if store is not None:
+        for col in ['tagline', 'overview']:
+            if col not in movies.columns:
+                row[col] = store.fetch(movies, idx, col)
+    tl = row.get('tagline')
+    if not isinstance(tl, str) or not len(tl): tl = 'No tagline.'
+    runtime = row.get('runtime')
+    runtime = "???" if pd.isnull(runtime) else int(runtime)
+    streams = row.get('streams')
+    if not isinstance(streams, list) or not len(streams): streams = 'Not available to stream.'
+    rt_score = row.get('rt_score')
+    rt_score = 'NaN' if pd.isnull(rt_score) else int(rt_score)
+    year = row.get('year')
+    numratings = row.get('numratings')
+    print("\n{}".format(row.get('title')))
+    print("\n{}".format(tl))
+    print("\n{}".format(row.get('overview')))
+    print("\n{}".format('???' if pd.isnull(year) else int(year)))
+    print("\n{} mins".format(runtime))
+    print("\n{:.1f} stars".format(row.get('rating')))
+    print("\n{:.1f} average rating".format(row.get('avgrating')))
+    print("\n{} ratings".format('NaN' if pd.isnull(numratings) else int(numratings)))
+    print("\n{}%".format(rt_score))
+    print("\n{}".format(row.get('genres')))
+    print("\n{}\n".format(streams))
+
+def parseRange(text):
+    ## returns (low, high, low inclusive, high inclusive); None is unbounded
+    match = bound_re.match(text)
+    if match is not None:
+        op, value = match.group(1) or '=', float(match.group(2))
+        return {'=' : (value, value, True, True),
+                '<' : (None, value, True, False),
+                '<=' : (None, value, True, True),
+                '>' : (value, None, False, True),
+                '>=' : (value, None, True, True)}[op]
+    match = span_re.match(text)
+    if match is not None and (match.group(1) or match.group(2)):
+        low = float(match.group(1)) if match.group(1) else None
+        high = float(match.group(2)) if match.group(2) else None
+        return (low, high, True, True)
+    raise ValueError("Can't read range '{}' (use e.g. 1990-1999, <120, >=4)".format(text))
+
+def parseQuery(text):
+    ## splits a query into the genre expression and its filter terms
+    query = {'genres' : None, 'ranges' : [], 'providers' : [], 'sort' : None, 'limit' : None}
+    for key, value in term_re.findall(text):
+        key = key.lower()
+        if key == 'on':
+            query['providers'].append(value)
+        elif key == 'sort':
+            query['sort'] = parseSort(value)
+        elif key == 'limit':
+            if not value.isdigit():
+                raise ValueError("limit must be a number")
+            query['limit'] = int(value)
+        elif columnName(key) in range_columns:
+            query['ranges'].append((columnName(key), parseRange(value)))
+        else:
+            raise ValueError("Unknown term '{}:' (try 'help')".format(key))
+    genres = term_re.sub(' ', text).strip()
+    query['genres'] = genres if genres else 'all'
+    return query
+
+class QueryShell(object):
+    def __init__(self, store = None, streaming = False, sort = None, providers = None):
+        ## streaming and providers (a provider list) restrict every query; sort
+        ## is the default [(column, ascending)]
+        self.store = store if store is not None else movieStore.openStore()
+        self.streaming = streaming
+        self.providers = providers
+        self.sort = sort if sort is not None else default_sort
+        self.raw = None
+        self.signature = None
+        self.last = None
+        self.pager = None
+        self.load()
+
+    def load(self):
+        self.signature = self.store.signature()
+        self.raw = self.store.load(lazy = True)
+        self.index()
+
+    def index(self):
+        self.movies = prepareMovies(self.raw)
+        self.genre_index = GenreIndex(list(self.movies.genres.values))
+        self.provider_index = ProviderIndex(list(self.movies.streams.values), self.movies.index)
+
+    def patch(self, touched):
+        ## applies updates to existing rows without rebuilding everything;
+        ## touched is row label -> updated columns
+        rows = [idx for idx in touched if idx in self.movies.index]
+        prepared = prepareMovies(self.raw.loc[rows, ])
+        columns = set(col for cols in touched.values() for col in cols)
+        for col in columns:
+            if col not in self.movies.columns:
+                self.movies[col] = None
+            for idx in rows:
+                if col in touched[idx]:
+                    if isinstance(prepared.at[idx, col], list):
+                        self.movies[col] = self.movies[col].astype(object)
+                    self.movies.at[idx, col] = prepared.at[idx, col]
+        if 'genres' in columns:
+            self.genre_index = GenreIndex(list(self.movies.genres.values))
+        for idx in rows:
+            if 'streams' in touched[idx]:
+                self.provider_index.update(idx, self.movies.at[idx, 'streams'])
+
+    def refresh(self):
+        ## picks up writes made by other processes since the last query
+        signature = self.store.signature()
+        if signature == self.signature:
+            return False
+        raw = self.store.tail(self.raw)
+        self.signature = signature
+        if raw is None:
+            self.raw = self.store.load(lazy = True)
+            self.index()
+        elif self.store.reshaped:
+            self.raw = raw
+            self.index()
+        else:
+            self.raw = raw
+            self.patch(self.store.touched)
+        return True
+
+    def run(self, query):
+        if isinstance(query, str):
+            query = parseQuery(query)
+        mask = self.genre_index.evaluate(query['genres'])
+        if self.streaming:
+            mask &= self.provider_index.streaming()
+        if self.providers:
+            mask &= self.provider_index.query(self.providers)
+        for spec in query['providers']:
+            mask &= self.provider_index.query(spec)
+        for col, (low, high, low_inc, high_inc) in query['ranges']:
+            values = self.movies[col].to_numpy(dtype = float, na_value = np.nan)
+            if low is not None:
+                mask &= (values >= low) if low_inc else (values > low)
+            if high is not None:
+                mask &= (values <= high) if high_inc else (values < high)
+        found = self.movies.loc[mask, ]
+        found = rankRows(found, query['sort'] if query['sort'] is not None else self.sort, query['limit'])
+        self.last = found
+        return found
+
+    def repl(self):
+        print(help_text)
+        print("\nOf the following genres...\n{}".format([str(g) for g in self.genre_index.present]))
+        print("\nOn the following services...\n{}".format(self.provider_index.names()))
+        while True:
+            try:
+                line = input("query> ").strip()
+            except EOFError:
+                break
+            if not line:
+                continue
+            command = line.lower().split()
+            if command[0] in ['q', 'quit', 'exit']:
+                break
+            if command[0] == 'help':
+                print(help_text)
+                continue
+            if command[0] == 'reload':
+                start = time.time()
+                self.load()
+                print("Reloaded {} movies in {:.2f}s.".format(len(self.movies), time.time() - start))
+                continue
+            if command[0] == 'more':
+                if self.pager is None:
+                    print("Run a query first.")
+                else:
+                    self.pager.next()
+                continue
+            if self.refresh():
+                print("(database changed on disk; {} movies loaded)".format(len(self.movies)))
+            if command[0] == 'show':
+                if len(command) != 2 or not command[1].lstrip('-').isdigit():
+                    print("Usage: show N")
+                elif self.last is None or int(command[1]) not in self.last.index:
+                    print("No row {} in the last results.".format(command[1]))
+                else:
+                    printDetails(self.last, int(command[1]), self.store)
+                continue
+            start = time.time()
+            try:
+                found = self.run(line)
+            except ValueError as e:
+                print(e)
+                continue
+            print("{} movies ({:.1f} ms)".format(len(found), (time.time() - start) * 1000))
+            self.pager = Pager(found, display_columns)
+            self.pager.next()
@@ -0,0 +1,203 @@
+################################################################################
+## concurrent refresh engine for the long update loops in addMovies.py. the
+## per-movie lookups are run in a pool of worker threads with a configurable
+## number of requests in flight, and every host (JustWatch, Rotten Tomatoes) is
+## throttled with its own token bucket so the rate limits aren't tripped. the
+## results are collected per row and merged back into movies_db in one batch.
+##
+## every row records when its streams, rt_score and MovieLens rating were last
+## refreshed (streams_checked, rt_checked, rating_checked, in unix seconds). an
+## update run can be given a budget -- a number of requests or a time limit --
+## and the rows are refreshed in priority order, the stalest rows with the
+## highest predicted rating first, so a cheap daily run keeps the titles most
+## likely to be watched current.
+################################################################################
+
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+import pandas as pd
+import profiler
+
+## requests per second allowed for each host unless overridden
+default_rates = {'justwatch' : 4.0,
+                 'rottentomatoes' : 2.0,
+                 'tmdb' : 4.0}
+
+class TokenBucket(object):
+    def __init__(self, rate, capacity = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity is not None else max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens = 1.0):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                delay = (tokens - self.tokens) / self.rate
+            time.sleep(delay)
+
+    def tryAcquire(self, tokens = 1.0):
+        ## takes the tokens if they're there, without waiting
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+class BudgetExhausted(Exception):
+    ## raised instead of making a request the budget has no room for; the job
+    ## is left for the next run rather than counted as failed
+    pass
+
+class Budget(object):
+    ## None means no limit on that dimension. requests are charged as they're
+    ## made, so jobs already in flight can't take a run past its budget.
+    def __init__(self, requests = None, seconds = None):
+        self.requests = requests
+        self.seconds = seconds
+        self.spent = 0
+        self.start = time.monotonic()
+        self.lock = threading.Lock()
+
+    def charge(self, n = 1):
+        ## reserves n requests, or raises BudgetExhausted
+        with self.lock:
+            if self.exhausted() or (self.requests is not None and self.spent + n > self.requests):
+                raise BudgetExhausted()
+            self.spent += n
+
+    def exhausted(self):
+        if self.requests is not None and self.spent >= self.requests:
+            return True
+        if self.seconds is not None and time.monotonic() - self.start >= self.seconds:
+            return True
+        return False
+
+def parseBudget(text):
+    ## '500' is a number of requests; '90s', '30m' or '2h' is a time limit
+    if text is None:
+        return Budget()
+    match = re.match(r'^\s*(\d+(?:\.\d+)?)\s*([smh]?)\s*$', str(text).lower())
+    if match is None:
+        raise ValueError("Budget must be a request count (500) or a time limit (90s, 30m, 2h)")
+    amount, unit = float(match.group(1)), match.group(2)
+    if unit == '':
+        return Budget(requests = int(amount))
+    return Budget(seconds = amount * {'s' : 1, 'm' : 60, 'h' : 60 * 60}[unit])
+
+def refreshOrder(movies_db, checked_col, now = None):
+    ## row labels ordered by staleness weighted by predicted rating, most
+    ## valuable first. rows never checked count as stale since the epoch.
+    if now is None:
+        now = time.time()
+    if checked_col in movies_db.columns:
+        checked = pd.to_numeric(movies_db[checked_col], errors = 'coerce').fillna(0).values
+    else:
+        checked = np.zeros(len(movies_db))
+    staleness = np.maximum(now - checked, 0)
+    weight = pd.Series(np.nan, index = movies_db.index)
+    for col in ['rating', 'avgrating']:
+        if col in movies_db.columns:
+            weight = weight.fillna(pd.to_numeric(movies_db[col], errors = 'coerce'))
+    weight = weight.fillna(2.5).clip(lower = 0.5).values
+    order = np.argsort(-(staleness * weight), kind = 'stable')
+    return list(movies_db.index[order])
+
+class HostLimiter(object):
+    ## a rate of None or <= 0 leaves that host unthrottled. every acquire is
+    ## charged against the budget, if one is given, and raises
+    ## BudgetExhausted once it's spent.
+    def __init__(self, rates = None, budget = None):
+        self.rates = dict(default_rates)
+        if rates is not None:
+            self.rates.update(rates)
+        self.budget = budget
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, host):
+        with self.lock:
+            if host not in self.buckets:
+                rate = self.rates.get(host)
+                self.buckets[host] = TokenBucket(rate) if rate is not None and rate > 0 else None
+            return self.buckets[host]
+
+    def acquire(self, host):
+        if self.budget is not None:
+            self.budget.charge()
+        bucket = self.bucket(host)
+        if bucket is not None:
+            start = time.perf_counter()
+            bucket.acquire()
+            profiler.throttled(host, time.perf_counter() - start)
+
+def runConcurrent(jobs, fn, workers = 8, on_result = None, budget = None):
+    ## jobs is an iterable of (key, args) pairs; fn(*args) is run for each one.
+    ## returns a dict of key -> result and a dict of key -> exception.
+    ## on_result(key, result) is called from the main thread as jobs finish.
+    ## jobs are submitted as workers free up, and no new ones are started
+    ## once the budget is exhausted. a job stopped by BudgetExhausted is in
+    ## neither dict, like the jobs never started.
+    workers = max(1, int(workers))
+    results = {}
+    errors = {}
+    jobs = iter(jobs)
+    futures = {}
+    with ThreadPoolExecutor(max_workers = workers) as pool:
+        while True:
+            while len(futures) < workers and (budget is None or not budget.exhausted()):
+                job = next(jobs, None)
+                if job is None:
+                    break
+                key, args = job
+                futures[pool.submit(fn, *args)] = key
+            if not futures:
+                break
+            done, not_done = wait(list(futures), return_when = FIRST_COMPLETED)
+            for future in done:
+                key = futures.pop(future)
+                try:
+                    results[key] = future.result()
+                except BudgetExhausted:
+                    continue
+                except Exception as e:
+                    errors[key] = e
+                    continue
+                if on_result is not None:
+                    on_result(key, results[key])
+    return results, errors
+
+def mergeUpdates(movies_db, updates):
+    ## updates is a dict of row index -> {column: new value}. every column is
+    ## written with a single aligned assignment instead of one .at per row.
+    if not updates:
+        return movies_db
+    columns = []
+    for update in updates.values():
+        for col in update:
+            if col not in columns:
+                columns.append(col)
+    for col in columns:
+        vals = {idx: u[col] for idx, u in updates.items() if col in u}
+        if col not in movies_db.columns:
+            movies_db[col] = None
+        if movies_db[col].dtype == object or any(isinstance(v, list) for v in vals.values()):
+            movies_db[col] = movies_db[col].astype(object)
+            new_col = pd.Series(vals, dtype = object)
+        else:
+            new_col = pd.Series(vals, dtype = movies_db[col].dtype)
+        movies_db.loc[new_col.index, col] = new_col
+    return movies_db
@@ -1,43 +1,124 @@
+################################################################################
+## removes watched movies from movies_db, moving them into the watched-history
+## archive (watchHistory.py) instead of deleting them. titles are found through
+## movieLookup.py: exact title (and year), then prefix, then substring.
+##
+##   python removeMovie.py                           asks for a title
+##   python removeMovie.py "Heat (1995)" tmdb:603    removes these
+##   python removeMovie.py --batch watched.txt       one title or id per line
+##   python removeMovie.py --batch diary.csv         a Letterboxd diary export
+## in batch mode every entry that matches exactly one movie is listed and
+## removed after one confirmation (or none with --yes); entries that match
+## nothing or several movies are reported and left alone.
+################################################################################
+
+import argparse
+import csv
 import sys
-import shutil
-import json
-import pandas as pd
-import numpy as np
-import pdb
-
-with open("databases/movies_db.json", "r") as f:
-    movies_in = json.load(f)
-    movies_db = pd.DataFrame(movies_in)
-
-## backup database
-shutil.copyfile('databases/movies_db.json', 'databases/backup/movies_db.json')
-
-## remove by title
-in_one = input("What's the name of the movie to remove? ")
-title_idx = [in_one.lower() in t.lower() for t in movies_db.title.values]
-
-if sum(title_idx) == 0:
-    print("\nNo matches found.")
-    sys.exit()
-
-print("\n{}".format(movies_db.loc[title_idx, ['title', 'rating', 'year', 'runtime', 'genres', 'streams', 'tagline']].to_string()))
-
-if len(movies_db.loc[title_idx, ]) > 1:
-    in_two = int(input("\nWhich one? (Enter index of row) "))
-    if isinstance(in_two, int):
-        print("\n{}".format(movies_db[[
-            'title', 'rating', 'year', 'runtime', 'genres', 'streams', 'tagline'
-        ]].loc[in_two, ]))
-    else:
-        print("Please enter a valid row number index next time. Exiting...")
+import movieStore
+from movieLookup import MovieLookup
+from watchHistory import archive, history_path
+
+display = ['title', 'rating', 'year', 'runtime', 'genres', 'streams']
+
+def readBatch(path):
+    ## [(query, watched date or None)]; a Letterboxd export is a CSV with
+    ## Name and Year columns and the date in Watched Date (diary) or Date
+    with open(path, 'r', newline = '', encoding = 'utf-8') as f:
+        head = f.readline()
+        f.seek(0)
+        if path.lower().endswith('.csv') and 'Name' in head:
+            entries = []
+            for row in csv.DictReader(f):
+                name, year = row.get('Name', '').strip(), row.get('Year', '').strip()
+                if name:
+                    entries.append(("{} ({})".format(name, year) if year else name,
+                                    row.get('Watched Date') or row.get('Date') or None))
+            return entries
+        return [(line.strip(), None) for line in f if line.strip() and not line.startswith('#')]
+
+def removeBatch(store, movies_db, entries, yes = False):
+    lookup = MovieLookup(movies_db)
+    chosen = {}
+    unmatched = []
+    ambiguous = []
+    for query, watched in entries:
+        found, how = lookup.find(query)
+        if len(found) == 1:
+            chosen.setdefault(found[0], watched)
+        elif len(found) == 0:
+            unmatched.append(query)
+        else:
+            ambiguous.append((query, found))
+    for query in unmatched:
+        print("No match for '{}'.".format(query))
+    for query, found in ambiguous:
+        print("'{}' matches {} movies: {}{}".format(
+            query, len(found), ", ".join("{} ({})".format(movies_db.loc[i, 'title'], i) for i in found[:5]),
+            ", ..." if len(found) > 5 else ""
+        ))
+    if not chosen:
+        print("\nNothing to remove.")
+        return movies_db
+    print("\n{}".format(movies_db.loc[list(chosen), [c for c in display if c in movies_db.columns]].to_string()))
+    if not yes and input("\nRemove these {} movies? (y or n) ".format(len(chosen))) != 'y':
+        print("\nOK. Nothing removed.")
+        return movies_db
+    archive(movies_db, list(chosen), chosen)
+    movies_db = store.removeMany(movies_db, list(chosen))
+    print("\n{} movies moved to {}.".format(len(chosen), history_path))
+    return movies_db
+
+def removeOne(store, movies_db):
+    in_one = input("What's the name of the movie to remove? ")
+    found, how = MovieLookup(movies_db).find(in_one)
+
+    if len(found) == 0:
+        print("\nNo matches found.")
         sys.exit()
-else:
-    in_two = int(movies_db.loc[title_idx, ].index[0])
-in_three = input("\nThis one? (y or n) ")
-
-if in_three == 'y' and isinstance(in_two, int):
-    movies_db = movies_db.loc[movies_db.index != in_two, ]
-    with open('databases/movies_db.json', 'w') as outfile:
-        json.dump(list(movies_db.T.to_dict().values()), outfile)
-else:
-    print("\nOK. Try again.")
+
+    ## taglines are read for the matches only
+    matches = movies_db.loc[found, [c for c in display if c in movies_db.columns]].copy()
+    matches['tagline'] = [store.fetch(movies_db, idx, 'tagline') for idx in matches.index]
+    print("\n{}".format(matches.to_string()))
+
+    if len(found) > 1:
+        in_two = int(input("\nWhich one? (Enter index of row) "))
+        if in_two in matches.index:
+            print("\n{}".format(matches.loc[in_two]))
+        else:
+            print("Please enter a valid row number index next time. Exiting...")
+            sys.exit()
+    else:
+        in_two = int(found[0])
+    in_three = input("\nThis one? (y or n) ")
+
+    if in_three == 'y' and isinstance(in_two, int):
+        archive(movies_db, [in_two])
+        movies_db = store.removeMany(movies_db, [in_two])
+        print("\nMoved to {}.".format(history_path))
+    else:
+        print("\nOK. Try again.")
+    return movies_db
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("queries", nargs = '*',
+                        help = "titles (optionally 'Title (Year)') or ids (ml:, tmdb:, imdb:, jw:) to remove")
+    parser.add_argument("--batch", help = "file of titles or ids, one per line, or a Letterboxd diary/watched CSV")
+    parser.add_argument("--yes", help = "don't ask before removing the matched movies", action = "store_true")
+    args = parser.parse_args()
+
+    store = movieStore.openStore()
+    movies_db = store.load(lazy = True)
+
+    ## backup database
+    store.backup()
+
+    entries = [(q, None) for q in args.queries]
+    if args.batch is not None:
+        entries += readBatch(args.batch)
+    if entries:
+        movies_db = removeBatch(store, movies_db, entries, args.yes)
+    else:
+        movies_db = removeOne(store, movies_db)
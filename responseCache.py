@@ -0,0 +1,139 @@
+################################################################################
+## persistent on-disk cache for the TMDB, JustWatch and Rotten Tomatoes lookups
+## made by addMovies.py. responses are stored in a small SQLite file keyed by
+## endpoint and request parameters. every endpoint has its own TTL, so metadata
+## that never changes (overview, tagline, runtime, genres) is kept for a long
+## time while streaming offers expire quickly. the cache is bounded in size and
+## evicts the least recently used entries first.
+##
+## pass --no-cache to addMovies.py to bypass it entirely or --refresh-cache to
+## ignore what is stored and overwrite it with fresh responses.
+################################################################################
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import profiler
+import retryLayer
+
+cache_path = 'databases/response_cache.sqlite'
+
+day = 24 * 60 * 60
+## seconds an entry is considered fresh, by endpoint
+ttls = {'tmdb.info' : 180 * day,
+        'tmdb.find' : 180 * day,
+        'tmdb.search' : 30 * day,
+        'justwatch.search' : 7 * day,
+        'justwatch.title' : 0.5 * day,
+        'justwatch.genres' : 30 * day,
+        'rottentomatoes.search' : 3 * day}
+default_ttl = day
+
+max_entries = 50000
+
+class ResponseCache(object):
+    def __init__(self, path = cache_path, max_entries = max_entries,
+                 enabled = True, refresh = False):
+        self.path = path
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = None
+        self.count = 0
+
+    def connect(self):
+        if self.conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok = True)
+            self.conn = sqlite3.connect(self.path, check_same_thread = False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, endpoint TEXT, value TEXT, "
+                "created REAL, accessed REAL)"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+            )
+            self.conn.commit()
+            self.count = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return self.conn
+
+    def key(self, endpoint, params):
+        return endpoint + ':' + json.dumps(params, sort_keys = True, default = str)
+
+    def get(self, endpoint, params):
+        ## returns (hit, value)
+        if not self.enabled or self.refresh:
+            return False, None
+        key = self.key(endpoint, params)
+        ttl = ttls.get(endpoint, default_ttl)
+        now = time.time()
+        with self.lock:
+            conn = self.connect()
+            row = conn.execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > ttl:
+                self.misses += 1
+                return False, None
+            conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+        return True, json.loads(row[0])
+
+    def put(self, endpoint, params, value):
+        if not self.enabled:
+            return
+        key = self.key(endpoint, params)
+        now = time.time()
+        with self.lock:
+            conn = self.connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, value, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, endpoint, json.dumps(value), now, now)
+            )
+            self.count += 1
+            if self.count > self.max_entries:
+                self.evict()
+            conn.commit()
+
+    def evict(self):
+        ## drop the least recently used tenth of the cache in one statement
+        conn = self.connect()
+        self.count = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        excess = self.count - int(self.max_entries * 0.9)
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY accessed LIMIT ?)", (excess,)
+            )
+            self.count -= excess
+
+    def fetch(self, endpoint, params, fn):
+        hit, value = self.get(endpoint, params)
+        if self.enabled and not self.refresh:
+            profiler.cacheLookup(endpoint, hit)
+        if hit:
+            return value
+        value = retryLayer.call(endpoint, fn)
+        self.put(endpoint, params, value)
+        return value
+
+cache = ResponseCache()
+
+def configure(enabled = True, refresh = False, path = None):
+    cache.enabled = enabled
+    cache.refresh = refresh
+    if path is not None:
+        cache.path = path
+        cache.conn = None
+    return cache
+
+def cachedCall(endpoint, params, fn):
+    return cache.fetch(endpoint, params, fn)
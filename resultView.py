@@ -0,0 +1,147 @@
+################################################################################
+## ranking and terminal rendering of query results for chooseMovie.py and the
+## query shell. sort keys are typed: numbers sort numerically with missing
+## values last in either direction, text sorts case-insensitively and list
+## columns (genres, streams) sort by length. with a top-k limit only the best
+## k rows are selected (np.argpartition on the first key) before the final
+## sort, and results are rendered a page at a time, formatting only the rows
+## on screen.
+##
+## sort keys are column names separated by commas, descending by default; a
+## leading '-' or a ':asc' suffix sorts that key ascending, e.g.
+##   rating,rt_score      rt:desc,-year      title:asc
+################################################################################
+
+import shutil
+import numpy as np
+import pandas as pd
+
+## short names accepted in sort keys
+column_aliases = {'rt' : 'rt_score',
+                  'avg' : 'avgrating',
+                  'votes' : 'numratings'}
+## widest a list or text cell gets before it's cut off
+max_cell_width = 40
+
+def columnName(name):
+    name = name.strip().lower()
+    return column_aliases.get(name, name)
+
+def parseSort(text):
+    ## [(column, ascending)] from e.g. 'rating,-year' or 'rt:desc,title:asc'
+    keys = []
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        ascending = False
+        if part.startswith('-'):
+            ascending, part = True, part[1:]
+        elif part.startswith('+'):
+            part = part[1:]
+        if ':' in part:
+            part, direction = part.rsplit(':', 1)
+            if direction.lower() not in ['asc', 'desc']:
+                raise ValueError("Sort direction must be asc or desc, not '{}'".format(direction))
+            ascending = direction.lower() == 'asc'
+        keys.append((columnName(part), ascending))
+    return keys
+
+def sortValues(column, ascending):
+    ## a float array that sorts ascending in the wanted order, missing last
+    if column.dtype.kind in 'iufb':
+        values = column.to_numpy(dtype = float, na_value = np.nan)
+    else:
+        sample = next((v for v in column.values if isinstance(v, (list, str))), None)
+        if isinstance(sample, list):
+            values = np.array([len(v) if isinstance(v, list) else np.nan for v in column.values], dtype = float)
+        elif isinstance(sample, str):
+            codes, uniques = pd.factorize(pd.Series(
+                [v.lower() if isinstance(v, str) else None for v in column.values], dtype = object
+            ), sort = True)
+            values = np.where(codes < 0, np.nan, codes).astype(float)
+        else:
+            values = pd.to_numeric(column, errors = 'coerce').to_numpy(dtype = float, na_value = np.nan)
+    values = values if ascending else -values
+    return np.where(np.isnan(values), np.inf, values)
+
+def rankRows(movies, keys, top = None):
+    ## movies ordered by keys ([(column, ascending)]); with top, only the best
+    ## `top` rows are selected and sorted
+    for col, ascending in keys:
+        if col not in movies.columns:
+            raise ValueError("Can't sort by unknown column '{}'".format(col))
+    if not keys:
+        return movies if top is None else movies.iloc[:top]
+    first = sortValues(movies[keys[0][0]], keys[0][1])
+    candidates = np.arange(len(movies))
+    if top is not None and top < len(movies):
+        ## everything tied with the k-th best on the first key stays in, so
+        ## the later keys still decide between them
+        kth = first[np.argpartition(first, top - 1)[top - 1]] if top > 0 else -np.inf
+        candidates = np.flatnonzero(first <= kth)
+    ## the other keys are only computed for the candidates
+    subset = movies.iloc[candidates]
+    columns = [first[candidates]] + [sortValues(subset[col], ascending) for col, ascending in keys[1:]]
+    ## lexsort's last key is the primary one; the position keeps it stable
+    order = candidates[np.lexsort([candidates] + columns[::-1])]
+    if top is not None:
+        order = order[:top]
+    return movies.iloc[order]
+
+def missing(value):
+    return value is None or value is pd.NA or (isinstance(value, (float, np.floating)) and np.isnan(value))
+
+def formatCell(value, decimals = 1):
+    if isinstance(value, list):
+        text = ", ".join(str(v) for v in value)
+    elif missing(value):
+        text = "-"
+    elif isinstance(value, (float, np.floating)):
+        text = "{:.{}f}".format(value, decimals)
+    else:
+        text = str(value)
+    return text if len(text) <= max_cell_width else text[:max_cell_width - 3] + "..."
+
+def renderRows(movies, columns, start, count):
+    ## the formatted lines for rows start..start+count, with a header. float
+    ## columns whose values on the page are all whole numbers drop the decimal.
+    rows = movies.iloc[start:start + count]
+    cells = [[str(idx)] for idx in rows.index]
+    for col in columns:
+        values = list(rows[col].values)
+        whole = all(missing(v) or not isinstance(v, (float, np.floating)) or float(v).is_integer()
+                    for v in values)
+        for cell, v in zip(cells, values):
+            cell.append(formatCell(v, 0 if whole else 1))
+    header = [''] + columns
+    widths = [max([len(header[i])] + [len(r[i]) for r in cells]) for i in range(len(header))]
+    lines = ["  ".join(h.rjust(w) if i == 0 else h.ljust(w) for i, (h, w) in enumerate(zip(header, widths)))]
+    for r in cells:
+        lines.append("  ".join(c.rjust(w) if i == 0 else c.ljust(w) for i, (c, w) in enumerate(zip(r, widths))))
+    return lines
+
+def pageSize():
+    ## rows that fit on screen under the header and prompt
+    return max(5, shutil.get_terminal_size((100, 30)).lines - 6)
+
+class Pager(object):
+    ## prints results a page at a time; next() shows the following page
+    def __init__(self, movies, columns, size = None):
+        self.movies = movies
+        self.columns = [c for c in columns if c in movies.columns]
+        self.size = size if size is not None else pageSize()
+        self.shown = 0
+
+    def more(self):
+        return self.shown < len(self.movies)
+
+    def next(self):
+        if not self.more():
+            print("(no more rows)")
+            return
+        print("\n{}".format("\n".join(renderRows(self.movies, self.columns, self.shown, self.size))))
+        self.shown += self.size
+        if self.more():
+            print("({} of {} rows shown)".format(self.shown, len(self.movies)))
+        print("")
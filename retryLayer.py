@@ -0,0 +1,176 @@
+################################################################################
+## retries for the requests addMovies.py makes to TMDB, JustWatch, Rotten
+## Tomatoes and MovieLens, so a long unattended refresh finishes on its own.
+## every failure is classified:
+##   permanent    404, 500 and other 4xx: not retried
+##   throttled    429 (and 503): retried after the Retry-After header if there
+##                is one, and the host's concurrency is halved
+##   transient    timeouts and other 5xx: retried
+##   slow page    a selenium page that didn't load within its timeout: retried
+##                once (page_timeout_attempts), since a page that slow usually
+##                stays slow and every attempt holds a browser for the timeout
+##   connection   connection refused/reset, DNS failures: retried
+##   other        anything else (a parse error, say): not retried
+## retries back off exponentially with full jitter, up to max_attempts calls.
+##
+## each host also has a gate on the number of its requests in flight. it
+## starts at the configured concurrency, is halved when the host throttles,
+## and grows back by one after every recover_after successes in a row.
+################################################################################
+
+import email.utils
+import random
+import threading
+import time
+import profiler
+
+max_attempts = 5
+## attempts at a page that keeps timing out, counting the first
+page_timeout_attempts = 2
+## seconds; the n-th retry waits up to min(max_delay, base_delay * 2 ** n)
+base_delay = 1.0
+max_delay = 60.0
+## most Retry-After honored, so a bogus header can't stall a run
+max_retry_after = 300.0
+default_concurrency = 16
+recover_after = 20
+
+permanent = 'permanent'
+throttled = 'throttled'
+transient = 'transient'
+slow_page = 'slow page'
+connection = 'connection'
+other = 'other'
+
+def status(e):
+    response = getattr(e, 'response', None)
+    code = getattr(response, 'status_code', None)
+    if code is None:
+        code = getattr(e, 'status_code', None) or getattr(e, 'code', None)
+    try:
+        return int(code)
+    except (TypeError, ValueError):
+        return None
+
+def classify(e):
+    code = status(e)
+    if code is not None:
+        if code in [429, 503]:
+            return throttled
+        if code == 500 or 400 <= code < 500:
+            return permanent
+        if code >= 500:
+            return transient
+    names = [c.__name__ for c in type(e).__mro__]
+    if any('Timeout' in n for n in names):
+        if type(e).__module__.startswith('selenium'):
+            return slow_page
+        return transient
+    if isinstance(e, ConnectionError) or any(n in ['ConnectionError', 'URLError', 'gaierror'] for n in names):
+        return connection
+    return other
+
+def retryAfter(e):
+    ## seconds asked for by a Retry-After header, or None
+    response = getattr(e, 'response', None)
+    headers = getattr(response, 'headers', None) or getattr(e, 'headers', None) or {}
+    value = headers.get('Retry-After') if hasattr(headers, 'get') else None
+    if value is None:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), max_retry_after)
+
+def backoff(attempt):
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+class HostGate(object):
+    ## limits one host's requests in flight, adapting to throttling
+    def __init__(self, limit):
+        self.ceiling = limit
+        self.limit = limit
+        self.active = 0
+        self.streak = 0
+        self.cond = threading.Condition()
+
+    def __enter__(self):
+        with self.cond:
+            while self.active >= self.limit:
+                self.cond.wait()
+            self.active += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify_all()
+
+    def succeeded(self):
+        with self.cond:
+            self.streak += 1
+            if self.streak >= recover_after and self.limit < self.ceiling:
+                self.limit += 1
+                self.streak = 0
+                self.cond.notify_all()
+
+    def throttled(self):
+        with self.cond:
+            self.streak = 0
+            self.limit = max(1, self.limit // 2)
+
+gates = {}
+gates_lock = threading.Lock()
+## concurrency of particular hosts, overriding default_concurrency
+host_concurrency = {}
+
+def configure(concurrency = None, attempts = None, hosts = None):
+    global default_concurrency, max_attempts
+    if concurrency is not None:
+        default_concurrency = max(1, int(concurrency))
+    if attempts is not None:
+        max_attempts = max(1, int(attempts))
+    if hosts is not None:
+        host_concurrency.update(hosts)
+    with gates_lock:
+        gates.clear()
+
+def gate(host):
+    with gates_lock:
+        if host not in gates:
+            gates[host] = HostGate(max(1, int(host_concurrency.get(host, default_concurrency))))
+        return gates[host]
+
+def call(endpoint, fn, attempts = None):
+    ## fn() with retries; the host is the part of endpoint before the first '.'
+    ## (tmdb.search -> tmdb). the last error is raised once retries run out.
+    host = endpoint.split('.')[0]
+    attempts = attempts or max_attempts
+    page_timeouts = 0
+    for attempt in range(attempts):
+        with gate(host):
+            try:
+                value = profiler.timedCall(endpoint, fn)
+            except Exception as e:
+                kind = classify(e)
+                if kind == slow_page:
+                    page_timeouts += 1
+                if kind in [permanent, other] or attempt == attempts - 1 \
+                        or page_timeouts >= page_timeout_attempts:
+                    raise
+                delay = backoff(attempt)
+                if kind == throttled:
+                    gate(host).throttled()
+                    profiler.count('throttled by ' + host)
+                    wait = retryAfter(e)
+                    if wait is not None:
+                        delay = max(delay, wait)
+            else:
+                gate(host).succeeded()
+                return value
+        profiler.retry(endpoint)
+        time.sleep(delay)
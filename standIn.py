@@ -0,0 +1,346 @@
+################################################################################
+## local stand-in for the services addMovies.py talks to (TMDB, JustWatch,
+## Rotten Tomatoes and MovieLens), for benchmarking and testing the network
+## paths offline. requests for https://<host>/<path> are served from
+## http://127.0.0.1:<port>/<host>/<path>:
+##   - from a fixture file if there is one: fixtures/standin/<host>/<path>.json
+##     (or .html), or <path>@<query>.json for a particular query string, where
+##     <query> is the sorted parameters url-encoded (api_key left out);
+##   - otherwise from a synthetic response generated from the request, so
+##     every lookup finds a plausible match without any fixtures.
+## every host can be given a latency (plus random jitter), error rates for
+## 404, 500 and 429 responses, and a rate limit past which requests get a 429
+## with Retry-After. /_stats returns the request counts per host and status.
+##
+##   python standIn.py --port 8765 --latency 0.2,tmdb=0.05 --jitter 0.05 \
+##       --errors 500=0.02,429=0.01 --rate justwatch=4,rottentomatoes=2
+##   python addMovies.py --standin http://127.0.0.1:8765 --no-cache --updatestreaming
+##
+## --standin (or the STANDIN_URL environment variable) installs a hook that
+## rewrites the URLs of every requests session, which covers tmdbsimple, the
+## JustWatch client and the Rotten Tomatoes client; the selenium pages go
+## through url().
+################################################################################
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl, urlencode, unquote
+from refreshEngine import TokenBucket
+
+fixtures_dir = 'fixtures/standin'
+## host -> short name used in the latency/error/rate settings
+hosts = {'api.themoviedb.org' : 'tmdb',
+         'apis.justwatch.com' : 'justwatch',
+         'www.rottentomatoes.com' : 'rottentomatoes',
+         'movielens.org' : 'movielens'}
+
+genre_names = ['Action', 'Adventure', 'Animation', 'Comedy', 'Crime', 'Documentary', 'Drama',
+               'Family', 'Fantasy', 'History', 'Horror', 'Music', 'Mystery', 'Romance',
+               'Science Fiction', 'Thriller', 'War', 'Western']
+
+################################################################################
+## client side
+################################################################################
+
+base_url = None
+
+def url(u):
+    ## the stand-in's address for a real service URL, once installed
+    if base_url is None:
+        return u
+    parts = urlsplit(u)
+    if parts.hostname not in hosts:
+        return u
+    return "{}/{}{}".format(base_url, parts.hostname, u[u.index(parts.hostname) + len(parts.hostname):])
+
+def install(standin_url):
+    ## points every requests session at the stand-in
+    global base_url
+    import requests
+    base_url = standin_url.rstrip('/')
+    if getattr(requests.Session.request, 'standin', False):
+        return
+    original = requests.Session.request
+
+    def request(self, method, u, *args, **kwargs):
+        return original(self, method, url(u), *args, **kwargs)
+    request.standin = True
+    requests.Session.request = request
+
+def installFromEnvironment():
+    if os.environ.get('STANDIN_URL'):
+        install(os.environ['STANDIN_URL'])
+
+################################################################################
+## synthetic responses
+################################################################################
+
+def stableInt(*parts):
+    return int(hashlib.md5('|'.join(str(p) for p in parts).encode()).hexdigest()[:8], 16)
+
+## ids handed out by title searches, so a details lookup for the id
+## describes the same movie
+searched = {}
+
+def fakeMovie(key):
+    ## the same movie for the same title or id every time
+    key = str(key)
+    if key.isdigit():
+        key = searched.get(int(key), key)
+    rng = random.Random(stableInt('movie', key.lower()))
+    title = key.title() if not key.isdigit() else "Movie {}".format(key)
+    movie_id = int(key) if key.isdigit() else stableInt('id', key.lower()) % 900000 + 1
+    if not key.isdigit():
+        searched[movie_id] = key
+    return {'id' : movie_id,
+            'title' : title,
+            'year' : rng.randint(1930, 2025),
+            'runtime' : rng.randint(75, 180),
+            'genres' : rng.sample(range(len(genre_names)), rng.randint(1, 3)),
+            'imdb_id' : 'tt{:07d}'.format(stableInt('imdb', key.lower()) % 9999999),
+            'rt_score' : rng.randint(0, 100),
+            'rating' : round(rng.uniform(0.5, 5.0), 1),
+            'avgrating' : round(rng.uniform(0.5, 5.0), 1),
+            'numratings' : rng.randint(10, 90000),
+            'providers' : rng.sample([8, 9, 15, 337, 384, 350, 73, 191], rng.randint(0, 3))}
+
+def tmdbResponse(path, query):
+    match = re.match(r'^/3/search/movie$', path)
+    if match:
+        if int(query.get('page', 1)) > 1:
+            return {'page' : int(query['page']), 'results' : [], 'total_pages' : 1}
+        m = fakeMovie(query.get('query', ''))
+        return {'page' : 1, 'total_pages' : 1, 'results' : [{
+            'id' : m['id'], 'title' : m['title'], 'release_date' : '{}-01-01'.format(m['year']),
+            'popularity' : 10.0}]}
+    match = re.match(r'^/3/movie/(\d+)$', path)
+    if match:
+        m = fakeMovie(match.group(1))
+        return {'id' : m['id'], 'title' : m['title'],
+                'release_date' : '{}-01-01'.format(m['year']), 'runtime' : m['runtime'],
+                'genres' : [{'id' : g, 'name' : genre_names[g]} for g in m['genres']],
+                'imdb_id' : m['imdb_id'], 'overview' : "An overview of {}.".format(m['title']),
+                'tagline' : "A tagline for {}.".format(m['title']), 'original_language' : 'en'}
+    match = re.match(r'^/3/find/(tt\d+)$', path)
+    if match:
+        m = fakeMovie(match.group(1))
+        return {'movie_results' : [{'id' : m['id'], 'title' : m['title'],
+                                    'release_date' : '{}-01-01'.format(m['year'])}]}
+    return None
+
+def jwItem(key, jw_id = None):
+    m = fakeMovie(key)
+    return {'id' : jw_id if jw_id is not None else m['id'], 'title' : m['title'],
+            'object_type' : 'movie', 'original_release_year' : m['year'], 'runtime' : m['runtime'],
+            'short_description' : "An overview of {}.".format(m['title']),
+            'genre_ids' : [g + 1 for g in m['genres']],
+            'scoring' : [{'provider_type' : 'tomato:meter', 'value' : m['rt_score']},
+                         {'provider_type' : 'imdb:id', 'value' : m['imdb_id']}],
+            'offers' : [{'monetization_type' : 'flatrate', 'provider_id' : p} for p in m['providers']]}
+
+def justWatchResponse(path, query, body):
+    if re.match(r'^/content/locales/state$', path):
+        return [{'iso_3166_2' : 'US', 'full_locale' : 'en_US', 'country' : 'United States'}]
+    if re.match(r'^/content/providers/locale/\w+$', path):
+        providers_path = 'config/providers.json'
+        if os.path.exists(providers_path):
+            with open(providers_path, 'r') as f:
+                return list(json.load(f).values())
+        return []
+    if re.match(r'^/content/genres/locale/\w+$', path):
+        return [{'id' : g + 1, 'translation' : name, 'short_name' : name[:3].lower()}
+                for g, name in enumerate(genre_names)]
+    if re.match(r'^/content/titles/\w+/popular$', path):
+        search = body.get('query') or query.get('query') or ''
+        return {'items' : [jwItem(search)] if search else [], 'page' : 1, 'total_pages' : 1}
+    match = re.match(r'^/content/titles/movie/(\d+)/locale/\w+$', path)
+    if match:
+        return jwItem(match.group(1), int(match.group(1)))
+    return None
+
+def rottenTomatoesResponse(path, query):
+    if re.match(r'^/api/private/v\d\.\d/search/?$', path):
+        m = fakeMovie(query.get('q', ''))
+        return {'movies' : [{'name' : m['title'], 'year' : m['year'], 'meterScore' : m['rt_score'],
+                             'url' : '/m/' + re.sub(r'\W+', '_', m['title'].lower()), 'subline' : ''}]}
+    return None
+
+def movieLensResponse(path, query):
+    if path.rstrip('/') == '/login':
+        return ('<html><body><form><input name="userName"><input name="password" type="password">'
+                '<button type="submit">Log in</button></form></body></html>')
+    match = re.match(r'^/movies/(\d+)$', path)
+    if match:
+        m = fakeMovie(match.group(1))
+        return ('<html><body><h1>{}</h1>'
+                '<div class="movie-details-heading">MovieLens predicts for you</div><div>{} stars</div>'
+                '<div class="movie-details-heading">Average of {:,} ratings</div><div>{} stars</div>'
+                '</body></html>').format(m['title'], m['rating'], m['numratings'], m['avgrating'])
+    return None
+
+def syntheticResponse(host, path, query, body):
+    if host == 'api.themoviedb.org':
+        return tmdbResponse(path, query)
+    if host == 'apis.justwatch.com':
+        return justWatchResponse(path, query, body)
+    if host == 'www.rottentomatoes.com':
+        return rottenTomatoesResponse(path, query)
+    if host == 'movielens.org':
+        return movieLensResponse(path, query)
+    return None
+
+################################################################################
+## server
+################################################################################
+
+def parseSettings(text, cast = float):
+    ## '0.2' applies to every host; 'tmdb=0.1,justwatch=0.3' per host; both mix
+    settings = {}
+    for part in (text or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '=' in part:
+            key, value = part.split('=', 1)
+            settings[key.strip()] = cast(value)
+        else:
+            settings['*'] = cast(part)
+    return settings
+
+class StandIn(object):
+    def __init__(self, fixtures = fixtures_dir, latency = None, jitter = None, errors = None,
+                 rates = None, seed = 0):
+        ## latency, jitter and rates are {host name or '*': value}; errors is
+        ## {status: rate} for every host
+        self.fixtures = fixtures
+        self.latency = latency or {}
+        self.jitter = jitter or {}
+        self.errors = errors or {}
+        self.buckets = {name: TokenBucket(rate) for name, rate in (rates or {}).items() if rate > 0}
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    def setting(self, settings, name, default = 0.0):
+        return settings.get(name, settings.get('*', default))
+
+    def fixture(self, host, path, query):
+        base = os.path.join(self.fixtures, host, unquote(path).strip('/') or 'index')
+        params = urlencode(sorted((k, v) for k, v in query.items() if k != 'api_key'))
+        for candidate in ([base + '@' + params] if params else []) + [base]:
+            for ext, kind in [('.json', 'application/json'), ('.html', 'text/html')]:
+                if os.path.exists(candidate + ext):
+                    with open(candidate + ext, 'rb') as f:
+                        return kind, f.read()
+        return None
+
+    def count(self, name, status):
+        with self.lock:
+            per_host = self.stats.setdefault(name, {})
+            per_host[str(status)] = per_host.get(str(status), 0) + 1
+
+    def respond(self, method, target, body):
+        ## returns (status, headers, body bytes)
+        parts = target.lstrip('/').split('/', 1)
+        host, rest = parts[0], '/' + (parts[1] if len(parts) > 1 else '')
+        split = urlsplit(rest)
+        path, query = split.path, dict(parse_qsl(split.query))
+        name = hosts.get(host, host)
+        with self.lock:
+            delay = self.setting(self.latency, name) + self.rng.uniform(0, self.setting(self.jitter, name))
+            roll = self.rng.random()
+        if delay > 0:
+            time.sleep(delay)
+        bucket = self.buckets.get(name, self.buckets.get('*'))
+        if bucket is not None and not bucket.tryAcquire():
+            return 429, {'Retry-After' : '1'}, b'{"error": "rate limited"}'
+        for status in sorted(self.errors):
+            if roll < self.errors[status]:
+                headers = {'Retry-After' : '1'} if status == 429 else {}
+                return status, headers, json.dumps({'error' : status}).encode()
+            roll -= self.errors[status]
+        found = self.fixture(host, path, query)
+        if found is not None:
+            kind, content = found
+            return 200, {'Content-Type' : kind}, content
+        try:
+            payload = json.loads(body) if body else {}
+        except ValueError:
+            payload = {}
+        synthetic = syntheticResponse(host, path, query, payload if isinstance(payload, dict) else {})
+        if synthetic is None:
+            return 404, {}, b'{"error": "no fixture or synthetic response"}'
+        if isinstance(synthetic, str):
+            return 200, {'Content-Type' : 'text/html'}, synthetic.encode()
+        return 200, {'Content-Type' : 'application/json'}, json.dumps(synthetic).encode()
+
+    def handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def handle_one(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                if self.path == '/_stats':
+                    status, headers, content = 200, {'Content-Type' : 'application/json'}, \
+                        json.dumps(standin.stats).encode()
+                else:
+                    status, headers, content = standin.respond(method, self.path, body)
+                    host = self.path.lstrip('/').split('/', 1)[0]
+                    standin.count(hosts.get(host, host), status)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def do_GET(self):
+                self.handle_one('GET')
+
+            def do_POST(self):
+                self.handle_one('POST')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def serve(self, port = 8765, background = False):
+        ## with background, returns the server once it's listening
+        server = ThreadingHTTPServer(('127.0.0.1', port), self.handler())
+        if background:
+            thread = threading.Thread(target = server.serve_forever, daemon = True)
+            thread.start()
+            return server
+        print("Stand-in listening on http://127.0.0.1:{}".format(server.server_address[1]))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        server.server_close()
+        return server
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type = int, default = 8765)
+    parser.add_argument("--fixtures", default = fixtures_dir, help = "directory of canned responses")
+    parser.add_argument("--latency", default = None,
+                        help = "seconds added to every response, e.g. 0.2 or 0.2,tmdb=0.05")
+    parser.add_argument("--jitter", default = None, help = "up to this many extra random seconds, same format")
+    parser.add_argument("--errors", default = None,
+                        help = "fraction of requests answered with an error status, e.g. 404=0.01,500=0.02,429=0.01")
+    parser.add_argument("--rate", default = None,
+                        help = "requests per second allowed before answering 429, e.g. justwatch=4,rottentomatoes=2")
+    parser.add_argument("--seed", type = int, default = 0)
+    args = parser.parse_args()
+    StandIn(args.fixtures, parseSettings(args.latency), parseSettings(args.jitter),
+            {int(k): v for k, v in parseSettings(args.errors).items()},
+            parseSettings(args.rate), args.seed).serve(args.port)
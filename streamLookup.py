@@ -0,0 +1,195 @@
+################################################################################
+## the JustWatch and Rotten Tomatoes lookups of addMovies.py, kept out of the
+## script so they can be imported without running it (benchmarks/refresh.py
+## drives refreshStreams against the local stand-in, standIn.py). every request
+## goes through the response cache (responseCache.py) and so through the
+## retries of retryLayer.py.
+################################################################################
+
+import json
+import os
+import threading
+import time
+import numpy as np
+import profiler
+import retryLayer
+from unidecode import unidecode
+from providerIndex import my_providers, shortName
+from titleMatcher import rankCandidates, decide, rtFields
+from responseCache import cachedCall
+from checkpoint import writeAtomic
+
+## config/providers.json is refreshed from JustWatch once it is older than this
+providers_ttl = 7 * 24 * 60 * 60
+
+## the JustWatch client and the provider list are built on first use, since
+## building them hits the network. parseStreams runs on refreshEngine's worker
+## threads, so both are built under this lock (reentrant, as getProviders
+## builds the client).
+jw_client = None
+providers = None
+lazy_lock = threading.RLock()
+
+def getJustWatchClient():
+    ## constructing the client fetches JustWatch's locale list
+    global jw_client
+    if jw_client is not None:
+        return jw_client
+    with lazy_lock:
+        if jw_client is None:
+            from justwatch import JustWatch, justwatchapi
+            justwatchapi.__dict__['HEADER'] = {
+                'User-Agent': 'JustWatch client (github.com/dawoudt/JustWatchAPI)'
+            }
+            jw_client = profiler.timedCall('justwatch.locales', lambda: JustWatch(country = 'US'))
+    return jw_client
+
+def parseScore(scores, prov = 'tomato:meter'):
+    if len(scores):
+        rt_scores = [x for x in scores if prov in x['provider_type']]
+        if len(rt_scores):
+            return(float(rt_scores[0]['value']))
+        else:
+            return np.nan
+    else:
+        return np.nan
+
+def getProviders():
+    ## served from config/providers.json, which is only refreshed from
+    ## JustWatch once it is older than providers_ttl. the global is only set
+    ## once the list is complete, so other threads never see it half-built.
+    global providers
+    if providers is not None:
+        return providers
+    with lazy_lock:
+        if providers is not None:
+            return providers
+        with open("config/providers.json", "r") as f:
+            loaded = json.load(f)
+        if time.time() - os.path.getmtime("config/providers.json") > providers_ttl:
+            try:
+                provider_details = profiler.timedCall('justwatch.providers', getJustWatchClient().get_providers)
+            except Exception as e:
+                print("Unable to refresh the JustWatch provider list: {}".format(e))
+                provider_details = None
+            if provider_details is not None:
+                for provider in provider_details:
+                    loaded[str(provider['id'])] = provider
+                ## written atomically, so a crash can't leave a truncated file
+                writeAtomic("config/providers.json", loaded)
+        providers = loaded
+    return providers
+
+def parseStreams(streams):
+    ss = []
+    if not not streams:
+        for s in streams:
+            if any(x in s['monetization_type'] for x in ['ads', 'flatrate', 'flat_rate', 'free']):
+                prov = getProviders().get(str(s['provider_id']))
+                if prov is not None:
+                    short_name = shortName(prov['clear_name'])
+                    if short_name in my_providers:
+                        ss.append(short_name)
+    return list(set(ss))
+
+def parseJustWatch(mov):
+    jw_id = tryFloat(mov['id'], get = True)
+    year = tryFloat(mov['original_release_year'], get = True) if 'original_release_year' in mov.keys() else np.nan
+    desc = unidecode(mov['short_description']) if 'short_description' in mov.keys() else None
+    runtime = tryFloat(mov['runtime'], get = True) if 'runtime' in mov.keys() else np.nan
+    rt_score = parseScore(mov['scoring']) if 'scoring' in mov.keys() else np.nan
+    streams = parseStreams(mov['offers']) if 'offers' in mov.keys() else []
+    return jw_id, year, desc, runtime, rt_score, streams
+
+def getJustWatch(title, jw_id, rt_score, streams, jw = None):
+    if jw == None:
+        jw = getJustWatchClient()
+    ## throttling and dropped connections are retried with backoff by the
+    ## response cache (see retryLayer.py); anything still failing after that
+    ## is raised, so the movie is skipped and refreshed first next time
+    try:
+        res = cachedCall(
+            'justwatch.title', {'title_id' : int(jw_id)}, lambda: jw.get_title(title_id = int(jw_id))
+        )
+    except Exception as e:
+        if retryLayer.classify(e) == retryLayer.permanent:
+            print("No match found for this JustWatch ID {}.".format(jw_id))
+            return jw_id, rt_score, streams
+        raise
+    print("* MATCHED JustWatch")
+    if 'error' in res:
+        print("No match found for this JustWatch ID {}.".format(jw_id))
+        return jw_id, rt_score, streams
+    jw_id, year, desc, runtime, rt_score, streams = parseJustWatch(res)
+    return jw_id, rt_score, streams
+
+def findRTScore(title, auto = False, year = None):
+    from rotten_tomatoes_client import RottenTomatoesClient
+    res = cachedCall(
+        'rottentomatoes.search', {'term' : title, 'limit' : 5},
+        lambda: RottenTomatoesClient.search(term = title, limit = 5)
+    )
+    scored = rankCandidates({'title' : title, 'year' : year},
+                            [(rtFields(r), r) for r in res['movies']])
+    match, options = decide(scored)
+    if match is None and not auto:
+        for score, r in options:
+            print("{} -- {} -- {}% -- {}".format(
+                r['name'], tryInt(r['year'], get = True),
+                tryInt(r.get('meterScore'), get = True), r['subline'] + r['url']
+            ))
+            approval = input("Does this look like a match? [y or n]  ")
+            if approval == 'y':
+                match = r
+                break
+    if match is not None:
+        rt_score = tryInt(match.get('meterScore'), get = True)
+        if rt_score != 'None':
+            return(rt_score)
+    print("Unable to find match in Rotten Tomatoes for '{}'".format(title))
+    return(np.nan)
+
+def refreshStreams(title, jw_id, prev_rt_score, prev_streams, jw, limiter, year = None):
+    limiter.acquire('justwatch')
+    jw_id, rt_score, streams = getJustWatch(title, jw_id, prev_rt_score, prev_streams, jw)
+    if np.isnan(rt_score):
+        limiter.acquire('rottentomatoes')
+        rt_score = findRTScore(title, auto = True, year = year)
+    now = time.time()
+    update = {'streams_checked' : now, 'rt_checked' : now}
+    if not np.isnan(rt_score):
+        update['rt_score'] = rt_score
+    if streams is not None and any(streams):
+        update['streams'] = list(set([s for s in streams if s in my_providers]))
+    else:
+        update['streams'] = []
+    return update
+
+def tryFloat(x, get = False):
+    try:
+        float(x)
+    except:
+        if get:
+            return str(x)
+        else:
+            return False
+    if get:
+        return float(x)
+    else:
+        return True
+
+def tryInt(x, get = False):
+    try:
+        int(x)
+    except:
+        if get:
+            if x is None:
+                return np.nan
+            else:
+                return str(x)
+        else:
+            return False
+    if get:
+        return int(x)
+    else:
+        return True
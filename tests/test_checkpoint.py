@@ -0,0 +1,92 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import checkpoint
+from checkpoint import Checkpoint, readCheckpoints, rowKey
+
+def makeMovies():
+    return pd.DataFrame({'movielens_id' : [1.0, 2.0, np.nan, 4.0, 5.0, 6.0],
+                         'title' : ['Heat', 'Alien', 'Home Movie', 'Brazil', 'Drive', 'Ran'],
+                         'year' : [1995.0, 1979.0, 2001.0, 1985.0, 2011.0, 1985.0]},
+                        index = [10, 11, 12, 13, 14, 15])
+
+@pytest.fixture
+def path(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint, 'checkpoint_rows', 2)
+    return str(tmp_path / 'databases' / 'refresh_checkpoint.json')
+
+def interruptedRun(path, movies_db, rows):
+    ## refreshes `rows` and stops, as a run killed by Ctrl-C would
+    saved = Checkpoint('updatestreaming', movies_db, path = path)
+    for idx in rows:
+        saved.record(idx, {'streams' : ['Netflix'], 'rt_score' : float(idx)})
+    saved.write()
+
+def test_row_keys():
+    assert rowKey({'movielens_id' : 4.0, 'title' : 'Brazil'}) == 'ml:4'
+    assert rowKey({'movielens_id' : np.nan, 'title' : 'Home Movie', 'year' : 2001.0}).startswith('title:')
+    assert rowKey({'movielens_id' : None, 'title' : 'Home Movie', 'year' : 2001.0}) == \
+        rowKey({'title' : 'home movie', 'year' : 2001})
+
+def test_resume_skips_only_the_finished_rows(path):
+    movies_db = makeMovies()
+    interruptedRun(path, movies_db, [10, 12, 14])
+    ## the DB was compacted in between, so the row labels have changed
+    movies_db = movies_db.reset_index(drop = True)
+    resumed = Checkpoint('updatestreaming', movies_db, resume = True, path = path).resumed()
+    assert resumed == {0 : {'streams' : ['Netflix'], 'rt_score' : 10.0},
+                       2 : {'streams' : ['Netflix'], 'rt_score' : 12.0},
+                       4 : {'streams' : ['Netflix'], 'rt_score' : 14.0}}
+    assert [idx for idx in movies_db.index if idx not in resumed] == [1, 3, 5]
+
+def test_rows_removed_since_are_dropped(path):
+    movies_db = makeMovies()
+    interruptedRun(path, movies_db, [10, 11])
+    resumed = Checkpoint('updatestreaming', movies_db.drop(index = [11]), resume = True, path = path).resumed()
+    assert list(resumed) == [10]
+
+def test_without_resume_the_checkpoint_is_discarded(path, capsys):
+    movies_db = makeMovies()
+    interruptedRun(path, movies_db, [10, 11])
+    fresh = Checkpoint('updatestreaming', movies_db, path = path)
+    assert fresh.resumed() == {}
+    assert 'pass --resume' in capsys.readouterr().out
+
+def test_written_every_few_rows(path):
+    saved = Checkpoint('updateratings', makeMovies(), path = path)
+    saved.record(10, {'rating' : 4.0})
+    assert not os.path.exists(path)
+    saved.record(11, {'rating' : 3.5})
+    assert sorted(readCheckpoints(path)['updateratings']['done']) == ['ml:1', 'ml:2']
+
+def test_phases_are_kept_apart(path):
+    movies_db = makeMovies()
+    interruptedRun(path, movies_db, [10])
+    ratings = Checkpoint('updateratings', movies_db, path = path)
+    ratings.record(13, {'rating' : 2.0})
+    ratings.write()
+    assert sorted(readCheckpoints(path)) == ['updateratings', 'updatestreaming']
+    ratings.clear()
+    assert sorted(readCheckpoints(path)) == ['updatestreaming']
+    Checkpoint('updatestreaming', movies_db, resume = True, path = path).clear()
+    assert not os.path.exists(path)
+
+def test_crash_mid_write_keeps_the_previous_checkpoint(path, monkeypatch):
+    movies_db = makeMovies()
+    interruptedRun(path, movies_db, [10, 11])
+    with open(path, 'r') as f:
+        before = json.load(f)
+
+    def tornDump(data, f, **kwargs):
+        f.write(json.dumps(data)[:20])
+        raise KeyboardInterrupt()
+    saved = Checkpoint('updatestreaming', movies_db, resume = True, path = path)
+    saved.record(13, {'streams' : []})
+    monkeypatch.setattr(checkpoint.json, 'dump', tornDump)
+    with pytest.raises(KeyboardInterrupt):
+        saved.write()
+    monkeypatch.undo()
+    assert readCheckpoints(path) == before
+    assert sorted(Checkpoint('updatestreaming', movies_db, resume = True, path = path).resumed()) == [10, 11]
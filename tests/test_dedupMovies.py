@@ -0,0 +1,26 @@
+import pandas as pd
+import movieSchema
+from dedupMovies import findGroups, mergeGroup
+
+def frame(rows):
+    return movieSchema.cast(pd.DataFrame(rows))
+
+def test_chain_of_runtimes_is_one_group():
+    ## 120 and 136 are too far apart, but each is close to 128
+    movies_db = frame([{'title' : 'Heat', 'year' : 1995, 'runtime' : r, 'tmdb_id' : None}
+                       for r in [120, 128, 136]])
+    assert [sorted(g) for g in findGroups(movies_db)] == [[0, 1, 2]]
+
+def test_rows_not_joining_the_first_still_join_each_other():
+    ## one netflix_id; the first row's ids differ from both of the others'
+    movies_db = frame([{'title' : 'A', 'netflix_id' : 5, 'tmdb_id' : 949, 'imdb_id' : 'tt9'},
+                       {'title' : 'B', 'netflix_id' : 5, 'tmdb_id' : 1, 'imdb_id' : None},
+                       {'title' : 'C', 'netflix_id' : 5, 'tmdb_id' : None, 'imdb_id' : 'tt2'}])
+    assert [sorted(g) for g in findGroups(movies_db)] == [[1, 2]]
+
+def test_merged_ids_stay_ints():
+    movies_db = pd.DataFrame([{'title' : 'Heat', 'year' : 1995, 'movielens_id' : 6, 'tmdb_id' : None},
+                              {'title' : 'Heat', 'year' : 1995, 'movielens_id' : None, 'tmdb_id' : '949'}])
+    survivor, merged = mergeGroup(movies_db, [0, 1])
+    assert survivor == 0
+    assert merged['tmdb_id'] == 949 and isinstance(merged['tmdb_id'], int)
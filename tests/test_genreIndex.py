@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from genreIndex import GenreIndex
+
+shared = ['Comedy', 'Romance']
+genre_lists = [['Comedy'],
+               shared,
+               ['Drama', 'War'],
+               ['Drama', 'Romance'],
+               ['Horror', 'Comedy'],
+               shared,
+               float('nan'),
+               ['Science Fiction', 'Animation']]
+
+def rows(query, index = None):
+    index = index or GenreIndex(genre_lists)
+    return list(np.flatnonzero(index.evaluate(query)))
+
+def test_single_genre_ignores_case_and_spacing():
+    assert rows('comedy') == [0, 1, 4, 5]
+    assert rows('  ROMANCE ') == [1, 3, 5]
+    assert rows('science fiction') == [7]
+
+def test_and_binds_tighter_than_or():
+    assert rows('drama or comedy and romance') == [1, 2, 3, 5]
+    assert rows('comedy and romance or drama') == [1, 2, 3, 5]
+    assert rows('drama | comedy & romance') == [1, 2, 3, 5]
+
+def test_parentheses_group():
+    assert rows('(drama or comedy) and romance') == [1, 3, 5]
+    assert rows('(drama or romance) and not war') == [1, 3, 5]
+
+def test_comma_means_and():
+    assert rows('comedy, romance') == rows('comedy and romance') == [1, 5]
+
+def test_negation():
+    ## rows without genres are matched by a negation, like any other row
+    assert rows('not comedy') == [2, 3, 6, 7]
+    assert rows('-comedy') == rows('not comedy')
+    assert rows('comedy, -horror') == [0, 1, 5]
+    assert rows('not not drama') == rows('--drama') == [2, 3]
+    assert rows('not (comedy or drama)') == [6, 7]
+
+def test_all_matches_every_row():
+    assert rows('all') == list(range(len(genre_lists)))
+    assert rows(' All ') == list(range(len(genre_lists)))
+
+def test_unknown_genre_raises():
+    with pytest.raises(ValueError, match = 'Unknown genre'):
+        rows('comedy and musicals')
+
+def test_malformed_queries_raise():
+    for query in ['', 'comedy and', '(comedy', 'comedy)', 'and comedy', 'comedy drama)']:
+        with pytest.raises(ValueError):
+            rows(query)
+
+def test_genres_outside_the_vocabulary_are_indexed():
+    index = GenreIndex(genre_lists + [['Noir']])
+    assert 'Noir' in index.genres and rows('noir', index) == [8]
+
+def test_empty_db():
+    index = GenreIndex([])
+    assert index.masks.shape == (0, 1) and index.column().shape == (0,)
+    for query in ['comedy', 'all', '(drama or romance) and not war']:
+        mask = index.evaluate(query)
+        assert mask.dtype == bool and len(mask) == 0
+    with pytest.raises(ValueError):
+        index.evaluate('musicals')
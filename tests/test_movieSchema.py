@@ -0,0 +1,54 @@
+import json
+import numpy as np
+import pandas as pd
+import movieSchema
+from movieStore import jsonValue
+
+rows = [{'movielens_id' : 1.0, 'tmdb_id' : '603', 'imdb_id' : 'tt0133093', 'title' : 'The Matrix',
+         'rating' : 4.86, 'netflix_rating' : None, 'genres' : ['Action', 'Science Fiction'],
+         'netflix_instant' : True, 'streams' : ['Netflix'], 'year' : 1999.0, 'runtime' : 136.0,
+         'overview' : 'A hacker learns the truth.', 'tagline' : None, 'jw_id' : None,
+         'rt_score' : 88.0, 'numratings' : 81234.0, 'avgrating' : 4.15},
+        {'movielens_id' : None, 'tmdb_id' : None, 'imdb_id' : None, 'title' : 'Heat',
+         'rating' : None, 'netflix_rating' : 3.7, 'genres' : ['Action', 'Science Fiction'],
+         'netflix_instant' : None, 'streams' : [], 'year' : None, 'runtime' : None,
+         'overview' : None, 'tagline' : 'A Los Angeles crime saga', 'jw_id' : 12345.0,
+         'rt_score' : None, 'numratings' : None, 'avgrating' : None}]
+
+def test_cast_types():
+    typed = movieSchema.cast(pd.DataFrame(rows))
+    for col in ['movielens_id', 'tmdb_id', 'jw_id']:
+        assert str(typed[col].dtype) == 'Int64'
+    assert typed.rating.dtype == np.float32
+    assert str(typed.year.dtype) == 'Int16'
+    assert typed.tmdb_id[0] == 603 and typed.tmdb_id.isna()[1]
+    ## rows with the same genres share one list
+    assert typed.genres[0] is typed.genres[1]
+
+def test_cast_leaves_non_numeric_ids_alone():
+    frame = pd.DataFrame([{'tmdb_id' : 'abc'}, {'tmdb_id' : 5.0}])
+    assert movieSchema.cast(frame).tmdb_id.tolist() == ['abc', 5.0]
+
+def test_cast_reads_missing_strings_as_missing():
+    ## older DBs wrote missing scores as 'NaN' or 'None'; refreshStreams calls
+    ## np.isnan on rt_score, which fails if the column is left as object
+    frame = pd.DataFrame({'rt_score' : ['NaN', 88.0, 'none', ' nan ', '', None],
+                          'year' : ['None', 1999.0, 'NAN', 2001.0, None, '']})
+    typed = movieSchema.cast(frame)
+    assert typed.rt_score.dtype == np.float32 and str(typed.year.dtype) == 'Int16'
+    assert np.isnan(typed.rt_score.to_numpy()).tolist() == [True, False, True, True, True, True]
+    assert typed.year.isna().tolist() == [True, False, True, False, True, True]
+    ## any other string still leaves the column alone
+    assert movieSchema.cast(pd.DataFrame({'rt_score' : ['NaN', 'fresh', 5.0]})).rt_score.tolist() == ['NaN', 'fresh', 5.0]
+
+def test_cast_plain_json_round_trip():
+    out = json.dumps(list(movieSchema.plain(movieSchema.cast(pd.DataFrame(rows))).T.to_dict().values()),
+                     default = jsonValue, allow_nan = False)
+    assert 'NaN' not in out
+    back = json.loads(out)
+    ## values come back as written, except that numeric ids are ints
+    assert back[0]['tmdb_id'] == 603
+    for before, after in zip(rows, back):
+        for col, value in before.items():
+            if col != 'tmdb_id':
+                assert after[col] == value, col
@@ -0,0 +1,119 @@
+import json
+import os
+import pytest
+import movieStore
+
+def movie(i):
+    return {'movielens_id' : float(i + 1), 'netflix_id' : None, 'tmdb_id' : float(1000 + i),
+            'imdb_id' : 'tt{:07d}'.format(i), 'title' : 'Movie {}'.format(i), 'rating' : 3.5,
+            'netflix_rating' : None, 'genres' : ['Drama'], 'netflix_instant' : False,
+            'streams' : ['Netflix'] if i % 2 else [], 'year' : 1990.0 + i, 'runtime' : 100.0,
+            'overview' : 'Overview {}'.format(i), 'tagline' : 'Tagline {}'.format(i),
+            'jw_id' : None, 'rt_score' : 80.0}
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('databases/backup')
+    path = os.path.join('databases', 'movies_db.json')
+    with open(path, 'w') as f:
+        json.dump([movie(i) for i in range(30)], f)
+    return path
+
+def readRows(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def test_first_lazy_load_fetches_text(db_path):
+    ## no sidecar yet: the load that builds it must still serve the text columns
+    store = movieStore.JSONStore(db_path)
+    movies_db = store.load(lazy = True)
+    assert 'overview' not in movies_db.columns
+    assert store.fetch(movies_db, 3, 'overview') == 'Overview 3'
+    assert store.fetch(movies_db, 3, 'tagline') == 'Tagline 3'
+
+def test_compaction_after_first_lazy_load_keeps_text(db_path):
+    store = movieStore.JSONStore(db_path, journal_max_bytes = 0)
+    movies_db = store.load(lazy = True)
+    store.removeMany(movies_db, [0])
+    rows = readRows(db_path)
+    assert len(rows) == 29
+    assert [r['overview'] for r in rows] == ['Overview {}'.format(i) for i in range(1, 30)]
+    assert [r['tagline'] for r in rows] == ['Tagline {}'.format(i) for i in range(1, 30)]
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_editing_text_keeps_other_rows_text(db_path, lazy):
+    ## a lazy load must not pull overview into the frame for just the edited rows
+    store = movieStore.JSONStore(db_path)
+    movies_db = store.load(lazy = lazy)
+    movies_db = store.insert(movies_db, movie(30))
+    movies_db = store.update(movies_db, 2, {'overview' : 'New overview'})
+    movies_db = store.updateMany(movies_db, {4 : {'tagline' : 'New tagline'}})
+    assert store.fetch(movies_db, 3, 'overview') == 'Overview 3'
+    store.flush(movies_db)
+    rows = readRows(db_path)
+    assert [r['overview'] for r in rows] == ['Overview {}'.format(i) if i != 2 else 'New overview'
+                                             for i in range(31)]
+    assert rows[4]['tagline'] == 'New tagline' and rows[5]['tagline'] == 'Tagline 5'
+
+def byMovielensId(store, movies_db, movielens_id):
+    found = store.findMovielensId(movies_db, movielens_id)
+    assert len(found) == 1
+    return found[0]
+
+def checkEdits(store, movies_db):
+    ## the edits made by roundTrip, as seen by a fresh load
+    assert len(movies_db) == 30
+    titles = set(movies_db.title)
+    assert 'Movie 30' in titles and 'Movie 5' not in titles
+    edited = byMovielensId(store, movies_db, 3)
+    assert movies_db.at[edited, 'rating'] == 4.5
+    assert store.fetch(movies_db, edited, 'overview') == 'New overview'
+    assert store.fetch(movies_db, byMovielensId(store, movies_db, 31), 'overview') == 'Overview 30'
+    assert store.fetch(movies_db, byMovielensId(store, movies_db, 8), 'tagline') == 'Tagline 7'
+
+def roundTrip(store, reopen, lazy, db_path):
+    ## insert, update and remove through store, then check a fresh store
+    ## (from reopen) sees the edits, before and after compaction
+    movies_db = store.load(lazy = lazy)
+    movies_db = store.insert(movies_db, movie(30))
+    movies_db = store.collect(movies_db)
+    movies_db = store.update(movies_db, byMovielensId(store, movies_db, 3),
+                             {'rating' : 4.5, 'overview' : 'New overview'})
+    movies_db = store.remove(movies_db, byMovielensId(store, movies_db, 6))
+    checkEdits(store, movies_db)
+
+    ## the journal (or the SQLite file) is replayed by a fresh load
+    if store.kind == 'sqlite':
+        movies_db = store.flush(movies_db)
+    fresh = reopen()
+    checkEdits(fresh, fresh.load(lazy = lazy))
+
+    ## and after compaction the main file holds the edits on its own
+    movies_db = store.flush(movies_db)
+    if store.kind == 'json':
+        assert not os.path.exists(store.journal)
+        rows = readRows(db_path)
+        assert len(rows) == 30 and all(r['overview'] is not None for r in rows)
+    fresh = reopen()
+    checkEdits(fresh, fresh.load(lazy = lazy))
+    checkEdits(fresh, fresh.load(lazy = not lazy))
+
+def jsonStores(db_path):
+    ## a store on the test DB, and a function giving a fresh one on the same files
+    return movieStore.JSONStore(db_path), lambda: movieStore.JSONStore(db_path)
+
+def test_json_round_trip(db_path):
+    roundTrip(*jsonStores(db_path), False, db_path)
+
+def sqliteStores(db_path):
+    path = os.path.join('databases', 'movies_db.sqlite')
+    movieStore.SQLiteStore(path).save(movieStore.JSONStore(db_path).load())
+    return movieStore.SQLiteStore(path), lambda: movieStore.SQLiteStore(path)
+
+def test_sqlite_round_trip(db_path):
+    roundTrip(*sqliteStores(db_path), False, db_path)
+
+@pytest.mark.parametrize('stores', [jsonStores, sqliteStores])
+def test_lazy_round_trip(db_path, stores):
+    roundTrip(*stores(db_path), True, db_path)
@@ -0,0 +1,88 @@
+import json
+import numpy as np
+import pytest
+from providerIndex import ProviderIndex, loadSubscriptions, saveSubscriptions
+
+## ten rows, so the bitmaps span two bytes
+stream_lists = [['Netflix'],
+                ['Netflix', 'Kanopy'],
+                ['Hulu'],
+                [],
+                float('nan'),
+                ['PBS', 'Kanopy'],
+                ['Netflix', 'Hulu', 'Kanopy'],
+                ['Tubi TV'],
+                ['Hulu', 'PBS'],
+                ['Kanopy']]
+labels = [10, 11, 12, 13, 14, 15, 16, 17, 18, 19]
+
+def matched(index, spec, subscriptions = None):
+    return [index.labels[i] for i in np.flatnonzero(index.query(spec, subscriptions))]
+
+@pytest.fixture
+def index():
+    return ProviderIndex(stream_lists, labels)
+
+def test_comma_means_any(index):
+    assert matched(index, 'netflix') == [10, 11, 16]
+    assert matched(index, 'netflix,hulu') == [10, 11, 12, 16, 18]
+    assert matched(index, ' PBS , Tubi TV ') == [15, 17, 18]
+
+def test_plus_means_all(index):
+    assert matched(index, 'netflix+kanopy') == [11, 16]
+    assert matched(index, 'netflix+hulu+kanopy') == [16]
+    assert matched(index, 'netflix+kanopy,pbs') == [11, 15, 16, 18]
+
+def test_known_provider_on_no_rows(index):
+    assert matched(index, 'showtime') == []
+
+def test_mine(index, tmp_path, monkeypatch):
+    assert matched(index, 'mine', ['Hulu', 'PBS']) == [12, 15, 16, 18]
+    assert matched(index, 'mine,tubi', ['Hulu']) == [12, 16, 17, 18]
+    ## without an explicit list, the saved profile is used
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'config').mkdir()
+    with pytest.raises(ValueError, match = 'No subscriptions'):
+        index.query('mine')
+    saveSubscriptions(['Kanopy'])
+    assert loadSubscriptions() == ['Kanopy']
+    assert matched(index, 'mine') == [11, 15, 16, 19]
+
+def test_resolve(index):
+    assert index.resolve(' NETFLIX ') == 'Netflix'
+    assert index.resolve('kan') == 'Kanopy'
+    ## JustWatch's names are folded onto the stored ones
+    assert ProviderIndex([['Netflix']]).resolve('Netflix Instant') == 'Netflix'
+    with pytest.raises(ValueError, match = 'could be any of'):
+        index.resolve('hbo')
+
+def test_unknown_provider(index):
+    with pytest.raises(ValueError, match = "Unknown provider 'Criterion'"):
+        index.query('netflix,Criterion')
+    with pytest.raises(ValueError, match = 'Unknown provider'):
+        index.query('netflix+criterion')
+    with pytest.raises(ValueError, match = 'Empty provider list'):
+        index.query(' , ')
+
+def test_update_flips_one_row(index):
+    added, removed = index.update(16, ['Hulu', 'PBS'])
+    assert added == ['PBS'] and removed == ['Kanopy', 'Netflix']
+    assert matched(index, 'netflix') == [10, 11]
+    assert matched(index, 'pbs') == [15, 16, 18]
+    assert matched(index, 'kanopy') == [11, 15, 19]
+    ## a provider the index hasn't seen gets a bitmap of its own
+    assert index.update(14, ['Netflix', 'Criterion Channel']) == (['Criterion Channel', 'Netflix'], [])
+    assert matched(index, 'criterion') == [14]
+    assert index.update(14, float('nan')) == ([], ['Criterion Channel', 'Netflix'])
+    assert matched(index, 'criterion') == []
+
+def test_update_matches_rebuild(index):
+    updated = list(stream_lists)
+    for label, streams in [(10, ['Hulu']), (19, []), (13, ['Kanopy', 'PBS']), (17, ['Tubi TV', 'Netflix'])]:
+        index.update(label, streams)
+        updated[labels.index(label)] = streams
+    rebuilt = ProviderIndex(updated, labels)
+    for spec in ['netflix', 'hulu', 'kanopy', 'pbs', 'tubi', 'netflix,hulu+pbs']:
+        assert matched(index, spec) == matched(rebuilt, spec)
+    assert {k: v for k, v in index.counts().items() if v} == rebuilt.counts()
+    assert list(np.flatnonzero(index.streaming())) == list(np.flatnonzero(rebuilt.streaming()))
@@ -0,0 +1,118 @@
+import json
+import os
+import pytest
+import movieStore
+from queryShell import QueryShell, parseQuery, parseRange
+
+def movie(i, genres, streams, rating, year):
+    return {'movielens_id' : float(i + 1), 'netflix_id' : None, 'tmdb_id' : float(1000 + i),
+            'imdb_id' : 'tt{:07d}'.format(i), 'title' : 'Movie {}'.format(i), 'rating' : rating,
+            'netflix_rating' : None, 'genres' : genres, 'netflix_instant' : False,
+            'streams' : streams, 'year' : year, 'runtime' : 90.0 + i,
+            'overview' : 'Overview {}'.format(i), 'tagline' : 'Tagline {}'.format(i),
+            'jw_id' : None, 'rt_score' : 50.0 + i}
+
+rows = [movie(0, ['Comedy'], ['Netflix'], 4.0, 1985.0),
+        movie(1, ['Drama'], [], 3.0, 1995.0),
+        movie(2, ['Comedy', 'Romance'], ['Hulu'], 4.5, 1999.0),
+        movie(3, ['Horror'], ['Netflix', 'Hulu'], 2.5, 2005.0),
+        movie(4, ['Drama', 'War'], ['Kanopy'], None, 1990.0)]
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('databases/backup')
+    path = os.path.join('databases', 'movies_db.json')
+    with open(path, 'w') as f:
+        json.dump(rows, f)
+    return path
+
+def titles(found):
+    return list(found.title)
+
+def test_parse_range():
+    assert parseRange('1990-1999') == (1990.0, 1999.0, True, True)
+    assert parseRange('1990-') == (1990.0, None, True, True)
+    assert parseRange('<120') == (None, 120.0, True, False)
+    assert parseRange('<=4.5') == (None, 4.5, True, True)
+    assert parseRange('>80') == (80.0, None, False, True)
+    assert parseRange('>=4') == (4.0, None, True, True)
+    assert parseRange('3.5') == (3.5, 3.5, True, True)
+    assert parseRange('=-1') == (-1.0, -1.0, True, True)
+    for text in ['', '-', 'abc', '1990-1999-2000', '>>4', '1990..1999']:
+        with pytest.raises(ValueError, match = "Can't read range"):
+            parseRange(text)
+
+def test_parse_query():
+    query = parseQuery('comedy and not horror year:1980-1999 on:netflix rt:>80 sort:rt,-year limit:10')
+    assert query == {'genres' : 'comedy and not horror',
+                     'ranges' : [('year', (1980.0, 1999.0, True, True)), ('rt_score', (80.0, None, False, True))],
+                     'providers' : ['netflix'],
+                     'sort' : [('rt_score', False), ('year', True)],
+                     'limit' : 10}
+
+def test_parse_query_defaults_and_aliases():
+    query = parseQuery('on:netflix+hulu ON:mine votes:>=100 Avg:<3')
+    assert query['genres'] == 'all' and query['sort'] is None and query['limit'] is None
+    assert query['providers'] == ['netflix+hulu', 'mine']
+    assert query['ranges'] == [('numratings', (100.0, None, True, True)), ('avgrating', (None, 3.0, True, False))]
+    ## terms can come anywhere in the query
+    assert parseQuery('limit:5 drama, -war')['genres'] == 'drama, -war'
+
+def test_parse_query_errors():
+    with pytest.raises(ValueError, match = 'limit must be a number'):
+        parseQuery('comedy limit:ten')
+    with pytest.raises(ValueError, match = "Unknown term 'color:'"):
+        parseQuery('comedy color:blue')
+    with pytest.raises(ValueError, match = "Can't read range"):
+        parseQuery('year:nineties')
+    with pytest.raises(ValueError, match = 'asc or desc'):
+        parseQuery('sort:year:up')
+
+def test_run(db_path):
+    shell = QueryShell(movieStore.JSONStore(db_path))
+    assert titles(shell.run('comedy')) == ['Movie 2', 'Movie 0']
+    assert titles(shell.run('all year:1990-1999 sort:-year')) == ['Movie 4', 'Movie 1', 'Movie 2']
+    assert titles(shell.run('on:netflix,kanopy sort:rating')) == ['Movie 0', 'Movie 3', 'Movie 4']
+    assert titles(shell.run('not drama on:netflix+hulu')) == ['Movie 3']
+    assert titles(shell.run('rating:>=3 limit:2')) == ['Movie 2', 'Movie 0']
+
+def test_refresh_patches_updates_from_another_store(db_path, monkeypatch):
+    shell = QueryShell(movieStore.JSONStore(db_path))
+    assert shell.refresh() is False
+    ## e.g. addMovies.py --updatestreaming running alongside the shell
+    writer = movieStore.JSONStore(db_path)
+    movies_db = writer.load()
+    movies_db = writer.updateMany(movies_db, {1 : {'streams' : ['Netflix'], 'rating' : 5.0},
+                                              4 : {'genres' : ['Comedy'], 'overview' : 'Recut'}})
+    assert os.path.exists(writer.journal) and len(json.load(open(db_path))) == len(rows)
+
+    def fullReload():
+        raise AssertionError("refresh rebuilt the shell instead of patching it")
+    monkeypatch.setattr(shell, 'load', fullReload)
+    monkeypatch.setattr(shell, 'index', fullReload)
+    assert shell.refresh() is True
+    assert shell.store.touched == {1 : {'streams', 'rating'}, 4 : {'genres'}}
+    assert shell.store.reshaped is False
+    assert titles(shell.run('on:netflix sort:rating')) == ['Movie 1', 'Movie 0', 'Movie 3']
+    assert titles(shell.run('comedy sort:-year')) == ['Movie 0', 'Movie 4', 'Movie 2']
+    ## the lazily loaded overview comes from the journal
+    assert shell.store.fetch(shell.movies, 4, 'overview') == 'Recut'
+    assert shell.refresh() is False
+
+def test_refresh_reindexes_after_insert_and_reloads_after_compaction(db_path):
+    shell = QueryShell(movieStore.JSONStore(db_path))
+    writer = movieStore.JSONStore(db_path)
+    movies_db = writer.load()
+    movies_db = writer.collect(writer.insert(movies_db, movie(5, ['Western'], ['Netflix'], 3.5, 1970.0)))
+    loads = []
+    load = shell.store.load
+    shell.store.load = lambda lazy = False: loads.append(lazy) or load(lazy = lazy)
+    assert shell.refresh() is True
+    assert shell.store.reshaped is True and loads == []
+    assert titles(shell.run('western on:netflix')) == ['Movie 5']
+    ## a compaction rewrites the main file, which forces a full load
+    writer.flush(movies_db)
+    assert shell.refresh() is True
+    assert loads == [True] and len(shell.movies) == 6
+    assert titles(shell.run('western')) == ['Movie 5']
@@ -0,0 +1,45 @@
+import pandas as pd
+from refreshEngine import runConcurrent, mergeUpdates
+
+def test_run_concurrent_collects_results_and_errors():
+    def work(x):
+        if x == 3:
+            raise ValueError(x)
+        return x * 2
+    seen = []
+    results, errors = runConcurrent(((i, (i,)) for i in range(6)), work, workers = 4,
+                                    on_result = lambda key, result: seen.append(key))
+    assert results == {0 : 0, 1 : 2, 2 : 4, 4 : 8, 5 : 10}
+    assert list(errors) == [3]
+    assert sorted(seen) == [0, 1, 2, 4, 5]
+
+def test_merge_updates():
+    movies_db = pd.DataFrame({'rt_score' : [50.0, 60.0, 70.0], 'streams' : [[], ['Hulu'], []]})
+    movies_db = mergeUpdates(movies_db, {0 : {'rt_score' : 55.0, 'streams' : ['Netflix']},
+                                         2 : {'streams_checked' : 1.5}})
+    assert movies_db.rt_score.tolist() == [55.0, 60.0, 70.0]
+    assert movies_db.streams.tolist() == [['Netflix'], ['Hulu'], []]
+    assert movies_db.streams_checked.isna().tolist() == [True, True, False]
+
+def test_budget_caps_requests_in_flight():
+    import threading
+    import time
+    from refreshEngine import Budget, HostLimiter
+    made = []
+    lock = threading.Lock()
+    limiter = HostLimiter({'justwatch' : 0, 'rottentomatoes' : 0}, Budget(requests = 10))
+
+    def refresh(i):
+        ## two requests per movie, like a JustWatch lookup plus an RT search
+        for host in ['justwatch', 'rottentomatoes']:
+            limiter.acquire(host)
+            with lock:
+                made.append(i)
+            time.sleep(0.01)
+        return i
+
+    results, errors = runConcurrent(((i, (i,)) for i in range(20)), refresh, workers = 8,
+                                    budget = limiter.budget)
+    assert len(made) <= 10
+    assert errors == {}
+    assert len(results) <= 5
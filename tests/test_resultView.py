@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+from resultView import parseSort, rankRows, Pager
+
+def makeMovies(n = 300, seed = 7):
+    ## few distinct values, so there are plenty of ties, and missing values in
+    ## every column
+    rng = np.random.default_rng(seed)
+    rating = pd.array(rng.integers(1, 6, n), dtype = 'Int16')
+    rating[rng.random(n) < 0.15] = pd.NA
+    rt_score = rng.integers(0, 5, n).astype(np.float32) * 25
+    rt_score[rng.random(n) < 0.2] = np.nan
+    year = pd.array(rng.integers(1990, 1995, n), dtype = 'Int16')
+    year[rng.random(n) < 0.1] = pd.NA
+    titles = np.array(['alien', 'Brazil', 'casablanca', 'Drive', None], dtype = object)
+    return pd.DataFrame({'rating' : rating,
+                         'rt_score' : rt_score,
+                         'year' : year,
+                         'title' : titles[rng.integers(0, len(titles), n)]},
+                        index = rng.permutation(n) + 1000)
+
+def fullSort(movies, keys):
+    ## the reference: a stable sort of the whole frame, missing values last
+    lower = lambda col: col.str.lower() if pd.api.types.is_string_dtype(col) else col
+    return movies.sort_values([c for c, a in keys], ascending = [a for c, a in keys],
+                              na_position = 'last', kind = 'stable', key = lower)
+
+@pytest.mark.parametrize('sort', ['rating,rt_score', 'rt,-year', '-rating,year:desc,title',
+                                  'year:asc,rt:asc', 'title:asc,-rt_score', 'rt'])
+@pytest.mark.parametrize('top', [None, 0, 1, 10, 37, 299, 300, 500])
+def test_top_k_matches_full_sort(sort, top):
+    movies = makeMovies()
+    keys = parseSort(sort)
+    expected = fullSort(movies, keys)
+    if top is not None:
+        expected = expected.head(top)
+    assert list(rankRows(movies, keys, top = top).index) == list(expected.index)
+
+def test_no_keys_keeps_order():
+    movies = makeMovies(20)
+    assert list(rankRows(movies, [], top = 5).index) == list(movies.index[:5])
+
+def test_unknown_sort_column():
+    with pytest.raises(ValueError, match = 'unknown column'):
+        rankRows(makeMovies(20), parseSort('rating,popularity'))
+
+def test_parse_sort():
+    assert parseSort('rating, -year') == [('rating', False), ('year', True)]
+    assert parseSort('RT:asc,+votes,avg:DESC') == [('rt_score', True), ('numratings', False), ('avgrating', False)]
+    assert parseSort('-title:desc') == [('title', False)]
+    assert parseSort(' , ') == []
+
+def test_parse_sort_bad_direction():
+    for text in ['rating:up', 'year:', 'rt:ascending']:
+        with pytest.raises(ValueError, match = 'asc or desc'):
+            parseSort(text)
+
+def test_pager_shows_a_page_at_a_time(capsys):
+    movies = makeMovies(12)
+    pager = Pager(movies, ['title', 'rating', 'not_a_column'], size = 5)
+    assert pager.columns == ['title', 'rating']
+    shown = []
+    while pager.more():
+        pager.next()
+        shown.append(capsys.readouterr().out)
+    assert len(shown) == 3
+    assert "(5 of 12 rows shown)" in shown[0] and "(10 of 12 rows shown)" in shown[1]
+    assert "rows shown" not in shown[2]
+    ## a header plus the rows on the page
+    assert len([l for l in shown[2].splitlines() if l.strip()]) == 3
+    pager.next()
+    assert "(no more rows)" in capsys.readouterr().out
@@ -0,0 +1,30 @@
+import retryLayer
+
+TimeoutException = type('TimeoutException', (Exception,), {'__module__' : 'selenium.common.exceptions'})
+ReadTimeout = type('ReadTimeout', (Exception,), {'__module__' : 'requests.exceptions'})
+
+def failing(error, calls):
+    def fn():
+        calls.append(1)
+        raise error
+    return fn
+
+def test_page_timeouts_are_retried_once(monkeypatch):
+    monkeypatch.setattr(retryLayer.time, 'sleep', lambda s: None)
+    calls = []
+    try:
+        retryLayer.call('movielens.page', failing(TimeoutException(), calls), attempts = 5)
+    except TimeoutException:
+        pass
+    assert len(calls) == retryLayer.page_timeout_attempts
+
+def test_request_timeouts_use_every_attempt(monkeypatch):
+    monkeypatch.setattr(retryLayer.time, 'sleep', lambda s: None)
+    calls = []
+    try:
+        retryLayer.call('tmdb.search', failing(ReadTimeout(), calls), attempts = 5)
+    except ReadTimeout:
+        pass
+    assert len(calls) == 5
+    assert retryLayer.classify(ReadTimeout()) == retryLayer.transient
+    assert retryLayer.classify(TimeoutException()) == retryLayer.slow_page
@@ -0,0 +1,23 @@
+import json
+import os
+import standIn
+
+fixtures = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures', 'standin')
+
+def get(server, url):
+    status, headers, body = server.respond('GET', standIn.url(url)[len(standIn.base_url):], b'')
+    return status, json.loads(body)
+
+def test_fixtures_are_served(monkeypatch):
+    monkeypatch.setattr(standIn, 'base_url', 'http://127.0.0.1:1')
+    server = standIn.StandIn(fixtures = fixtures)
+    status, title = get(server, 'https://apis.justwatch.com/content/titles/movie/10001/locale/en_US')
+    assert status == 200 and title['title'] == 'Heat'
+    status, found = get(server, 'https://www.rottentomatoes.com/api/private/v2.0/search/?q=Amelie&limit=5')
+    assert status == 200 and found['movies'][0]['meterScore'] == 89
+
+def test_synthetic_without_fixture(monkeypatch):
+    monkeypatch.setattr(standIn, 'base_url', 'http://127.0.0.1:1')
+    server = standIn.StandIn(fixtures = fixtures)
+    status, title = get(server, 'https://apis.justwatch.com/content/titles/movie/42/locale/en_US')
+    assert status == 200 and title['id'] == 42
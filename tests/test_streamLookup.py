@@ -0,0 +1,37 @@
+import json
+import os
+import threading
+import time
+import streamLookup
+
+class SlowClient(object):
+    def __init__(self):
+        self.calls = 0
+
+    def get_providers(self):
+        self.calls += 1
+        time.sleep(0.05)
+        return [{'id' : 8, 'short_name' : 'nfx'}, {'id' : 9, 'short_name' : 'amp'}]
+
+def test_stale_providers_refreshed_once_across_threads(tmp_path, monkeypatch):
+    os.makedirs(tmp_path / 'config')
+    path = tmp_path / 'config' / 'providers.json'
+    path.write_text(json.dumps({'8' : {'id' : 8, 'short_name' : 'old'}}))
+    old = time.time() - streamLookup.providers_ttl - 60
+    os.utime(path, (old, old))
+    monkeypatch.chdir(tmp_path)
+    client = SlowClient()
+    monkeypatch.setattr(streamLookup, 'jw_client', client)
+    monkeypatch.setattr(streamLookup, 'providers', None)
+
+    seen = []
+    ## copied on return, to catch a thread handed the list before it's refreshed
+    threads = [threading.Thread(target = lambda: seen.append(dict(streamLookup.getProviders()))) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert client.calls == 1
+    assert all(sorted(p) == ['8', '9'] and p['8']['short_name'] == 'nfx' for p in seen)
+    assert json.loads(path.read_text())['8']['short_name'] == 'nfx'
+    assert not os.path.exists(str(path) + '.tmp')
@@ -0,0 +1,62 @@
+from titleMatcher import (rankCandidates, decide, matchScore, confirms, jwFields, tmdbFields, rtFields,
+                          accept_threshold, review_threshold)
+
+ref = {'title' : 'The Thing', 'year' : 1982, 'runtime' : 109}
+
+def test_exact_match_is_accepted():
+    scored = rankCandidates(ref, [({'title' : 'The Thing', 'year' : 1982, 'runtime' : 109}, 'carpenter'),
+                                  ({'title' : 'The Thing', 'year' : 2011, 'runtime' : 103}, 'prequel')])
+    assert scored[0] == (1.0, 'carpenter')
+    assert decide(scored) == ('carpenter', [])
+
+def test_title_is_normalized():
+    assert matchScore(ref, {'title' : 'the thing!', 'year' : 1982}) == 1.0
+
+def test_year_off_by_one_is_accepted():
+    ## release years often differ by one between sources
+    scored = rankCandidates(ref, [({'title' : 'The Thing', 'year' : 1983}, 'carpenter'),
+                                  ({'title' : 'The Thing', 'year' : 2011}, 'prequel')])
+    assert accept_threshold <= scored[0][0] < 1.0
+    assert decide(scored) == ('carpenter', [])
+    assert confirms(ref, {'title' : 'The Thing', 'year' : 1981})
+    assert not confirms(ref, {'title' : 'The Thing', 'year' : 1984})
+
+def test_candidates_within_the_margin_are_asked_about():
+    ## a remake with the same title and no year to tell them apart
+    scored = rankCandidates({'title' : 'The Thing'}, [({'title' : 'The Thing', 'year' : 1982}, 'carpenter'),
+                                                      ({'title' : 'The Thing', 'year' : 2011}, 'prequel'),
+                                                      ({'title' : 'Swamp Thing'}, 'swamp'),
+                                                      ({'title' : 'Heat'}, 'heat')])
+    accepted, ask = decide(scored)
+    assert accepted is None
+    assert [p for s, p in ask][:2] == ['carpenter', 'prequel']
+    assert 'heat' not in [p for s, p in ask]
+    assert all(s >= review_threshold for s, p in ask)
+
+def test_no_candidates():
+    assert rankCandidates(ref, []) == []
+    assert decide([]) == (None, [])
+
+def test_weak_single_candidate_is_not_accepted():
+    accepted, ask = decide(rankCandidates(ref, [({'title' : 'The Thing', 'year' : 2011}, 'prequel')]))
+    assert accepted is None and [p for s, p in ask] == ['prequel']
+
+def test_external_ids_decide():
+    ## a shared id settles it whatever the title, and a different one rules it out
+    assert matchScore({'title' : 'Amelie', 'imdb_id' : 'tt0211915'},
+                      {'title' : "Le Fabuleux Destin d'Amelie Poulain", 'imdb_id' : 'TT0211915'}) == 1.0
+    assert matchScore({'title' : 'Heat', 'year' : 1995, 'tmdb_id' : 949.0},
+                      {'title' : 'Heat', 'year' : 1995, 'tmdb_id' : '950'}) == 0.0
+    assert not confirms({'tmdb_id' : 949, 'year' : 1995}, {'tmdb_id' : 950, 'year' : 1995})
+    assert confirms({'tmdb_id' : 949}, {'tmdb_id' : '949'})
+
+def test_source_fields():
+    jw = {'title' : 'Heat', 'original_release_year' : 1995, 'runtime' : 170,
+          'scoring' : [{'provider_type' : 'imdb:id', 'value' : 'tt0113277'},
+                       {'provider_type' : 'tmdb:id', 'value' : 949},
+                       {'provider_type' : 'tomato:meter', 'value' : 87}]}
+    assert jwFields(jw) == {'title' : 'Heat', 'year' : 1995, 'runtime' : 170,
+                            'imdb_id' : 'tt0113277', 'tmdb_id' : 949}
+    assert tmdbFields({'title' : 'Heat', 'release_date' : '1995-12-15'}) == {'title' : 'Heat', 'year' : '1995'}
+    assert tmdbFields({'title' : 'Heat', 'release_date' : ''})['year'] is None
+    assert rtFields({'name' : 'Heat', 'year' : 1995}) == {'title' : 'Heat', 'year' : 1995}
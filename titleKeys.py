@@ -0,0 +1,47 @@
+################################################################################
+## normalized title keys shared by the local title index, the matchers and the
+## dedup/join tools. a key is the title lowercased, transliterated to ascii,
+## with punctuation dropped and whitespace collapsed, so "Amélie" and "Amelie",
+## or "Face/Off" and "Face Off", land on the same key.
+################################################################################
+
+import re
+from unidecode import unidecode
+
+punct_re = re.compile(r"[^a-z0-9 ]+")
+space_re = re.compile(r"\s+")
+## a title ending in its release year, e.g. "Heat (1995)"
+year_re = re.compile(r'^(.*\S)\s+\((\d{4})\)$')
+
+def normalizeTitle(title):
+    if title is None or (isinstance(title, float) and title != title):
+        return ''
+    key = unidecode(str(title)).lower().replace('&', ' and ')
+    key = punct_re.sub(' ', key.replace("'", ''))
+    return space_re.sub(' ', key).strip()
+
+def splitYear(title):
+    ## (title, year) from "Title (Year)"; year is None without one
+    match = year_re.match(title.strip())
+    return (match.group(1), match.group(2)) if match else (title.strip(), None)
+
+def titleYearKey(title, year = None):
+    ## key including the release year when there is one
+    key = normalizeTitle(title)
+    try:
+        return "{} ({})".format(key, int(float(year)))
+    except (TypeError, ValueError):
+        return key
+
+def trigrams(key):
+    ## character trigrams of a normalized key, padded so short titles and word
+    ## boundaries still produce grams
+    padded = '  ' + key + ' '
+    return set(padded[i:i + 3] for i in range(len(padded) - 2))
+
+def similarity(a, b):
+    ## Jaccard similarity of the trigrams of two normalized keys
+    ta, tb = trigrams(a), trigrams(b)
+    if not ta or not tb:
+        return 0.0
+    return len(ta & tb) / float(len(ta | tb))
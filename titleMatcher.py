@@ -0,0 +1,99 @@
+################################################################################
+## scores candidate matches from TMDB, JustWatch and Rotten Tomatoes against
+## what is already known about a movie. the score combines title similarity,
+## release year, runtime and any shared external IDs (imdb_id, tmdb_id), so a
+## JustWatch or RT listing can be confirmed against the TMDB result instead of
+## by eye. the best candidate is accepted automatically when it clears
+## accept_threshold and is clearly ahead of the runner-up; the user is only
+## asked when there is real ambiguity.
+################################################################################
+
+import numpy as np
+import pandas as pd
+from titleKeys import normalizeTitle, similarity
+
+accept_threshold = 0.85
+## candidates below this aren't worth asking about
+review_threshold = 0.5
+## how far the best candidate must be ahead of the next to be accepted
+margin = 0.1
+
+def known(x):
+    ## missing ints load as pd.NA (movieSchema.py), which has no truth value
+    if x is None or x is pd.NA or (isinstance(x, str) and x == ''):
+        return False
+    try:
+        return not np.isnan(float(x))
+    except (TypeError, ValueError):
+        return True
+
+def sameId(a, b):
+    try:
+        return float(a) == float(b)
+    except (TypeError, ValueError):
+        return str(a).strip().lower() == str(b).strip().lower()
+
+def matchScore(ref, cand):
+    ## ref and cand are dicts with any of title, year, runtime, imdb_id and
+    ## tmdb_id. returns a confidence between 0 and 1.
+    for key in ['imdb_id', 'tmdb_id']:
+        if known(ref.get(key)) and known(cand.get(key)):
+            if sameId(ref[key], cand[key]):
+                return 1.0
+            return 0.0
+    ref_key, cand_key = normalizeTitle(ref.get('title')), normalizeTitle(cand.get('title'))
+    title_score = 1.0 if ref_key == cand_key else similarity(ref_key, cand_key)
+    parts = [(title_score, 0.6)]
+    if known(ref.get('year')) and known(cand.get('year')):
+        diff = abs(float(ref['year']) - float(cand['year']))
+        parts.append((1.0 if diff == 0 else 0.7 if diff <= 1 else 0.0, 0.25))
+    if known(ref.get('runtime')) and known(cand.get('runtime')):
+        diff = abs(float(ref['runtime']) - float(cand['runtime']))
+        parts.append((1.0 if diff <= 3 else 0.5 if diff <= 10 else 0.0, 0.15))
+    return sum(s * w for s, w in parts) / sum(w for s, w in parts)
+
+def confirms(ref, cand):
+    ## whether cand is the same movie as ref by something other than its title:
+    ## a shared external ID, or else a release year within one of ref's
+    for key in ['imdb_id', 'tmdb_id']:
+        if known(ref.get(key)) and known(cand.get(key)):
+            return sameId(ref[key], cand[key])
+    if known(ref.get('year')) and known(cand.get('year')):
+        return abs(float(ref['year']) - float(cand['year'])) <= 1
+    return False
+
+def rankCandidates(ref, cands):
+    ## cands is a list of (fields, payload); returns [(score, payload)] best first
+    scored = [(matchScore(ref, fields), payload) for fields, payload in cands]
+    return sorted(scored, key = lambda x: -x[0])
+
+def decide(scored):
+    ## returns (accepted payload or None, [(score, payload)] worth asking about)
+    if not scored:
+        return None, []
+    best = scored[0][0]
+    runner_up = scored[1][0] if len(scored) > 1 else 0.0
+    if best >= accept_threshold and best - runner_up >= margin:
+        return scored[0][1], []
+    return None, [(s, p) for s, p in scored if s >= review_threshold]
+
+def jwFields(r):
+    ## comparable fields of a JustWatch search item
+    ids = {}
+    for s in r.get('scoring') or []:
+        if s.get('provider_type') == 'imdb:id':
+            ids['imdb_id'] = s.get('value')
+        elif s.get('provider_type') == 'tmdb:id':
+            ids['tmdb_id'] = s.get('value')
+    fields = {'title' : r.get('title'), 'year' : r.get('original_release_year'),
+              'runtime' : r.get('runtime')}
+    fields.update(ids)
+    return fields
+
+def tmdbFields(r):
+    ## comparable fields of a TMDB search result or local index candidate
+    date = r.get('release_date') or ''
+    return {'title' : r.get('title'), 'year' : date[:4] if len(date) >= 4 else None}
+
+def rtFields(r):
+    return {'title' : r.get('name'), 'year' : r.get('year')}
@@ -0,0 +1,150 @@
+################################################################################
+## local title index built from TMDB's daily movie ID export
+## (http://files.tmdb.org/p/exports/movie_ids_MM_DD_YYYY.json.gz), a gzipped
+## JSON lines file of id, original_title and popularity. a movie is indexed
+## under its original title and, when the records carry them (e.g. an export
+## joined with TMDB's title and release_date), also under its display title and
+## with its release year, so foreign films are found by their English title
+## and the year can break ties. candidates for a title are found by
+## normalized-title key and by a trigram index for fuzzy matches, then ranked
+## locally by similarity and popularity, so addMovies.py only has to go to the
+## network for the single Movies(id).info() fetch. titles newer than the
+## export aren't in it; addMovies.py searches TMDB online when no local
+## candidate is a confident match.
+##
+## to build it (works offline from a downloaded file):
+##   python tmdbIndex.py input/movie_ids_10_17_2026.json.gz
+## which writes databases/tmdb_index.pkl.
+################################################################################
+
+import argparse
+import gzip
+import json
+import os
+import pickle
+import numpy as np
+from titleKeys import normalizeTitle, trigrams
+
+index_path = 'databases/tmdb_index.pkl'
+
+class TitleIndex(object):
+    def __init__(self, ids, titles, popularity, years = None):
+        ## one entry per (movie, title) pair; a movie indexed under two titles
+        ## has two entries with the same id. years are 0 where unknown.
+        self.ids = np.asarray(ids, dtype = np.int64)
+        self.titles = list(titles)
+        self.popularity = np.asarray(popularity, dtype = np.float32)
+        self.years = np.asarray(years if years is not None else np.zeros(len(self.ids)), dtype = np.int16)
+        self.keys = [normalizeTitle(t) for t in self.titles]
+        self.exact = {}
+        for pos, key in enumerate(self.keys):
+            self.exact.setdefault(key, []).append(pos)
+        ## trigram -> sorted positions, stored as one flat array with offsets
+        pairs = {}
+        self.ngrams = np.zeros(len(self.keys), dtype = np.uint16)
+        for pos, key in enumerate(self.keys):
+            grams = trigrams(key)
+            self.ngrams[pos] = len(grams)
+            for gram in grams:
+                pairs.setdefault(gram, []).append(pos)
+        self.grams = {}
+        postings = []
+        offset = 0
+        for gram, positions in pairs.items():
+            self.grams[gram] = (offset, offset + len(positions))
+            postings.append(np.asarray(positions, dtype = np.int32))
+            offset += len(positions)
+        self.postings = np.concatenate(postings) if postings else np.zeros(0, dtype = np.int32)
+        self.max_popularity = float(self.popularity.max()) if len(self.popularity) else 1.0
+
+    def candidates(self, title, limit = 10, min_similarity = 0.3):
+        ## returns dicts of id, title, popularity and similarity, best first
+        key = normalizeTitle(title)
+        query = trigrams(key)
+        spans = [self.grams[g] for g in query if g in self.grams]
+        if not spans:
+            return []
+        hits = np.concatenate([self.postings[a:b] for a, b in spans])
+        positions, common = np.unique(hits, return_counts = True)
+        sim = common / (len(query) + self.ngrams[positions].astype(np.float64) - common)
+        keep = sim >= min_similarity
+        positions, sim = positions[keep], sim[keep]
+        for pos in self.exact.get(key, []):
+            sim[positions == pos] = 1.0
+        ## similarity first, popularity breaks ties and near ties
+        pop = np.log1p(self.popularity[positions]) / np.log1p(max(self.max_popularity, 1.0))
+        score = sim + 0.05 * pop
+        out = []
+        seen = set()
+        for i in np.argsort(-score, kind = 'stable'):
+            ## a movie's best-matching title only
+            movie_id = int(self.ids[positions[i]])
+            if movie_id in seen:
+                continue
+            seen.add(movie_id)
+            year = int(self.years[positions[i]])
+            out.append({'id' : movie_id,
+                        'title' : self.titles[positions[i]],
+                        'release_date' : str(year) if year else '',
+                        'popularity' : float(self.popularity[positions[i]]),
+                        'similarity' : float(sim[i])})
+            if len(out) == limit:
+                break
+        return out
+
+def readExport(path):
+    ids, titles, popularity, years = [], [], [], []
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding = 'utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            if rec.get('adult') or rec.get('video'):
+                continue
+            date = rec.get('release_date') or ''
+            year = int(date[:4]) if date[:4].isdigit() else 0
+            names = [rec.get('original_title') or '']
+            if rec.get('title') and normalizeTitle(rec['title']) != normalizeTitle(names[0]):
+                names.append(rec['title'])
+            for name in names:
+                ids.append(rec['id'])
+                titles.append(name)
+                popularity.append(rec.get('popularity') or 0.0)
+                years.append(year)
+    return ids, titles, popularity, years
+
+def buildIndex(export_path, out_path = index_path):
+    idx = TitleIndex(*readExport(export_path))
+    ## the attributes are pickled rather than the object so the file loads no
+    ## matter which module built it
+    with open(out_path, 'wb') as f:
+        pickle.dump(idx.__dict__, f, protocol = pickle.HIGHEST_PROTOCOL)
+    return idx
+
+loaded_index = None
+
+def loadIndex(path = index_path):
+    ## None when no index has been built
+    global loaded_index
+    if loaded_index is None and os.path.exists(path):
+        with open(path, 'rb') as f:
+            loaded_index = TitleIndex.__new__(TitleIndex)
+            loaded_index.__dict__.update(pickle.load(f))
+            ## indexes built before release years were kept
+            if 'years' not in loaded_index.__dict__:
+                loaded_index.years = np.zeros(len(loaded_index.ids), dtype = np.int16)
+    return loaded_index
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("export", help = "TMDB daily movie ID export (.json.gz)")
+    parser.add_argument("--out", help = "where to write the index", default = index_path)
+    parser.add_argument("--query", help = "look up a title in the new index", default = None)
+    args = parser.parse_args()
+    idx = buildIndex(args.export, args.out)
+    print("Indexed {} titles to {}.".format(len(idx.ids), args.out))
+    if args.query is not None:
+        for c in idx.candidates(args.query):
+            print("{} -- {} ({}) -- {:.2f} -- {:.1f}".format(c['id'], c['title'], c['release_date'] or '?',
+                                                           c['similarity'], c['popularity']))
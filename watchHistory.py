@@ -0,0 +1,70 @@
+################################################################################
+## append-only archive of the movies removed from movies_db once watched
+## (databases/watched_history.jsonl). each line is one movie: when it was
+## watched and archived, its ids, title, year, runtime, genres, ratings and
+## where it was streaming. the long text columns are left out (they can be
+## fetched again by tmdb_id) and so are empty values, to keep the file small.
+## every batch is appended in one fsync'd write.
+##
+##   python watchHistory.py            summary of the archive
+################################################################################
+
+import argparse
+import json
+import os
+import time
+import pandas as pd
+from movieStore import isMissing, jsonValue
+from movieSchema import plain
+
+history_path = 'databases/watched_history.jsonl'
+archive_columns = ['movielens_id', 'tmdb_id', 'imdb_id', 'jw_id', 'title', 'year', 'runtime',
+                   'genres', 'rating', 'avgrating', 'numratings', 'rt_score', 'streams']
+
+def record(row, watched = None):
+    rec = {'watched' : watched or time.strftime('%Y-%m-%d'), 'archived' : int(time.time())}
+    for col in archive_columns:
+        value = row.get(col)
+        if isinstance(value, list):
+            if value:
+                rec[col] = value
+        elif not isMissing(value) and value != '':
+            rec[col] = value
+    return rec
+
+def archive(movies_db, idxs, watched = None, path = history_path):
+    ## watched is {row label: 'YYYY-MM-DD'}; rows without a date get today's
+    watched = watched or {}
+    columns = [c for c in archive_columns if c in movies_db.columns]
+    rows = plain(movies_db.loc[list(idxs), columns]).to_dict('index')
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+    with open(path, 'a') as f:
+        for idx in idxs:
+            f.write(json.dumps(record(rows[idx], watched.get(idx)), default = jsonValue) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+def readHistory(path = history_path):
+    records = []
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+    return pd.DataFrame(records)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", default = history_path)
+    args = parser.parse_args()
+    history = readHistory(args.path)
+    if not len(history):
+        print("Nothing archived in {} yet.".format(args.path))
+    else:
+        print("{} movies watched, {} to {}".format(len(history), history.watched.min(), history.watched.max()))
+        if 'runtime' in history.columns:
+            print("{:.0f} hours in total".format(pd.to_numeric(history.runtime, errors = 'coerce').sum() / 60))
+        print(history.groupby(history.watched.str[:7]).size().tail(12).to_string())
@@ -1,46 +1,139 @@
+################################################################################
+## cross-references a Letterboxd watchlist with a MovieLens list of top
+## predicted movies and writes the movies on both to a csv.
+##
+## the inputs are scanned as they're read instead of being parsed into a
+## document tree: Letterboxd pages go through a streaming HTML tokenizer that
+## only keeps the data-film-* attributes of the poster divs, and the MovieLens
+## paste is read line by line. a watchlist that spans several pages can be
+## given as several files, which are scanned in parallel in a process pool.
+##
+##   python whatToWatch.py --letterboxd input/watchlist-*.html --movielens input/movielens.txt
+################################################################################
+
+import argparse
+import html
 import re
-import unicodecsv as csv
-from bs4 import BeautifulSoup
-
-with open('input/letterboxd.html') as lb:
-    lbsoup = BeautifulSoup(lb, 'html.parser')
-## with open('input/movielens.html') as ml:
-##     mlsoup = BeautifulSoup(ml, 'html.parser')
-with open('input/movielens.txt') as mt: ## copy/paste version
-    mtsoup = BeautifulSoup(mt, 'lxml')
-
-lbdivs = lbsoup.find_all('div', attrs = {'data-film-name': True})
-lbdict = {}
-lbtxts = []
-for div in lbdivs:
-    lbtxts.append(div['data-film-name'])
-    lbdict[div['data-film-id']] = {
-        'title': div['data-film-name'],
-        'year': div['data-film-release-year']
-    }
-
-## mlpees = mlsoup.find_all('p', 'title')
-## mltxts = [p.text for p in mlpees]
-
-mltxts = [
-    re.search(r'(?<=poster for ).*', a).group(0)
-    for a in mtsoup.find('p').text.splitlines()
-    if re.search(r'(?<=poster for ).*', a) is not None
-]
-
-intersect = [mov for mov in mltxts if mov.lower() in [vid.lower() for vid in lbtxts]]
-
-print('\n')
-with open('output/whattowatch.csv', 'wb') as csvfile:
-    csvwriter = csv.writer(
-        csvfile, quotechar = '"', delimiter = ',', escapechar = '\\'
-    )
-    csvwriter.writerow(['Title', 'Year'])
-    for sect in intersect:
-        print(sect)
-        ## simply take the last item in case of multiple matches
-        out = [[i, x['year']] for i, x in lbdict.items() if x['title'] == sect][-1]
-        ## handle duplicate titles by removing
-        del lbdict[out[0]]
-        csvwriter.writerow([sect, out[1]])
-print('\n')
\ No newline at end of file
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from titleKeys import normalizeTitle, titleYearKey, splitYear
+
+## unicodecsv is imported where it's used so the matching logic can be
+## imported (e.g. by benchmarks/suite.py) without it
+
+## bytes read from an input file at a time
+chunk_size = 64 * 1024
+
+class FilmScanner(HTMLParser):
+    ## collects (id, name, year) from the divs carrying data-film-name
+    def __init__(self):
+        HTMLParser.__init__(self)
+        self.films = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'div':
+            return
+        attrs = dict(attrs)
+        if attrs.get('data-film-name') is not None:
+            self.films.append((attrs.get('data-film-id'), attrs['data-film-name'],
+                               attrs.get('data-film-release-year')))
+
+def scanLetterboxd(path):
+    scanner = FilmScanner()
+    with open(path, encoding = 'utf-8', errors = 'replace') as lb:
+        while True:
+            chunk = lb.read(chunk_size)
+            if not chunk:
+                break
+            scanner.feed(chunk)
+    scanner.close()
+    return scanner.films
+
+def readLetterboxd(paths = 'input/letterboxd.html', workers = None):
+    ## paths is one watchlist page or a list of them, read in that order
+    if isinstance(paths, str):
+        paths = [paths]
+    if len(paths) > 1:
+        with ProcessPoolExecutor(max_workers = workers) as pool:
+            pages = list(pool.map(scanLetterboxd, paths))
+    else:
+        pages = [scanLetterboxd(p) for p in paths]
+    lbdict = {}
+    lbtxts = []
+    for films in pages:
+        for film_id, name, year in films:
+            lbtxts.append(name)
+            lbdict[film_id] = {
+                'title': name,
+                'year': year
+            }
+    return lbtxts, lbdict
+
+def readMovieLens(path = 'input/movielens.txt'):
+    ## the copy/paste version: every movie has a line "poster for <title>"
+    mltxts = []
+    with open(path, encoding = 'utf-8', errors = 'replace') as mt:
+        for line in mt:
+            match = re.search(r'(?<=poster for ).*', line.rstrip('\r\n'))
+            if match is not None:
+                mltxts.append(html.unescape(match.group(0)))
+    return mltxts
+
+def watchlistKeys(lbdict):
+    ## normalized title -> Letterboxd ids, and title + year -> ids, in file order
+    by_title = {}
+    by_year = {}
+    for lb_id, film in lbdict.items():
+        by_title.setdefault(normalizeTitle(film['title']), []).append(lb_id)
+        by_year.setdefault(titleYearKey(film['title'], film['year']), []).append(lb_id)
+    return by_title, by_year
+
+def join(mltxts, lbdict):
+    ## [(MovieLens title, Letterboxd year)] for the MovieLens titles on the
+    ## watchlist, in MovieLens order. a year in the MovieLens title picks the
+    ## entry from that year; otherwise the last entry with the title is taken.
+    ## each watchlist entry is matched at most once, so a title that's listed
+    ## twice needs two entries.
+    by_title, by_year = watchlistKeys(lbdict)
+    used = set()
+    rows = []
+    for mov in mltxts:
+        title, year = splitYear(mov)
+        ids = by_year.get(titleYearKey(title, year)) if year is not None else None
+        if not ids:
+            ids = by_title.get(normalizeTitle(title))
+        while ids and ids[-1] in used:
+            ids.pop()
+        if not ids:
+            continue
+        lb_id = ids.pop()
+        used.add(lb_id)
+        rows.append((mov, lbdict[lb_id]['year']))
+    return rows
+
+def writeCSV(path, rows):
+    import unicodecsv as csv
+    print('\n')
+    with open(path, 'wb') as csvfile:
+        csvwriter = csv.writer(
+            csvfile, quotechar = '"', delimiter = ',', escapechar = '\\'
+        )
+        csvwriter.writerow(['Title', 'Year'])
+        for title, year in rows:
+            print(title)
+            csvwriter.writerow([title, year])
+    print('\n')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--letterboxd", nargs = '+', default = ['input/letterboxd.html'],
+                        help = "Letterboxd watchlist page(s), in order")
+    parser.add_argument("--movielens", default = 'input/movielens.txt',
+                        help = "copy/pasted list of top predicted movies from MovieLens")
+    parser.add_argument("--workers", type = int, default = None,
+                        help = "processes scanning watchlist pages (default: one per CPU)")
+    parser.add_argument("--out", default = 'output/whattowatch.csv')
+    args = parser.parse_args()
+    lbtxts, lbdict = readLetterboxd(args.letterboxd, args.workers)
+    mltxts = readMovieLens(args.movielens)
+    writeCSV(args.out, join(mltxts, lbdict))